@@ -0,0 +1,47 @@
+"""match_last_seen
+
+Revision ID: 3f1c9a7b2d10
+Revises: ea24e2355e99
+Create Date: 2025-04-21 10:12:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c9a7b2d10'
+down_revision: Union[str, None] = 'ea24e2355e99'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('match_last_seen',
+    sa.Column('source', sa.String(length=16), nullable=False),
+    sa.Column('match_id', sa.BigInteger(), nullable=False),
+    sa.Column('last_seen', sa.TIMESTAMP(), nullable=False),
+    sa.PrimaryKeyConstraint('source', 'match_id')
+    )
+    op.create_index('ix_match_last_seen_source_last_seen', 'match_last_seen', ['source', 'last_seen'], unique=False)
+
+    # Заполняем таблицу по уже накопленным данным
+    op.execute(
+        "INSERT INTO match_last_seen (source, match_id, last_seen) "
+        "SELECT 'pinnacle', match_id, max(created_at) "
+        "FROM live_odds_parsed GROUP BY match_id"
+    )
+    op.execute(
+        "INSERT INTO match_last_seen (source, match_id, last_seen) "
+        "SELECT 'analyzer', match_id_pinnacle, max(created_at) "
+        "FROM analyzer_odds_parsed GROUP BY match_id_pinnacle"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_match_last_seen_source_last_seen', table_name='match_last_seen')
+    op.drop_table('match_last_seen')
@@ -0,0 +1,42 @@
+"""cluster coordination
+
+Revision ID: 8c2e5d4a7b31
+Revises: 3f1c9a7b2d10
+Create Date: 2025-05-12 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c2e5d4a7b31'
+down_revision: Union[str, None] = '3f1c9a7b2d10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('cluster_instances',
+    sa.Column('instance_id', sa.String(length=64), nullable=False),
+    sa.Column('hostname', sa.String(length=255), nullable=False),
+    sa.Column('started_at', sa.TIMESTAMP(), nullable=False),
+    sa.Column('heartbeat_at', sa.TIMESTAMP(), nullable=False),
+    sa.PrimaryKeyConstraint('instance_id')
+    )
+    op.create_table('export_leases',
+    sa.Column('source', sa.String(length=16), nullable=False),
+    sa.Column('match_id', sa.BigInteger(), nullable=False),
+    sa.Column('owner', sa.String(length=64), nullable=False),
+    sa.Column('expires_at', sa.TIMESTAMP(), nullable=False),
+    sa.PrimaryKeyConstraint('source', 'match_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('export_leases')
+    op.drop_table('cluster_instances')
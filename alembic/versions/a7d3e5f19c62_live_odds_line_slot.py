@@ -0,0 +1,43 @@
+"""live_odds_parsed line_slot for backfilled rows
+
+Revision ID: a7d3e5f19c62
+Revises: f5b2c8e1a934
+Create Date: 2025-06-09 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d3e5f19c62'
+down_revision: Union[str, None] = 'f5b2c8e1a934'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# key_hash живых строк: md5('match_id-period-market-outcome'), None пишется как 'None'
+_LIVE_KEY = ("match_id::text || '-' || COALESCE(period, 'None') || '-' || market "
+             "|| '-' || outcome")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('live_odds_parsed', sa.Column('line_slot', sa.SmallInteger(), nullable=True))
+    # Загруженные раньше строки хранили слот в line ('slot1', ...) и в ключе
+    op.execute(
+        "UPDATE live_odds_parsed SET line_slot = substr(line, 5)::smallint, line = NULL, "
+        f"key_hash = md5({_LIVE_KEY}) "
+        "WHERE source = 'backfill' AND line LIKE 'slot%'"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(
+        "UPDATE live_odds_parsed SET line = 'slot' || line_slot, "
+        f"key_hash = md5({_LIVE_KEY} || '-slot' || line_slot) "
+        "WHERE source = 'backfill' AND line_slot IS NOT NULL"
+    )
+    op.drop_column('live_odds_parsed', 'line_slot')
@@ -0,0 +1,49 @@
+"""odds_rollup
+
+Revision ID: b7d41e9c2f58
+Revises: 8c2e5d4a7b31
+Create Date: 2025-05-19 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d41e9c2f58'
+down_revision: Union[str, None] = '8c2e5d4a7b31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('odds_rollup',
+    sa.Column('match_id', sa.BigInteger(), nullable=False),
+    sa.Column('bucket_seconds', sa.Integer(), nullable=False),
+    sa.Column('bucket_start', sa.TIMESTAMP(), nullable=False),
+    sa.Column('period', sa.String(), nullable=False),
+    sa.Column('market', sa.String(), nullable=False),
+    sa.Column('outcome', sa.String(), nullable=False),
+    sa.Column('sport_name', sa.String(), nullable=True),
+    sa.Column('open_value', sa.Float(), nullable=False),
+    sa.Column('high_value', sa.Float(), nullable=False),
+    sa.Column('low_value', sa.Float(), nullable=False),
+    sa.Column('last_value', sa.Float(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('first_line', sa.String(), nullable=True),
+    sa.Column('last_line', sa.String(), nullable=True),
+    sa.Column('first_at', sa.TIMESTAMP(), nullable=False),
+    sa.Column('last_at', sa.TIMESTAMP(), nullable=False),
+    sa.PrimaryKeyConstraint('match_id', 'bucket_seconds', 'bucket_start',
+                            'period', 'market', 'outcome')
+    )
+    op.create_index('ix_odds_rollup_bucket_start', 'odds_rollup', ['bucket_start'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_odds_rollup_bucket_start', table_name='odds_rollup')
+    op.drop_table('odds_rollup')
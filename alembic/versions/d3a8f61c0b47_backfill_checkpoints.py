@@ -0,0 +1,35 @@
+"""backfill_checkpoints
+
+Revision ID: d3a8f61c0b47
+Revises: b7d41e9c2f58
+Create Date: 2025-05-26 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3a8f61c0b47'
+down_revision: Union[str, None] = 'b7d41e9c2f58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('backfill_checkpoints',
+    sa.Column('archive', sa.String(), nullable=False),
+    sa.Column('member', sa.String(), nullable=False),
+    sa.Column('match_id', sa.BigInteger(), nullable=True),
+    sa.Column('rows', sa.Integer(), nullable=False),
+    sa.Column('imported_at', sa.TIMESTAMP(), nullable=False),
+    sa.PrimaryKeyConstraint('archive', 'member')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('backfill_checkpoints')
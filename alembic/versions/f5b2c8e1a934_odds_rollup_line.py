@@ -0,0 +1,52 @@
+"""odds_rollup line in key
+
+Revision ID: f5b2c8e1a934
+Revises: d3a8f61c0b47
+Create Date: 2025-06-02 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f5b2c8e1a934'
+down_revision: Union[str, None] = 'd3a8f61c0b47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('odds_rollup', sa.Column('line', sa.String(), nullable=False, server_default=''))
+    # Старые свёртки смешивали линии, за ними остаётся последняя
+    op.execute("UPDATE odds_rollup SET line = COALESCE(last_line, '')")
+    op.alter_column('odds_rollup', 'line', server_default=None)
+    op.drop_constraint('odds_rollup_pkey', 'odds_rollup', type_='primary')
+    op.create_primary_key('odds_rollup_pkey', 'odds_rollup',
+                          ['match_id', 'bucket_seconds', 'bucket_start',
+                           'period', 'market', 'line', 'outcome'])
+    op.drop_column('odds_rollup', 'first_line')
+    op.drop_column('odds_rollup', 'last_line')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('odds_rollup', sa.Column('first_line', sa.String(), nullable=True))
+    op.add_column('odds_rollup', sa.Column('last_line', sa.String(), nullable=True))
+    op.execute("UPDATE odds_rollup SET first_line = NULLIF(line, ''), last_line = NULLIF(line, '')")
+    # Из свёрток разных линий одного ключа остаётся самая свежая
+    op.execute(
+        'DELETE FROM odds_rollup a USING odds_rollup b '
+        'WHERE a.match_id = b.match_id AND a.bucket_seconds = b.bucket_seconds '
+        'AND a.bucket_start = b.bucket_start AND a.period = b.period '
+        'AND a.market = b.market AND a.outcome = b.outcome '
+        'AND (a.last_at, a.line) < (b.last_at, b.line)'
+    )
+    op.drop_constraint('odds_rollup_pkey', 'odds_rollup', type_='primary')
+    op.create_primary_key('odds_rollup_pkey', 'odds_rollup',
+                          ['match_id', 'bucket_seconds', 'bucket_start',
+                           'period', 'market', 'outcome'])
+    op.drop_column('odds_rollup', 'line')
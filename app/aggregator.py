@@ -1,8 +1,15 @@
 import asyncio
+import json
 import logging
+import time
 from typing import Any
 
-from app.constants.settings import WRITE_INTERVAL
+from app.cluster import membership
+from app.constants.settings import LINE_MOVE_ENABLED, WRITE_INTERVAL
+from app.line_moves import line_moves
+from app.metrics import (AGGREGATOR_BUFFER_BYTES, AGGREGATOR_BUFFER_MESSAGES,
+                         AGGREGATOR_FLUSH_SECONDS, WS_MESSAGES)
+from app.profiling import cycle, span
 from app.writer_pinnacle import write_to_storage as write_pinnacle
 from app.writer_analyzer import write_analyzer_to_storage as write_analyzer
 
@@ -15,24 +22,31 @@ class Aggregator:
     Класс для агрегации входящих сообщений с сокетов и периодической отправки в БД.
     """
 
-    def __init__(self, flush_interval: int = WRITE_INTERVAL):
+    def __init__(self, flush_interval: int = WRITE_INTERVAL, name: str = 'default'):
         """
         Инициализация агрегатора.
 
         :param flush_interval: интервал сброса буфера в секундах
+        :param name: имя источника для метрик
         """
         self.buffer: list[dict[str, Any]] = []
+        self.buffer_bytes = 0
         self.lock = asyncio.Lock()
         self.flush_interval = flush_interval
+        self.name = name
+        AGGREGATOR_BUFFER_MESSAGES.set_function(name, func=lambda: len(self.buffer))
+        AGGREGATOR_BUFFER_BYTES.set_function(name, func=lambda: self.buffer_bytes)
 
-    async def add(self, message: dict[str, Any]):
+    async def add(self, message: dict[str, Any], size: int = 0):
         """
         Добавляет сообщение в буфер.
 
         :param message: словарь с данными от сокета
+        :param size: размер сообщения в исходном JSON (для метрик)
         """
         async with self.lock:
             self.buffer.append(message)
+            self.buffer_bytes += size
 
     async def run_flush_loop(self):
         """
@@ -51,13 +65,26 @@ class Aggregator:
                 logger.info('📭 Буфер пуст, пропускаем запись')
                 return
 
-            # logger.info(f'🔄 Отправляем {len(self.buffer)} сообщений в обработку')
+            started = time.perf_counter()
+            with cycle(f'flush_{self.name}'):
+                await self._dispatch()
 
-            # для проверки данных которые нам прилетают
-            for i, message in enumerate(self.buffer[:4]):
-                logger.info(f'🔹 Сообщение #{i+1}:\n{message}\n')
+            self.buffer.clear()
+            self.buffer_bytes = 0
+            AGGREGATOR_FLUSH_SECONDS.observe(self.name, value=time.perf_counter() - started)
+
+    async def _dispatch(self):
+        """
+        Раздаёт сообщения буфера обработчикам источников. Вызывается под self.lock.
+        """
+        # logger.info(f'🔄 Отправляем {len(self.buffer)} сообщений в обработку')
+
+        # для проверки данных которые нам прилетают
+        for i, message in enumerate(self.buffer[:4]):
+            logger.info(f'🔹 Сообщение #{i+1}:\n{message}\n')
 
-            # Фильтрация сообщений от разных источников
+        # Фильтрация сообщений от разных источников
+        with span('filter'):
             pinnacle_msgs = [msg for msg in self.buffer if
                              msg.get('Source') == 'Pinnacle']
             analyzer_msgs = [
@@ -66,14 +93,58 @@ class Aggregator:
                 and 'first' in msg and 'second' in msg and 'outcome' in msg
             ]
 
-            if pinnacle_msgs:
-                logger.info(
-                    f'📦 Отправляем {len(pinnacle_msgs)} сообщений от Pinnacle')
+        if pinnacle_msgs:
+            logger.info(
+                f'📦 Отправляем {len(pinnacle_msgs)} сообщений от Pinnacle')
+            with span('write_pinnacle'):
                 await write_pinnacle(pinnacle_msgs)
 
-            if analyzer_msgs:
-                logger.info(
-                    f'🧠 Отправляем {len(analyzer_msgs)} сообщений от Analyzer')
+        if analyzer_msgs:
+            logger.info(
+                f'🧠 Отправляем {len(analyzer_msgs)} сообщений от Analyzer')
+            with span('write_analyzer'):
                 await write_analyzer(analyzer_msgs)
 
-            self.buffer.clear()
+
+async def handle_frame(source_name: str, message: str | bytes, aggregator: Aggregator) -> None:
+    """
+    Разбирает один кадр WebSocket и отправляет сообщения из него в агрегатор.
+    Поддерживает как список сообщений, так и отдельные словари. В кластерном
+    режиме сообщения чужих шардов отбрасываются. Сообщения Pinnacle сразу,
+    до буферизации, проходят через детектор движений линии (LINE_MOVE_ENABLED).
+
+    :param source_name: Название источника ('Pinnacle' или 'Analyzer')
+    :param message: Кадр как есть (текст или байты JSON)
+    """
+    observe_moves = LINE_MOVE_ENABLED and source_name == 'Pinnacle'
+    try:
+        data = json.loads(message)
+
+        if isinstance(data, list):
+            # Размер пакета для метрик делится поровну между сообщениями
+            item_size = len(message) // max(len(data), 1)
+            WS_MESSAGES.inc(source_name.lower(), amount=len(data))
+            for item in data:
+                if isinstance(item, dict):
+                    if membership.owns_message(item):
+                        if observe_moves:
+                            line_moves.observe_message(item)
+                        await aggregator.add(item, item_size)
+                else:
+                    logger.warning(
+                        f'[{source_name}] Элемент в списке не dict: {type(item)}')
+
+        elif isinstance(data, dict):
+            WS_MESSAGES.inc(source_name.lower())
+            if membership.owns_message(data):
+                if observe_moves:
+                    line_moves.observe_message(data)
+                await aggregator.add(data, len(message))
+
+        else:
+            logger.warning(
+                f'[{source_name}] Неподдерживаемый формат данных: {type(data)}')
+
+    except json.JSONDecodeError:
+        logger.warning(
+            f'[{source_name}] Ошибка декодирования JSON: {message!r}')
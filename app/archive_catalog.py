@@ -0,0 +1,193 @@
+import io
+import sqlite3
+import struct
+import tarfile
+import zlib
+from contextlib import closing
+from dataclasses import dataclass
+from pathlib import Path
+
+from app.archive_format import ARCHIVE_FORMAT_TAR_ZST, zstandard
+from app.constants.paths import ARCHIVE_CATALOG_PATH, ARCHIVE_DIR, ARCHIVE_OPEN_DIR
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS archive_members (
+    archive TEXT NOT NULL,
+    member TEXT NOT NULL,
+    format TEXT NOT NULL,
+    source TEXT NOT NULL,
+    match_id INTEGER,
+    date TEXT,
+    sport TEXT,
+    outcome TEXT,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (archive, member)
+);
+CREATE INDEX IF NOT EXISTS ix_archive_members_match_id ON archive_members (match_id);
+CREATE INDEX IF NOT EXISTS ix_archive_members_date_sport ON archive_members (date, sport);
+CREATE INDEX IF NOT EXISTS ix_archive_members_member ON archive_members (member);
+"""
+
+_ZIP_LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+
+
+@dataclass
+class CatalogEntry:
+    """
+    Запись каталога: где внутри архива лежит CSV конкретного матча.
+
+    Поля:
+    - archive: имя файла архива (в open/ или ARCHIVE_DIR)
+    - member: имя CSV внутри архива
+    - format: формат архива ("zip" или "tar.zst")
+    - source: источник выгрузки
+    - match_id, date, sport, outcome: атрибуты матча для поиска
+    - offset, length: смещение и длина члена (локальный заголовок + данные для zip,
+      отдельный zstd-фрейм для tar.zst)
+    - size: размер исходного CSV
+    """
+    archive: str
+    member: str
+    format: str
+    source: str
+    match_id: int | None
+    date: str | None
+    sport: str | None
+    outcome: str | None
+    offset: int
+    length: int
+    size: int
+
+
+def _connect(catalog_path: Path = ARCHIVE_CATALOG_PATH) -> sqlite3.Connection:
+    Path(catalog_path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(catalog_path, timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def record_members(entries: list[CatalogEntry], catalog_path: Path = ARCHIVE_CATALOG_PATH):
+    """
+    Записывает члены архива в каталог одной транзакцией.
+    Повторная запись того же члена (после сбоя архиватора) перезаписывает смещение.
+    """
+    if not entries:
+        return
+
+    with closing(_connect(catalog_path)) as conn, conn:
+        conn.executemany(
+            'INSERT OR REPLACE INTO archive_members '
+            '(archive, member, format, source, match_id, date, sport, outcome, offset, length, size) '
+            'VALUES (:archive, :member, :format, :source, :match_id, :date, :sport, :outcome, '
+            ':offset, :length, :size)',
+            [entry.__dict__ for entry in entries],
+        )
+
+
+def archive_known(archive: str, catalog_path: Path = ARCHIVE_CATALOG_PATH) -> bool:
+    """
+    Есть ли в каталоге члены архива с таким именем (в том числе уже загруженного в облако).
+    """
+    with closing(_connect(catalog_path)) as conn:
+        row = conn.execute('SELECT 1 FROM archive_members WHERE archive = ? LIMIT 1',
+                           (archive,)).fetchone()
+    return row is not None
+
+
+def find_members(
+    match_id: int | None = None,
+    date: str | None = None,
+    sport: str | None = None,
+    outcome: str | None = None,
+    source: str | None = None,
+    catalog_path: Path = ARCHIVE_CATALOG_PATH,
+) -> list[CatalogEntry]:
+    """
+    Ищет CSV в каталоге по атрибутам матча. Незаданные фильтры не применяются.
+    Поиск идёт по индексам SQLite и не открывает сами архивы.
+    """
+    filters = {'match_id': match_id, 'date': date, 'sport': sport,
+               'outcome': outcome, 'source': source}
+    conditions = [f'{column} = :{column}' for column, value in filters.items() if value is not None]
+    query = 'SELECT * FROM archive_members'
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    query += ' ORDER BY date, archive, offset'
+
+    with closing(_connect(catalog_path)) as conn:
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute(query, filters).fetchall()
+    return [CatalogEntry(**dict(row)) for row in rows]
+
+
+def resolve_archive_path(archive: str) -> Path:
+    """
+    Находит архив локально: закрытый в ARCHIVE_DIR или ещё пополняемый в open/.
+    Архивы, уже отправленные в облако и удалённые, нужно сначала скачать в ARCHIVE_DIR.
+    """
+    for directory in (ARCHIVE_DIR, ARCHIVE_OPEN_DIR):
+        path = Path(directory) / archive
+        if path.exists():
+            return path
+    raise FileNotFoundError(f'Архив {archive} не найден локально')
+
+
+def _read_zip_member(fp, entry: CatalogEntry) -> bytes:
+    fp.seek(entry.offset)
+    header = fp.read(_ZIP_LOCAL_HEADER.size)
+    (signature, _, _, method, _, _, crc, compress_size, _,
+     name_len, extra_len) = _ZIP_LOCAL_HEADER.unpack(header)
+    if signature != 0x04034b50:
+        raise ValueError(f'Неверный локальный заголовок {entry.member} в {entry.archive}')
+
+    fp.seek(name_len + extra_len, 1)
+    payload = fp.read(compress_size)
+    data = zlib.decompress(payload, -15) if method == 8 else payload
+    if zlib.crc32(data) != crc:
+        raise ValueError(f'Ошибка CRC у {entry.member} в {entry.archive}')
+    return data
+
+
+def _read_tar_zst_member(fp, entry: CatalogEntry) -> bytes:
+    if zstandard is None:
+        raise RuntimeError('Для чтения tar.zst нужен пакет zstandard')
+
+    fp.seek(entry.offset)
+    block = zstandard.ZstdDecompressor().decompress(fp.read(entry.length))
+    with tarfile.open(fileobj=io.BytesIO(block), mode='r:') as tar:
+        member = tar.next()
+        return tar.extractfile(member).read()
+
+
+def read_member(entry: CatalogEntry, archive_path: Path | None = None) -> bytes:
+    """
+    Читает один CSV из архива по смещению из каталога, не распаковывая остальное.
+
+    :param archive_path: Явный путь к архиву (например, скачанному из облака)
+    """
+    archive_path = archive_path or resolve_archive_path(entry.archive)
+    with open(archive_path, 'rb') as fp:
+        if entry.format == ARCHIVE_FORMAT_TAR_ZST:
+            return _read_tar_zst_member(fp, entry)
+        return _read_zip_member(fp, entry)
+
+
+def extract_match(match_id: int, dest_dir: Path, source: str | None = None) -> list[Path]:
+    """
+    Извлекает все CSV матча из архивов в dest_dir.
+
+    :return: Пути извлечённых файлов
+    """
+    dest_dir = Path(dest_dir)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+
+    extracted = []
+    for entry in find_members(match_id=match_id, source=source):
+        target = dest_dir / entry.member
+        target.write_bytes(read_member(entry))
+        extracted.append(target)
+    return extracted
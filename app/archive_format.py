@@ -0,0 +1,290 @@
+import os
+import struct
+import tarfile
+import time
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterable, Iterator
+
+try:
+    import zstandard
+except ImportError:  # zstd — необязательная зависимость
+    zstandard = None
+
+
+ARCHIVE_FORMAT_ZIP = 'zip'
+ARCHIVE_FORMAT_TAR_ZST = 'tar.zst'
+
+_ZIP64_LIMIT = 0xFFFFFFFF
+_ZIP_COUNT_LIMIT = 0xFFFF
+_ZIP_FLAG_UTF8 = 0x0800
+_ZIP_DEFLATED = 8
+
+
+@dataclass
+class CompressedMember:
+    """
+    Сжатый член архива, готовый к последовательной записи.
+
+    Поля:
+    - name: имя внутри архива
+    - payload: сжатые данные (raw deflate для zip, zstd-фрейм с tar-блоками для tar.zst)
+    - crc: CRC32 исходных данных (нужен zip)
+    - size: размер исходных данных
+    - mtime: время модификации исходного файла
+    """
+    name: str
+    payload: bytes
+    crc: int
+    size: int
+    mtime: float
+
+
+def zstd_available() -> bool:
+    return zstandard is not None
+
+
+def deflate_member(path: Path, arcname: str, level: int) -> CompressedMember:
+    """
+    Сжимает файл в raw deflate для записи в zip. zlib отпускает GIL,
+    поэтому вызовы масштабируются по потокам.
+    """
+    data = Path(path).read_bytes()
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    payload = compressor.compress(data) + compressor.flush()
+    return CompressedMember(arcname, payload, zlib.crc32(data), len(data),
+                            Path(path).stat().st_mtime)
+
+
+def zstd_member(path: Path, arcname: str, level: int) -> CompressedMember:
+    """
+    Сжимает tar-заголовок и данные файла в отдельный zstd-фрейм.
+    Конкатенация таких фреймов даёт валидный tar.zst, а каждый член
+    можно распаковать независимо по его смещению.
+    """
+    data = Path(path).read_bytes()
+    stat = Path(path).stat()
+    info = tarfile.TarInfo(arcname)
+    info.size = len(data)
+    info.mtime = int(stat.st_mtime)
+    info.mode = 0o644
+    padding = (-len(data)) % tarfile.BLOCKSIZE
+    block = info.tobuf(tarfile.PAX_FORMAT, 'utf-8', 'surrogateescape') + data + b'\0' * padding
+    payload = zstandard.ZstdCompressor(level=level).compress(block)
+    return CompressedMember(arcname, payload, zlib.crc32(data), len(data), stat.st_mtime)
+
+
+def compress_parallel(
+    paths: Iterable[Path],
+    compress: Callable[[Path, str, int], CompressedMember],
+    level: int,
+    workers: int,
+) -> Iterator[tuple[Path, CompressedMember]]:
+    """
+    Сжимает файлы в пуле потоков и отдаёт результаты в исходном порядке.
+    В работе одновременно не более 2 * workers файлов, так что память ограничена
+    независимо от количества файлов.
+    """
+    workers = max(1, workers)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='archiver') as pool:
+        in_flight = deque()
+        for path in paths:
+            in_flight.append((path, pool.submit(compress, path, Path(path).name, level)))
+            if len(in_flight) >= workers * 2:
+                done_path, future = in_flight.popleft()
+                yield done_path, future.result()
+        while in_flight:
+            done_path, future = in_flight.popleft()
+            yield done_path, future.result()
+
+
+def _dos_datetime(mtime: float) -> tuple[int, int]:
+    tm = time.localtime(mtime)
+    year = max(tm.tm_year, 1980)
+    dos_date = (year - 1980) << 9 | tm.tm_mon << 5 | tm.tm_mday
+    dos_time = tm.tm_hour << 11 | tm.tm_min << 5 | tm.tm_sec // 2
+    return dos_time, dos_date
+
+
+@dataclass
+class _ZipEntry:
+    name: bytes
+    crc: int
+    compress_size: int
+    file_size: int
+    offset: int
+    dos_time: int
+    dos_date: int
+
+    @property
+    def member_length(self) -> int:
+        """
+        Длина локального заголовка вместе с данными (без extra-поля).
+        """
+        return 30 + len(self.name) + self.compress_size
+
+
+class ZipStreamWriter:
+    """
+    Последовательная запись zip (deflate) из заранее сжатых членов.
+
+    Пишет только вперёд, поэтому подходит и для файлов, и для потоковых приёмников.
+    Смещения членов > 4 ГиБ оформляются через Zip64 в центральном каталоге;
+    сами члены должны быть меньше 4 ГиБ (CSV матчей намного меньше).
+    """
+
+    def __init__(self, fp: BinaryIO, offset: int = 0):
+        """
+        :param fp: Приёмник с методом write
+        :param offset: Текущая позиция в архиве (при дозаписи)
+        """
+        self.fp = fp
+        self.offset = offset
+        self.entries: list[_ZipEntry] = []
+
+    def add(self, member: CompressedMember) -> tuple[int, int]:
+        """
+        Записывает член архива.
+
+        :return: (смещение локального заголовка, длина заголовка вместе с данными)
+        """
+        if member.size >= _ZIP64_LIMIT or len(member.payload) >= _ZIP64_LIMIT:
+            raise ValueError(f'Член архива слишком большой для zip: {member.name}')
+
+        name = member.name.encode('utf-8')
+        dos_time, dos_date = _dos_datetime(member.mtime)
+        header = struct.pack(
+            '<IHHHHHIIIHH', 0x04034b50, 20, _ZIP_FLAG_UTF8, _ZIP_DEFLATED,
+            dos_time, dos_date, member.crc, len(member.payload), member.size,
+            len(name), 0,
+        ) + name
+
+        offset = self.offset
+        self.fp.write(header)
+        self.fp.write(member.payload)
+        length = len(header) + len(member.payload)
+        self.offset += length
+
+        self.entries.append(_ZipEntry(name, member.crc, len(member.payload), member.size,
+                                      offset, dos_time, dos_date))
+        return offset, length
+
+    def close(self):
+        """
+        Записывает центральный каталог и конец архива.
+        """
+        cd_offset = self.offset
+        for entry in self.entries:
+            extra = b''
+            offset_field = entry.offset
+            if entry.offset >= _ZIP64_LIMIT:
+                extra = struct.pack('<HHQ', 0x0001, 8, entry.offset)
+                offset_field = _ZIP64_LIMIT
+            version = 45 if extra else 20
+            record = struct.pack(
+                '<IHHHHHHIIIHHHHHII', 0x02014b50, version, version, _ZIP_FLAG_UTF8,
+                _ZIP_DEFLATED, entry.dos_time, entry.dos_date, entry.crc,
+                entry.compress_size, entry.file_size, len(entry.name), len(extra),
+                0, 0, 0, 0o644 << 16, offset_field,
+            ) + entry.name + extra
+            self.fp.write(record)
+            self.offset += len(record)
+
+        cd_size = self.offset - cd_offset
+        count = len(self.entries)
+        if count >= _ZIP_COUNT_LIMIT or cd_offset >= _ZIP64_LIMIT or cd_size >= _ZIP64_LIMIT:
+            zip64_offset = self.offset
+            self.fp.write(struct.pack(
+                '<IQHHIIQQQQ', 0x06064b50, 44, 45, 45, 0, 0,
+                count, count, cd_size, cd_offset,
+            ))
+            self.fp.write(struct.pack('<IIQI', 0x07064b50, 0, zip64_offset, 1))
+            self.offset += 56 + 20
+            count = min(count, _ZIP_COUNT_LIMIT)
+            cd_size = min(cd_size, _ZIP64_LIMIT)
+            cd_offset = min(cd_offset, _ZIP64_LIMIT)
+
+        self.fp.write(struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, count, count,
+                                  cd_size, cd_offset, 0))
+        self.offset += 22
+
+
+class TarZstStreamWriter:
+    """
+    Последовательная запись tar.zst: каждый член — отдельный zstd-фрейм,
+    в конце — фрейм с маркером конца tar-архива.
+    """
+
+    def __init__(self, fp: BinaryIO, offset: int = 0, level: int = 3):
+        self.fp = fp
+        self.offset = offset
+        self.level = level
+
+    def add(self, member: CompressedMember) -> tuple[int, int]:
+        """
+        :return: (смещение фрейма, длина фрейма)
+        """
+        offset = self.offset
+        self.fp.write(member.payload)
+        self.offset += len(member.payload)
+        return offset, len(member.payload)
+
+    def close(self):
+        end_frame = _tar_end_frame(self.level)
+        self.fp.write(end_frame)
+        self.offset += len(end_frame)
+
+
+def _tar_end_frame(level: int) -> bytes:
+    return zstandard.ZstdCompressor(level=level).compress(b'\0' * (tarfile.BLOCKSIZE * 2))
+
+
+def open_zip_for_append(fp: BinaryIO) -> ZipStreamWriter:
+    """
+    Готовит существующий zip к дозаписи. Новые члены пишутся после старого
+    конца архива, затем — полный новый центральный каталог. Старый каталог
+    остаётся внутри файла мёртвым грузом, зато исходный архив не перезаписывается
+    и при сбое восстанавливается обрезкой до прежней длины.
+
+    :param fp: Файл, открытый в режиме 'r+b'
+    """
+    with zipfile.ZipFile(fp) as zf:
+        infos = zf.infolist()
+
+    fp.seek(0, os.SEEK_END)
+    writer = ZipStreamWriter(fp, offset=fp.tell())
+    for info in infos:
+        year, month, day, hour, minute, second = info.date_time
+        writer.entries.append(_ZipEntry(
+            name=info.filename.encode('utf-8'),
+            crc=info.CRC,
+            compress_size=info.compress_size,
+            file_size=info.file_size,
+            offset=info.header_offset,
+            dos_time=hour << 11 | minute << 5 | second // 2,
+            dos_date=(year - 1980) << 9 | month << 5 | day,
+        ))
+    return writer
+
+
+def open_tar_zst_for_append(fp: BinaryIO, level: int) -> TarZstStreamWriter:
+    """
+    Готовит существующий tar.zst к дозаписи: отрезает завершающий фрейм
+    с маркером конца tar, чтобы новые члены шли сразу за старыми.
+
+    :param fp: Файл, открытый в режиме 'r+b'
+    """
+    end_frame = _tar_end_frame(level)
+    size = fp.seek(0, os.SEEK_END)
+    base = size
+    if size >= len(end_frame):
+        fp.seek(size - len(end_frame))
+        if fp.read() == end_frame:
+            base = size - len(end_frame)
+    fp.seek(base)
+    fp.truncate()
+    return TarZstStreamWriter(fp, offset=base, level=level)
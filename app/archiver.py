@@ -1,62 +1,386 @@
 import asyncio
+import json
 import logging
 import os
-import zipfile
-from datetime import datetime, timedelta
+import time
+from collections import defaultdict
+from datetime import datetime
 from pathlib import Path
+from typing import BinaryIO
 
-from app.constants.paths import EXPORT_PINNACLE_DIR, EXPORT_ANALYZER_DIR, ARCHIVE_DIR
-from app.constants.settings import ARCHIVE_AGE_THRESHOLD, ARCHIVE_INTERVAL
+from app.archive_catalog import CatalogEntry, archive_known, record_members
+from app.archive_format import (ARCHIVE_FORMAT_TAR_ZST, ARCHIVE_FORMAT_ZIP, TarZstStreamWriter,
+                                ZipStreamWriter, compress_parallel, deflate_member,
+                                open_tar_zst_for_append, open_zip_for_append,
+                                zstd_available, zstd_member)
+from app.cluster import cluster_lock
+from app.constants.paths import ARCHIVE_DIR, ARCHIVE_OPEN_DIR
+from app.constants.settings import (ARCHIVE_AGE_THRESHOLD, ARCHIVE_INTERVAL, ARCHIVE_FORMAT,
+                                    ARCHIVE_WORKERS, ARCHIVE_DEFLATE_LEVEL, ARCHIVE_ZSTD_LEVEL,
+                                    ARCHIVE_STREAM_UPLOAD, UPLOAD_CHUNK_SIZE)
+from app.manifest import ManifestEntry, ManifestReader, bootstrap_manifest
+from app.metrics import ARCHIVE_CYCLE_SECONDS, ARCHIVED_FILES
+from app.storage_backends import StorageBackend, create_backend
+from app.utils import fsync_dir
 
 
 logger = logging.getLogger(__name__)
 
+# Хранилище для потокового режима (ARCHIVE_STREAM_UPLOAD), создаётся при первом обращении
+_stream_backend: StorageBackend | None = None
 
-def zip_and_cleanup_yesterdays_exports():
+
+def resolve_archive_format(archive_format: str = ARCHIVE_FORMAT) -> str:
+    """
+    Возвращает фактический формат архива: tar.zst без пакета zstandard
+    недоступен, в этом случае используется zip.
+    """
+    if archive_format == ARCHIVE_FORMAT_TAR_ZST and not zstd_available():
+        logger.warning('⚠️ Пакет zstandard не установлен, архивируем в zip')
+        return ARCHIVE_FORMAT_ZIP
+    return archive_format
+
+
+def _compressor(archive_format: str):
+    if archive_format == ARCHIVE_FORMAT_TAR_ZST:
+        return zstd_member, ARCHIVE_ZSTD_LEVEL
+    return deflate_member, ARCHIVE_DEFLATE_LEVEL
+
+
+def write_archive(
+    fp: BinaryIO,
+    files: list[Path],
+    archive_format: str = ARCHIVE_FORMAT_ZIP,
+    workers: int = ARCHIVE_WORKERS,
+) -> list[tuple[Path, int, int]]:
+    """
+    Сжимает файлы в пуле потоков и последовательно пишет новый архив в fp.
+    Приёмнику нужен только метод write, так что это может быть и потоковая загрузка.
+
+    :return: Список (файл, смещение члена, длина члена)
+    """
+    compress, level = _compressor(archive_format)
+    if archive_format == ARCHIVE_FORMAT_TAR_ZST:
+        writer = TarZstStreamWriter(fp, level=level)
+    else:
+        writer = ZipStreamWriter(fp)
+
+    archived = []
+    for file_path, member in compress_parallel(files, compress, level, workers):
+        offset, length = writer.add(member)
+        archived.append((file_path, offset, length))
+    writer.close()
+    return archived
+
+
+def build_archive(
+    files: list[Path],
+    archive_path: Path,
+    archive_format: str = ARCHIVE_FORMAT_ZIP,
+    workers: int = ARCHIVE_WORKERS,
+) -> list[Path]:
+    """
+    Сжимает файлы в пуле потоков и потоково записывает их в новый архив.
+
+    :return: Файлы, успешно попавшие в архив
+    """
+    with open(archive_path, 'wb') as fp:
+        archived = write_archive(fp, files, archive_format, workers)
+        fp.flush()
+        os.fsync(fp.fileno())
+
+    return [file_path for file_path, _, _ in archived]
+
+
+def _journal_path(archive_path: Path) -> Path:
+    return archive_path.with_name(archive_path.name + '.journal')
+
+
+def recover_archive(archive_path: Path, archive_format: str):
+    """
+    Откатывает незавершённую дозапись: обрезает архив до длины из журнала.
+    """
+    journal = _journal_path(archive_path)
+    if not journal.exists():
+        return
+
+    base = json.loads(journal.read_text(encoding='utf-8'))['base']
+    logger.warning(f'♻️ Откатываем незавершённую дозапись {archive_path.name} до {base} байт')
+    if base == 0:
+        archive_path.unlink(missing_ok=True)
+    else:
+        with open(archive_path, 'r+b') as fp:
+            fp.truncate(base)
+            if archive_format == ARCHIVE_FORMAT_TAR_ZST:
+                writer = TarZstStreamWriter(fp, offset=base, level=ARCHIVE_ZSTD_LEVEL)
+                fp.seek(base)
+                writer.close()
+            fp.flush()
+            os.fsync(fp.fileno())
+    journal.unlink()
+
+
+def append_to_archive(
+    archive_path: Path,
+    files: list[Path],
+    archive_format: str,
+    workers: int = ARCHIVE_WORKERS,
+) -> list[tuple[Path, int, int]]:
+    """
+    Дописывает файлы в архив (создаёт его при отсутствии).
+
+    Перед записью в журнал кладётся длина, до которой архив можно обрезать
+    при сбое, — исходное содержимое архива не перезаписывается.
+
+    :return: Список (файл, смещение члена, длина члена) для попавших в архив файлов
+    """
+    recover_archive(archive_path, archive_format)
+    compress, level = _compressor(archive_format)
+    journal = _journal_path(archive_path)
+    exists = archive_path.exists()
+
+    archived = []
+    with open(archive_path, 'r+b' if exists else 'w+b') as fp:
+        if archive_format == ARCHIVE_FORMAT_TAR_ZST:
+            writer = (open_tar_zst_for_append(fp, level) if exists
+                      else TarZstStreamWriter(fp, level=level))
+            known = {}
+        else:
+            writer = open_zip_for_append(fp) if exists else ZipStreamWriter(fp)
+            known = {entry.name.decode('utf-8'): entry for entry in writer.entries}
+
+        journal.write_text(json.dumps({'base': writer.offset}), encoding='utf-8')
+        fsync_dir(archive_path.parent)
+
+        # После сбоя между архивацией и удалением файл уже может быть в архиве
+        pending = []
+        for file_path in dict.fromkeys(files):
+            entry = known.get(file_path.name)
+            if entry is not None and entry.file_size == file_path.stat().st_size:
+                archived.append((file_path, entry.offset, entry.member_length))
+            else:
+                pending.append(file_path)
+
+        for file_path, member in compress_parallel(pending, compress, level, workers):
+            offset, length = writer.add(member)
+            archived.append((file_path, offset, length))
+
+        writer.close()
+        fp.flush()
+        os.fsync(fp.fileno())
+
+    journal.unlink()
+    return archived
+
+
+def daily_archive_path(source: str, day: str, archive_format: str) -> Path:
     """
-    Архивирует и удаляет старые CSV-файлы из экспортных директорий.
-    Создаёт ZIP-файл с временной меткой и переносит его в папку архивов.
+    Путь к открытому (ещё пополняемому) дневному архиву источника.
+
+    Если архив за этот день уже закрывался (лежит в ARCHIVE_DIR или известен каталогу,
+    хотя сам файл уже загружен и удалён), новый получает номер: `<источник>_<дата>-2.<формат>`.
+    Имя выбирается при создании архива, так что закрытие его не меняет и смещения
+    в каталоге остаются верными.
+    """
+    stem = f'{source}_{day}'
+    sequence = 1
+    while True:
+        name = f'{stem}.{archive_format}' if sequence == 1 else f'{stem}-{sequence}.{archive_format}'
+        archive_path = Path(ARCHIVE_OPEN_DIR) / name
+        if archive_path.exists() or not (
+                (Path(ARCHIVE_DIR) / name).exists() or archive_known(name)):
+            return archive_path
+        sequence += 1
+
+
+def seal_daily_archives(before_day: str):
+    """
+    Переносит дневные архивы за дни раньше before_day из open/ в ARCHIVE_DIR,
+    откуда их забирает загрузчик. В такие дни новые файлы уже не попадут.
+    Закрытый архив с тем же именем не перезаписывается: такой архив остаётся
+    в open/ до ручного разбора.
+    """
+    for archive_path in Path(ARCHIVE_OPEN_DIR).iterdir():
+        name = archive_path.name
+        if name.endswith('.journal'):
+            continue
+        archive_format = (ARCHIVE_FORMAT_TAR_ZST if name.endswith('.tar.zst')
+                          else ARCHIVE_FORMAT_ZIP)
+        # <источник>_<дата>[-<номер>].<формат>
+        day = name[:-len(archive_format) - 1].rsplit('_', 1)[-1][:10]
+        if day >= before_day:
+            continue
+
+        recover_archive(archive_path, archive_format)
+        sealed_path = Path(ARCHIVE_DIR) / name
+        if sealed_path.exists():
+            logger.error(f'❌ Закрытый архив {name} уже существует, {archive_path} не переносим')
+            continue
+        os.replace(archive_path, sealed_path)
+        logger.info(f'✅ Дневной архив закрыт: {name}')
+    fsync_dir(ARCHIVE_DIR)
+
+
+def _get_stream_backend() -> StorageBackend | None:
+    """
+    Хранилище для потокового режима; None, если оно не умеет принимать объект частями.
+    """
+    global _stream_backend
+    if _stream_backend is None:
+        _stream_backend = create_backend()
+        if not _stream_backend.supports_streaming:
+            logger.warning(f'⚠️ Хранилище {_stream_backend.name} не поддерживает потоковую '
+                           f'загрузку, архивы пишутся локально')
+    return _stream_backend if _stream_backend.supports_streaming else None
+
+
+def stream_archive(
+    backend: StorageBackend,
+    object_name: str,
+    files: list[Path],
+    archive_format: str,
+) -> list[tuple[Path, int, int]]:
+    """
+    Сжимает файлы сразу в потоковую загрузку: архив не записывается на локальный диск.
+    При ошибке загрузка отменяется, и исключение пробрасывается вызывающему.
+    """
+    with backend.stream_upload(object_name, UPLOAD_CHUNK_SIZE) as stream:
+        archived = write_archive(stream, files, archive_format)
+    logger.info(f'☁️ Архив {object_name} загружен потоково в {backend.name}')
+    return archived
+
+
+def _archive_group(source: str, day: str, files: list[Path],
+                   archive_format: str) -> tuple[str, list[tuple[Path, int, int]]]:
     """
-    threshold_time = datetime.utcnow() - timedelta(hours=ARCHIVE_AGE_THRESHOLD)
-    timestamp_str = datetime.utcnow().strftime('%Y-%m-%d_%H-%M-%S')
+    Архивирует файлы одной группы. В потоковом режиме отдаёт их в хранилище,
+    а на локальный дневной архив переключается, только если хранилище недоступно.
+
+    :return: (имя архива, список (файл, смещение, длина))
+    """
+    if ARCHIVE_STREAM_UPLOAD:
+        backend = _get_stream_backend()
+        if backend is not None:
+            # Удалённый объект не дописать, поэтому каждый пакет — отдельный архив
+            object_name = f'{source}_{day}_{int(time.time() * 1000)}.{archive_format}'
+            try:
+                return object_name, stream_archive(backend, object_name, files, archive_format)
+            except Exception as e:
+                logger.warning(f'⚠️ Хранилище {backend.name} недоступно ({e}), '
+                               f'сохраняем выгрузки в локальный архив')
+                try:
+                    backend.connect()
+                except Exception:
+                    pass
+
+    archive_path = daily_archive_path(source, day, archive_format)
+    archived = append_to_archive(archive_path, files, archive_format)
+    logger.info(f'➕ В архив {archive_path.name} добавлено файлов: {len(archived)}')
+    return archive_path.name, archived
+
 
-    for source_dir in [EXPORT_PINNACLE_DIR, EXPORT_ANALYZER_DIR]:
-        source_path = Path(source_dir)
-        source_name = source_path.name
+def archive_entries(entries: list[ManifestEntry], archive_format: str):
+    """
+    Раскладывает записи манифеста по дневным архивам (источник + день выгрузки),
+    дописывает в них файлы и заносит их смещения в каталог архивов.
+    После успешной записи исходные CSV удаляются.
+    """
+    groups: dict[tuple[str, str], list[ManifestEntry]] = defaultdict(list)
+    for entry in entries:
+        day = datetime.utcfromtimestamp(entry.exported_at).strftime('%Y-%m-%d')
+        groups[(entry.source, day)].append(entry)
 
-        files_to_archive = [
-            file_path for file_path in source_path.glob('*.csv')
-            if datetime.utcfromtimestamp(file_path.stat().st_mtime) < threshold_time
-        ]
+    for (source, day), group in groups.items():
+        files = []
+        by_path = {}
+        for entry in group:
+            path = Path(entry.path)
+            if path.exists():
+                files.append(path)
+                by_path[path] = entry
+            else:
+                logger.warning(f'⚠️ Файл из манифеста не найден: {entry.path}')
 
-        if not files_to_archive:
-            logger.info(
-                f'📁 Нет файлов старше {ARCHIVE_AGE_THRESHOLD} часов в {source_name}, пропускаем')
+        if not files:
             continue
 
-        archive_name = f'{source_name}_{timestamp_str}.zip'
-        archive_path = Path(ARCHIVE_DIR) / archive_name
+        archive_name, archived = _archive_group(source, day, files, archive_format)
+        ARCHIVED_FILES.inc(source, amount=len(archived))
 
-        with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for file_path in files_to_archive:
-                zipf.write(file_path, arcname=file_path.name)
-                logger.info(f'➕ Добавлен в архив: {file_path.name}')
+        # Каталог пишется до удаления CSV: после сбоя файлы заархивируются
+        # повторно и записи каталога обновятся
+        record_members([
+            CatalogEntry(
+                archive=archive_name,
+                member=file_path.name,
+                format=archive_format,
+                source=source,
+                match_id=by_path[file_path].match_id,
+                date=by_path[file_path].date,
+                sport=by_path[file_path].sport,
+                outcome=by_path[file_path].outcome,
+                offset=offset,
+                length=length,
+                size=by_path[file_path].size,
+            )
+            for file_path, offset, length in archived
+        ])
 
-        for file_path in files_to_archive:
+        for file_path, _, _ in archived:
             try:
                 os.remove(file_path)
-                logger.info(f'🗑️ Удалён: {file_path.name}')
             except Exception as e:
                 logger.warning(f'❌ Ошибка при удалении {file_path.name}: {e}')
 
-        logger.info(f'✅ Архив создан: {archive_path}')
+
+def archive_manifest_exports(archive_format: str = ARCHIVE_FORMAT):
+    """
+    Архивирует выгрузки старше ARCHIVE_AGE_THRESHOLD часов по манифесту.
+
+    Вместо листинга экспортных директорий архиватор читает манифест от курсора
+    и дописывает файлы в дневные архивы. Дни, в которые уже ничего не попадёт,
+    закрываются и переносятся в ARCHIVE_DIR.
+    """
+    archive_format = resolve_archive_format(archive_format)
+    bootstrap_manifest()
+
+    horizon = time.time() - ARCHIVE_AGE_THRESHOLD * 3600
+    reader = ManifestReader()
+    total = 0
+
+    while True:
+        entries, offset, exhausted = reader.take_older_than(horizon)
+        if entries:
+            archive_entries(entries, archive_format)
+            total += len(entries)
+        if not entries and not exhausted:
+            break
+        reader.commit(offset, exhausted)
+        if not exhausted:
+            break
+
+    if not total:
+        logger.info(f'📁 Нет выгрузок старше {ARCHIVE_AGE_THRESHOLD} часов, пропускаем')
+
+    horizon_day = datetime.utcfromtimestamp(horizon).strftime('%Y-%m-%d')
+    seal_daily_archives(horizon_day)
 
 
 async def run_archiver_loop():
     """
-    Запускает бесконечный цикл проверки и архивации старых CSV-файлов.
+    Запускает бесконечный цикл архивации старых CSV-файлов.
+    Архивация выполняется в отдельном потоке и не блокирует event loop.
+    В кластере цикл выполняет только экземпляр, взявший лок 'archiver'.
     """
     while True:
-        logger.info('📦 Запущен архиватор: проверка старых CSV-файлов...')
-        zip_and_cleanup_yesterdays_exports()
+        logger.info('📦 Запущен архиватор: проверка манифеста выгрузок...')
+        try:
+            async with cluster_lock('archiver') as acquired:
+                if acquired:
+                    with ARCHIVE_CYCLE_SECONDS.time():
+                        await asyncio.to_thread(archive_manifest_exports)
+                else:
+                    logger.info('📦 Архивацию выполняет другой экземпляр, пропускаем')
+        except Exception as e:
+            logger.error(f'❌ Ошибка архивации: {e}')
         await asyncio.sleep(ARCHIVE_INTERVAL)
@@ -0,0 +1,303 @@
+"""
+Обратная загрузка архивных CSV Pinnacle в live_odds_parsed (scripts/backfill_import.py).
+
+Поток читает CSV прямо из архивов (zip или tar.zst, целиком или по каталогу),
+не распаковывая их на диск, и кладёт в ограниченную очередь. Воркеры разворачивают
+широкие строки CSV_PINNACLE_COLUMNS обратно в строки live_odds_parsed в пуле
+процессов и загружают каждый CSV через COPY. В той же транзакции пишется отметка
+в backfill_checkpoints, так что прерванный импорт можно просто запустить заново.
+
+Значения линий в CSV не хранятся — только номера слотов, поэтому у загруженных
+строк line пустой, а слот записан в line_slot (у Win1x2 — NULL): строки Totals_1/2/3
+остаются различимыми, а разворот кладёт их обратно в те же колонки CSV.
+key_hash считается как у живых строк, source = 'backfill'.
+"""
+
+import asyncio
+import csv
+import io
+import logging
+import tarfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator
+
+import asyncpg
+
+from app.archive_catalog import find_members, read_member
+from app.archive_format import ARCHIVE_FORMAT_TAR_ZST, zstandard
+from app.config import settings
+from app.constants.settings import ALLOWED_SPORTS, BACKFILL_QUEUE_SIZE, BACKFILL_WORKERS
+from app.last_seen import SOURCE_PINNACLE
+from app.pivot import unpivot_snapshot_row
+from app.utils import generate_pinnacle_key_hash, safe_parse_iso, sanitize_filename_part
+
+
+logger = logging.getLogger(__name__)
+
+# Значение source у загруженных строк: по нему их можно отличить от живых и удалить
+SOURCE_BACKFILL = 'backfill'
+
+# Порядок колонок COPY в live_odds_parsed (id заполняет последовательность)
+COPY_COLUMNS = ('match_id', 'home_team', 'away_team', 'home_score', 'away_score',
+                'sport_name', 'source', 'period', 'market', 'outcome', 'line', 'line_slot',
+                'value', 'created_at', 'key_hash')
+
+# Вид спорта в имени файла очищен sanitize_filename_part: soccer → Soccer
+_SPORT_NAMES = {sanitize_filename_part(sport): sport for sport in ALLOWED_SPORTS}
+
+
+@dataclass
+class BackfillMember:
+    """
+    CSV из архива, ожидающий загрузки.
+
+    Поля:
+    - archive, member: Архив и имя CSV внутри него (ключ отметки прогресса)
+    - match_id, sport: Атрибуты матча из каталога или имени файла
+    - data: Содержимое CSV
+    """
+    archive: str
+    member: str
+    match_id: int | None
+    sport: str | None
+    data: bytes
+
+
+def parse_member_name(member: str) -> tuple[int | None, str | None]:
+    """
+    Достаёт match_id и вид спорта из имени выгрузки (см. format_filename):
+    123456_2025-04-07_team1_vs_team2_soccer.csv → (123456, 'Soccer').
+    """
+    parts = Path(member).stem.split('_')
+    try:
+        match_id = int(parts[0])
+    except ValueError:
+        match_id = None
+    sport = _SPORT_NAMES.get(parts[-1], parts[-1]) if len(parts) > 1 else None
+    return match_id, sport
+
+
+def iter_archive(archive_path: Path) -> Iterator[BackfillMember]:
+    """
+    Последовательно читает CSV из архива: zip — по центральному каталогу,
+    tar.zst — потоком через распаковщик (члены — отдельные zstd-фреймы).
+    """
+    archive_path = Path(archive_path)
+    if archive_path.name.endswith(f'.{ARCHIVE_FORMAT_TAR_ZST}'):
+        if zstandard is None:
+            raise RuntimeError('Для чтения tar.zst нужен пакет zstandard')
+        with open(archive_path, 'rb') as fp:
+            reader = zstandard.ZstdDecompressor().stream_reader(fp, read_across_frames=True)
+            with tarfile.open(fileobj=reader, mode='r|') as tar:
+                for info in tar:
+                    if info.isfile() and info.name.endswith('.csv'):
+                        yield BackfillMember(archive_path.name, info.name,
+                                             *parse_member_name(info.name),
+                                             tar.extractfile(info).read())
+        return
+
+    with zipfile.ZipFile(archive_path) as zf:
+        for info in zf.infolist():
+            if not info.is_dir() and info.filename.endswith('.csv'):
+                yield BackfillMember(archive_path.name, info.filename,
+                                     *parse_member_name(info.filename), zf.read(info))
+
+
+def iter_catalog(
+    match_id: int | None = None,
+    date: str | None = None,
+    sport: str | None = None,
+) -> Iterator[BackfillMember]:
+    """
+    Читает CSV Pinnacle, найденные в каталоге архивов, по смещениям —
+    остальное содержимое архивов не распаковывается.
+    """
+    for entry in find_members(match_id=match_id, date=date, sport=sport, source=SOURCE_PINNACLE):
+        name_match_id, name_sport = parse_member_name(entry.member)
+        yield BackfillMember(entry.archive, entry.member,
+                             entry.match_id if entry.match_id is not None else name_match_id,
+                             entry.sport or name_sport, read_member(entry))
+
+
+def _to_int(raw: str | None) -> int | None:
+    try:
+        return int(float(raw))
+    except (TypeError, ValueError):
+        return None
+
+
+def unpivot_member(data: bytes, match_id: int, sport: str | None) -> list[tuple]:
+    """
+    Разворачивает CSV матча в кортежи строк live_odds_parsed (порядок COPY_COLUMNS).
+    Строка CSV без коэффициентов даёт заглушку meta, как у писателя. Строки без
+    CreatedAt или с нечитаемым CreatedAt пропускаются: created_at обязателен.
+    Выполняется в пуле процессов: на вход и выход только простые значения.
+    """
+    records = []
+    key_hashes: dict[tuple[str | None, str, str], str] = {}
+    sport = sport or ''
+
+    for row in csv.DictReader(io.StringIO(data.decode('utf-8'))):
+        try:
+            created_at = safe_parse_iso(row.get('CreatedAt'))
+        except (TypeError, ValueError):
+            continue
+        if created_at.tzinfo is not None:
+            created_at = created_at.replace(tzinfo=None)
+        period = row.get('PeriodType') or None
+        home = row.get('homeName') or ''
+        away = row.get('awayName') or ''
+        home_score = _to_int(row.get('HomeScore'))
+        away_score = _to_int(row.get('AwayScore'))
+
+        values = unpivot_snapshot_row(row) or [('meta', 'meta', None, None)]
+        for market, outcome, slot, value in values:
+            key = (period, market, outcome)
+            key_hash = key_hashes.get(key)
+            if key_hash is None:
+                key_hash = key_hashes[key] = generate_pinnacle_key_hash(
+                    match_id, period, market, outcome)
+            records.append((match_id, home, away, home_score, away_score, sport,
+                            SOURCE_BACKFILL, period, market, outcome, None, slot, value,
+                            created_at, key_hash))
+
+    return records
+
+
+def asyncpg_dsn(database_url: str) -> str:
+    """
+    DSN для asyncpg из URL SQLAlchemy (postgresql+asyncpg://... → postgresql://...).
+    """
+    return database_url.replace('+asyncpg', '', 1)
+
+
+async def load_checkpoints(pool: asyncpg.Pool) -> set[tuple[str, str]]:
+    rows = await pool.fetch('SELECT archive, member FROM backfill_checkpoints')
+    return {(row['archive'], row['member']) for row in rows}
+
+
+async def copy_member(pool: asyncpg.Pool, member: BackfillMember, records: list[tuple]) -> bool:
+    """
+    Отмечает CSV загруженным и загружает его строки через COPY в одной транзакции,
+    чтобы после сбоя не было ни потерь, ни дублей. Отметка пишется первой:
+    если тот же CSV уже загрузил параллельный запуск, транзакция откатывается.
+
+    :return: False, если CSV уже был загружен
+    """
+    async with pool.acquire() as conn:
+        try:
+            async with conn.transaction():
+                await conn.execute(
+                    'INSERT INTO backfill_checkpoints '
+                    '(archive, member, match_id, rows, imported_at) VALUES ($1, $2, $3, $4, $5)',
+                    member.archive, member.member, member.match_id, len(records),
+                    datetime.utcnow())
+                if records:
+                    await conn.copy_records_to_table('live_odds_parsed', records=records,
+                                                     columns=COPY_COLUMNS)
+        except asyncpg.UniqueViolationError:
+            return False
+    return True
+
+
+def _produce(
+    members: Iterator[BackfillMember],
+    queue: asyncio.Queue,
+    loop: asyncio.AbstractEventLoop,
+    done: set[tuple[str, str]],
+    workers: int,
+    stop: threading.Event,
+):
+    """
+    Поток чтения архивов: кладёт CSV в очередь, ожидая свободного места, —
+    в памяти одновременно не больше BACKFILL_QUEUE_SIZE распакованных файлов.
+    """
+    try:
+        for member in members:
+            if stop.is_set():
+                break
+            if (member.archive, member.member) in done:
+                continue
+            if member.match_id is None:
+                logger.warning(f'⚠️ Не удалось определить матч {member.member} '
+                               f'в {member.archive}, пропускаем')
+                continue
+            asyncio.run_coroutine_threadsafe(queue.put(member), loop).result()
+    except Exception as e:
+        logger.error(f'❌ Ошибка чтения архивов: {e}')
+    finally:
+        for _ in range(workers):
+            asyncio.run_coroutine_threadsafe(queue.put(None), loop).result()
+
+
+async def _worker(pool: asyncpg.Pool, queue: asyncio.Queue,
+                  executor: ProcessPoolExecutor, totals: dict[str, int]):
+    loop = asyncio.get_running_loop()
+    while True:
+        member = await queue.get()
+        if member is None:
+            return
+        try:
+            records = await loop.run_in_executor(
+                executor, unpivot_member, member.data, member.match_id, member.sport)
+            loaded = await copy_member(pool, member, records)
+        except Exception as e:
+            totals['failed'] += 1
+            logger.error(f'❌ Ошибка загрузки {member.member} из {member.archive}: {e}')
+            continue
+        if loaded:
+            totals['files'] += 1
+            totals['rows'] += len(records)
+
+
+async def run_backfill(
+    members: Iterator[BackfillMember],
+    workers: int = BACKFILL_WORKERS,
+    queue_size: int = BACKFILL_QUEUE_SIZE,
+    dsn: str | None = None,
+) -> dict[str, int]:
+    """
+    Загружает CSV в live_odds_parsed: чтение архивов в отдельном потоке, разворот
+    в пуле из workers процессов и COPY из workers соединений. Уже отмеченные
+    в backfill_checkpoints CSV пропускаются.
+
+    :return: Счётчики files, rows, failed
+    """
+    totals = {'files': 0, 'rows': 0, 'failed': 0}
+    started = time.monotonic()
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(queue_size)
+    stop = threading.Event()
+
+    async with asyncpg.create_pool(dsn or asyncpg_dsn(settings.database_url), min_size=workers,
+                                   max_size=workers) as pool:
+        done = await load_checkpoints(pool)
+        if done:
+            logger.info(f'⏭️ Уже загружено файлов: {len(done)}, они будут пропущены')
+
+        with ProcessPoolExecutor(workers) as executor:
+            reader = threading.Thread(target=_produce, name='backfill-reader', daemon=True,
+                                      args=(members, queue, loop, done, workers, stop))
+            reader.start()
+            try:
+                await asyncio.gather(*(_worker(pool, queue, executor, totals)
+                                       for _ in range(workers)))
+            finally:
+                stop.set()
+                # Освобождаем поток, если он ждёт места в очереди
+                while reader.is_alive():
+                    while not queue.empty():
+                        queue.get_nowait()
+                    await asyncio.sleep(0.1)
+
+    elapsed = time.monotonic() - started
+    logger.info(f'✅ Обратная загрузка: файлов {totals["files"]}, строк {totals["rows"]}, '
+                f'ошибок {totals["failed"]} за {elapsed:.1f} с '
+                f'({totals["rows"] / max(elapsed, 1e-9):.0f} строк/с)')
+    return totals
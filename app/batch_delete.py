@@ -0,0 +1,93 @@
+import logging
+from datetime import datetime
+
+from sqlalchemy import Column, Table
+
+from app.cluster import release_matches
+from app.constants.settings import EXPORT_DELETE_BATCH_SIZE
+from app.db import SessionLocal
+from app.last_seen import delete_exported_last_seen, exported_watermarks
+from app.metrics import EXPORTED_MATCHES
+
+
+logger = logging.getLogger(__name__)
+
+
+class MatchDeleteBatcher:
+    """
+    Копит ID выгруженных матчей и удаляет их из базы пачками: один
+    `DELETE ... USING unnest(:match_ids, :watermarks)` и один коммит на пачку.
+
+    В батчер можно добавлять только матчи, чьи CSV уже записаны и сброшены
+    на диск (fsync), — тогда порядок «выгрузка, затем удаление» сохраняется.
+    Вместе с матчем передаётся отметка выгрузки — последний created_at,
+    попавший в CSV. Удаляются только строки не новее отметки, а запись
+    match_last_seen — только если матч с тех пор не обновлялся: данные,
+    пришедшие после выгрузки, дождутся следующей.
+
+    Без таблицы (сырые тики в сегментах, см. app.segment_store) удаляются
+    только записи match_last_seen и аренды выгрузки.
+    """
+
+    def __init__(
+        self,
+        table: Table | None,
+        match_column: Column | None,
+        source: str,
+        batch_size: int = EXPORT_DELETE_BATCH_SIZE,
+    ):
+        """
+        :param table: Таблица с данными матчей (None — данные не в базе),
+            с колонкой created_at
+        :param match_column: Колонка ID матча в этой таблице
+        :param source: Источник в match_last_seen
+        :param batch_size: Размер пачки (матчей на транзакцию)
+        """
+        self.table = table
+        self.match_column = match_column
+        self.source = source
+        self.batch_size = batch_size
+        self.pending: dict[int, datetime] = {}
+
+    async def add(self, match_id: int, watermark: datetime) -> int:
+        """
+        Ставит матч на удаление; при заполнении пачки сразу её удаляет.
+
+        :param watermark: Последний created_at матча, попавший в выгрузку
+        """
+        self.pending[match_id] = watermark
+        if len(self.pending) >= self.batch_size:
+            await self.flush()
+        return match_id
+
+    async def flush(self):
+        """
+        Удаляет накопленные матчи одной транзакцией. Если транзакция не прошла,
+        матчи остаются в очереди до следующего сброса.
+        """
+        if not self.pending:
+            return
+
+        watermarks, self.pending = self.pending, {}
+        match_ids = list(watermarks)
+        try:
+            async with SessionLocal() as session:
+                if self.table is not None:
+                    exported = exported_watermarks(watermarks)
+                    await session.execute(
+                        self.table.delete().where(
+                            self.match_column == exported.c.match_id,
+                            self.table.c.created_at <= exported.c.watermark)
+                    )
+                await delete_exported_last_seen(session, self.source, watermarks)
+                await release_matches(session, self.source, match_ids)
+                await session.commit()
+        except Exception:
+            # CSV этих матчей уже на диске: возвращаем их в очередь, чтобы удалить
+            # следующим сбросом, а не выгружать заново. Матч, добавленный за время
+            # сброса, сохраняет более свежую отметку.
+            for match_id, watermark in watermarks.items():
+                self.pending.setdefault(match_id, watermark)
+            raise
+        EXPORTED_MATCHES.inc(self.source, amount=len(match_ids))
+        logger.info(f'🗑️ Удалено {len(match_ids)} выгруженных матчей ({self.source})')
@@ -0,0 +1,231 @@
+"""
+Координация нескольких экземпляров сервиса через Postgres (CLUSTER_ENABLED).
+
+- Членство: каждый экземпляр отмечается в cluster_instances; живые экземпляры,
+  отсортированные по ID, делят поток на шарды по match_id или виду спорта.
+  Смена состава (запуск, остановка, падение) меняет шарды при следующей отметке.
+- Выгрузка: матч выгружает только экземпляр, захвативший аренду в export_leases.
+  Аренда снимается в одной транзакции с удалением матча из базы.
+- Архивация и загрузка: цикл выполняет только экземпляр, взявший advisory-лок.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+import zlib
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Any, Iterable
+
+from sqlalchemy import any_, delete, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.constants.settings import (CLUSTER_ENABLED, CLUSTER_HEARTBEAT_INTERVAL,
+                                    CLUSTER_MEMBER_TTL, CLUSTER_SHARD_BY,
+                                    EXPORT_LEASE_SECONDS)
+from app.db import SessionLocal, get_engine
+from app.models import ClusterInstance, ExportLease
+from app.utils import match_ids_param
+
+
+logger = logging.getLogger(__name__)
+
+SHARD_BY_MATCH = 'match'
+SHARD_BY_SPORT = 'sport'
+
+
+def new_instance_id() -> str:
+    return f'{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}'
+
+
+def shard_key(message: dict[str, Any], shard_by: str = CLUSTER_SHARD_BY) -> int | None:
+    """
+    Ключ шардирования сообщения Pinnacle или анализатора. Матч анализатора
+    шардируется по match_id Pinnacle, поэтому оба источника одного матча
+    попадают к одному экземпляру.
+    """
+    if shard_by == SHARD_BY_SPORT:
+        sport = message.get('SportName') or message.get('sportName')
+        return zlib.crc32(sport.encode('utf-8')) if sport else None
+
+    first = message.get('first')
+    match_id = first.get('matchId') if isinstance(first, dict) else message.get('MatchId')
+    try:
+        return int(match_id)
+    except (TypeError, ValueError):
+        return None
+
+
+class ClusterMembership:
+    """
+    Состав кластера глазами текущего экземпляра и его шард.
+    Пока кластерный режим выключен, экземпляр один и владеет всем потоком.
+    """
+
+    def __init__(self, instance_id: str | None = None, shard_by: str = CLUSTER_SHARD_BY):
+        self.instance_id = instance_id or new_instance_id()
+        self.shard_by = shard_by
+        self.hostname = socket.gethostname()
+        self.started_at = datetime.utcnow()
+        self.members: list[str] = [self.instance_id]
+        self.index = 0
+        self.count = 1
+
+    def owns_message(self, message: dict[str, Any]) -> bool:
+        """
+        Проверяет, что сообщение относится к шарду этого экземпляра.
+        Сообщения без ключа обрабатывает первый экземпляр.
+        """
+        if self.count == 1:
+            return True
+        key = shard_key(message, self.shard_by)
+        if key is None:
+            return self.index == 0
+        return key % self.count == self.index
+
+    def _apply_members(self, members: list[str]):
+        if self.instance_id not in members:
+            members = sorted(members + [self.instance_id])
+        if members == self.members:
+            return
+        self.members = members
+        self.index = members.index(self.instance_id)
+        self.count = len(members)
+        logger.info(f'🔄 Состав кластера изменился: {self.count} экземпляров, '
+                    f'наш шард {self.index} (по {self.shard_by})')
+
+    async def heartbeat(self, register: bool = True):
+        """
+        Обновляет отметку экземпляра (если register) и перечитывает состав кластера.
+        Процессы записи в многопроцессном режиме только читают состав.
+        """
+        now = datetime.utcnow()
+        alive_since = now - timedelta(seconds=CLUSTER_MEMBER_TTL)
+        async with SessionLocal() as session:
+            if register:
+                stmt = pg_insert(ClusterInstance).values(
+                    instance_id=self.instance_id, hostname=self.hostname,
+                    started_at=self.started_at, heartbeat_at=now,
+                )
+                await session.execute(stmt.on_conflict_do_update(
+                    index_elements=[ClusterInstance.instance_id],
+                    set_={'heartbeat_at': stmt.excluded.heartbeat_at},
+                ))
+                await session.execute(delete(ClusterInstance).where(
+                    ClusterInstance.heartbeat_at < alive_since))
+                # Аренды матчей, которые так и не дошли до удаления (нет данных, ошибка)
+                await session.execute(delete(ExportLease).where(ExportLease.expires_at < now))
+                await session.commit()
+
+            result = await session.execute(
+                select(ClusterInstance.instance_id)
+                .where(ClusterInstance.heartbeat_at >= alive_since)
+                .order_by(ClusterInstance.instance_id)
+            )
+            self._apply_members([row[0] for row in result.all()])
+
+    async def leave(self):
+        """
+        Удаляет отметку экземпляра при остановке, чтобы остальные
+        перераспределили шарды сразу, не дожидаясь CLUSTER_MEMBER_TTL.
+        """
+        async with SessionLocal() as session:
+            await session.execute(delete(ClusterInstance).where(
+                ClusterInstance.instance_id == self.instance_id))
+            await session.commit()
+
+    async def run_heartbeat_loop(self, register: bool = True):
+        """
+        Вечный цикл отметок. При остановке экземпляр выходит из кластера.
+        """
+        try:
+            while True:
+                try:
+                    await self.heartbeat(register)
+                except Exception as e:
+                    logger.error(f'❌ Ошибка отметки в кластере: {e}')
+                await asyncio.sleep(CLUSTER_HEARTBEAT_INTERVAL)
+        finally:
+            if register:
+                await asyncio.shield(self.leave())
+
+
+membership = ClusterMembership()
+
+
+async def claim_matches(source: str, match_ids: Iterable[int]) -> list[int]:
+    """
+    Захватывает аренды выгрузки матчей и возвращает те, что достались этому
+    экземпляру. Чужая аренда перехватывается, только если она истекла.
+    Без кластерного режима возвращает все матчи.
+    """
+    match_ids = list(match_ids)
+    if not CLUSTER_ENABLED or not match_ids:
+        return match_ids
+
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=EXPORT_LEASE_SECONDS)
+    stmt = pg_insert(ExportLease).values([
+        {'source': source, 'match_id': match_id,
+         'owner': membership.instance_id, 'expires_at': expires_at}
+        for match_id in sorted(match_ids)
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ExportLease.source, ExportLease.match_id],
+        set_={'owner': stmt.excluded.owner, 'expires_at': stmt.excluded.expires_at},
+        where=(ExportLease.expires_at < now) | (ExportLease.owner == stmt.excluded.owner),
+    ).returning(ExportLease.match_id)
+
+    async with SessionLocal() as session:
+        result = await session.execute(stmt)
+        claimed = [row[0] for row in result.all()]
+        await session.commit()
+
+    if len(claimed) < len(match_ids):
+        logger.info(f'🤝 {len(match_ids) - len(claimed)} матчей ({source}) '
+                    f'выгружает другой экземпляр')
+    return claimed
+
+
+async def release_matches(session: AsyncSession, source: str, match_ids: Iterable[int]):
+    """
+    Снимает аренды выгруженных матчей. Коммит остаётся за вызывающим кодом.
+    """
+    match_ids = list(match_ids)
+    if not CLUSTER_ENABLED or not match_ids:
+        return
+
+    await session.execute(delete(ExportLease).where(
+        ExportLease.source == source,
+        ExportLease.owner == membership.instance_id,
+        ExportLease.match_id == any_(match_ids_param(match_ids)),
+    ))
+
+
+@asynccontextmanager
+async def cluster_lock(name: str):
+    """
+    Сессионный advisory-лок Postgres на время цикла (архивация, загрузка).
+    Отдаёт True, если лок взят, и False, если цикл уже выполняет другой
+    экземпляр. Без кластерного режима всегда отдаёт True.
+
+    Пример:
+        async with cluster_lock('archiver') as acquired:
+            if acquired:
+                ...
+    """
+    if not CLUSTER_ENABLED:
+        yield True
+        return
+
+    key = zlib.crc32(f'pinnacle_streamer:{name}'.encode('utf-8'))
+    async with get_engine().connect() as conn:
+        acquired = await conn.scalar(text('SELECT pg_try_advisory_lock(:key)'), {'key': key})
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                await conn.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': key})
@@ -4,132 +4,217 @@ import logging
 import os
 from datetime import datetime, timedelta
 
-from sqlalchemy import select, func
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.batch_delete import MatchDeleteBatcher
+from app.cluster import claim_matches
 from app.constants.settings import OUTDATED_THRESHOLD, EXPORT_INTERVAL_SECONDS
 from app.db import SessionLocal
+from app.last_seen import (SOURCE_ANALYZER, delete_last_seen, find_stale_match_ids,
+                           is_match_stale)
+from app.manifest import append_exports, make_entry
+from app.match_finish import analyzer_finish_tracker
+from app.metrics import EXPORT_CYCLE_SECONDS
+from app.profiling import cycle, span
 from app.models import AnalyzerOddsParsed
 from app.constants.csv_columns import CSV_ANALYZER_COLUMNS
 from app.constants.paths import EXPORT_ANALYZER_DIR
-from app.utils import format_filename
+from app.utils import format_filename, fsync_dir
 
 
 logger = logging.getLogger(__name__)
 
+# Поллинг и событийная выгрузка не должны выгружать один матч одновременно
+_export_lock = asyncio.Lock()
+
 
 async def collect_and_export_old_analyzer_data():
     """
-    Находит и экспортирует устаревшие матчи анализатора, затем удаляет их из базы.
+    Находит и экспортирует устаревшие матчи анализатора, затем удаляет их из базы
+    пачками по EXPORT_DELETE_BATCH_SIZE матчей на транзакцию.
     """
     now = datetime.utcnow()
     outdated_time = now - timedelta(hours=OUTDATED_THRESHOLD)
 
+    batcher = _new_delete_batcher()
+
     async with SessionLocal() as session:
-        match_keys = await find_stale_analyzer_matches(session, outdated_time)
+        match_ids = await find_stale_analyzer_matches(session, outdated_time)
+        match_ids = await claim_matches(SOURCE_ANALYZER, match_ids)
 
-        for match_id, outcome in match_keys:
-            await export_and_delete_analyzer_match(session, match_id, outcome)
+        async with _export_lock, EXPORT_CYCLE_SECONDS.time(SOURCE_ANALYZER), \
+                cycle('export_analyzer'):
+            for match_id in match_ids:
+                await export_and_delete_analyzer_match(session, match_id, batcher)
+            await batcher.flush()
 
 
 async def find_stale_analyzer_matches(
         session: AsyncSession,
         outdated_time: datetime
-) -> list[tuple[int, str]]:
+) -> list[int]:
     """
-    Возвращает список пар (match_id_pinnacle, outcome), устаревших по времени.
+    Возвращает список match_id_pinnacle, по которым не было данных дольше указанного времени.
+    Читает компактную таблицу match_last_seen, а не агрегирует analyzer_odds_parsed.
     """
-    subquery = (
-        select(
-            AnalyzerOddsParsed.match_id_pinnacle,
-            AnalyzerOddsParsed.outcome,
-            func.max(AnalyzerOddsParsed.created_at).label('max_created_at')
-        )
-        .group_by(AnalyzerOddsParsed.match_id_pinnacle, AnalyzerOddsParsed.outcome)
-        .subquery()
-    )
+    match_ids = await find_stale_match_ids(session, SOURCE_ANALYZER, outdated_time)
+    logger.info(f'🔍 Найдено {len(match_ids)} устаревших матчей-анализов')
+    return match_ids
 
-    result = await session.execute(
-        select(subquery.c.match_id_pinnacle, subquery.c.outcome)
-        .where(subquery.c.max_created_at < outdated_time)
-    )
 
-    match_keys = result.all()
-    logger.info(f'🔍 Найдено {len(match_keys)} устаревших матчей-анализов')
-    return match_keys
+def _analyzer_csv_row(row: AnalyzerOddsParsed) -> dict:
+    """
+    Преобразует строку AnalyzerOddsParsed в словарь по шаблону CSV_ANALYZER_COLUMNS.
+    """
+    return {
+        'createdAt': row.raw_created_at,
+        'sportName': row.sport_name,
+        'matchId_pinnacle': row.match_id_pinnacle,
+        'matchId_lobbet': row.match_id_lobbet,
+        'homeName': row.home_team,
+        'awayName': row.away_team,
+        'homeScore': row.home_score,
+        'awayScore': row.away_score,
+        'league_pinnacle': row.league_pinnacle,
+        'league_lobbet': row.league_lobbet,
+        'bookmaker_1': 'Pinnacle',
+        'bookmaker_2': 'Lobbet',
+        'market': row.market_type,
+        'outcome': row.outcome,
+        'value_pinnacle': row.value_pinnacle,
+        'value_lobbet': row.value_lobbet,
+        'roi': row.roi,
+        'margin': row.margin,
+        'marketType': row.market_type,
+    }
 
 
 async def export_and_delete_analyzer_match(
         session: AsyncSession,
         match_id: int,
-        outcome: str
+        batcher: MatchDeleteBatcher
 ):
     """
-    Экспортирует данные по паре (match_id, outcome) в CSV и удаляет их из базы.
+    Экспортирует все исходы матча анализатора за один проход и ставит матч
+    в пачку на удаление.
+
+    Строки читаются одним запросом, отсортированными по outcome, и по мере чтения
+    раскладываются по CSV-файлам — по одному файлу на исход, как и раньше
+    (имя файла формирует format_filename). Каждый файл сбрасывается на диск
+    и регистрируется в манифесте выгрузок до того, как матч попадёт в батчер.
     """
-    logger.info(f'📦 Экспорт анализатора: match={match_id}, outcome={outcome}')
+    logger.info(f'📦 Экспорт анализатора: match={match_id}')
 
-    result = await session.stream(
-        select(AnalyzerOddsParsed).where(
-            AnalyzerOddsParsed.match_id_pinnacle == match_id,
-            AnalyzerOddsParsed.outcome == outcome
+    with span('analyzer_export.stream_write'):
+        result = await session.stream(
+            select(AnalyzerOddsParsed)
+            .where(AnalyzerOddsParsed.match_id_pinnacle == match_id)
+            .order_by(AnalyzerOddsParsed.outcome, AnalyzerOddsParsed.created_at)
         )
-    )
-
-    rows = []
-    async for row in result.scalars():
-        rows.append(row)
 
-    if not rows:
-        logger.warning(f'⚠️ Нет данных для match={match_id}, outcome={outcome}')
+        current_outcome = None
+        current_file = None
+        writer = None
+        outcomes_count = 0
+        entries = []
+        watermark = None
+
+        try:
+            async for row in result.scalars():
+                if current_file is None or row.outcome != current_outcome:
+                    if current_file is not None:
+                        _close_synced(current_file)
+
+                    current_outcome = row.outcome
+                    file_name = format_filename(
+                        match_id, row.created_at, row.home_team, row.away_team,
+                        row.sport_name, current_outcome
+                    )
+                    file_path = os.path.join(EXPORT_ANALYZER_DIR, file_name)
+                    entries.append((file_path, row.created_at, row.sport_name, current_outcome))
+                    current_file = open(file_path, mode='w', newline='', encoding='utf-8')
+                    writer = csv.DictWriter(current_file, fieldnames=CSV_ANALYZER_COLUMNS)
+                    writer.writeheader()
+                    outcomes_count += 1
+
+                writer.writerow(_analyzer_csv_row(row))
+                if watermark is None or row.created_at > watermark:
+                    watermark = row.created_at
+
+            if current_file is not None:
+                _close_synced(current_file)
+                fsync_dir(EXPORT_ANALYZER_DIR)
+        finally:
+            if current_file is not None and not current_file.closed:
+                current_file.close()
+
+    if not outcomes_count:
+        logger.warning(f'⚠️ Нет данных для match={match_id}')
+        await delete_last_seen(session, SOURCE_ANALYZER, [match_id])
+        await session.commit()
         return
 
-    created_at_sample = rows[0].created_at
-    home = rows[0].home_team
-    away = rows[0].away_team
-    sport = rows[0].sport_name
-    file_name = format_filename(match_id, created_at_sample, home, away, sport, outcome)
-    file_path = os.path.join(EXPORT_ANALYZER_DIR, file_name)
-
-    with open(file_path, mode='w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=CSV_ANALYZER_COLUMNS)
-        writer.writeheader()
-        for row in rows:
-            writer.writerow({
-                'createdAt': row.raw_created_at,
-                'sportName': row.sport_name,
-                'matchId_pinnacle': row.match_id_pinnacle,
-                'matchId_lobbet': row.match_id_lobbet,
-                'homeName': row.home_team,
-                'awayName': row.away_team,
-                'homeScore': row.home_score,
-                'awayScore': row.away_score,
-                'league_pinnacle': row.league_pinnacle,
-                'league_lobbet': row.league_lobbet,
-                'bookmaker_1': 'Pinnacle',
-                'bookmaker_2': 'Lobbet',
-                'market': row.market_type,
-                'outcome': row.outcome,
-                'value_pinnacle': row.value_pinnacle,
-                'value_lobbet': row.value_lobbet,
-                'roi': row.roi,
-                'margin': row.margin,
-                'marketType': row.market_type,
-            })
-
-    await session.execute(
-        AnalyzerOddsParsed.__table__.delete().where(
-            AnalyzerOddsParsed.match_id_pinnacle == match_id,
-            AnalyzerOddsParsed.outcome == outcome
-        )
-    )
-    await session.commit()
-    logger.info(f'✅ Экспортировано и удалено: match={match_id}, outcome={outcome}')
+    with span('analyzer_export.manifest'):
+        append_exports([
+            make_entry(SOURCE_ANALYZER, file_path, match_id, created_at.strftime('%Y-%m-%d'),
+                       sport, outcome)
+            for file_path, created_at, sport, outcome in entries
+        ])
+    with span('analyzer_export.delete'):
+        await batcher.add(match_id, watermark)
+    logger.info(f'✅ Экспортировано: match={match_id}, исходов={outcomes_count}')
+
+
+def _close_synced(f):
+    f.flush()
+    os.fsync(f.fileno())
+    f.close()
+
+
+def _new_delete_batcher() -> MatchDeleteBatcher:
+    return MatchDeleteBatcher(
+        AnalyzerOddsParsed.__table__, AnalyzerOddsParsed.match_id_pinnacle, SOURCE_ANALYZER)
+
+
+async def run_analyzer_export_worker():
+    """
+    Выгружает матчи анализатора из очереди колеса таймеров по мере их завершения.
+    Всё, что накопилось в очереди, выгружается подряд и удаляется общими пачками.
+    """
+    batcher = _new_delete_batcher()
+    queue = analyzer_finish_tracker.queue
+
+    while True:
+        match_id = await queue.get()
+        async with _export_lock, EXPORT_CYCLE_SECONDS.time(SOURCE_ANALYZER), \
+                cycle('export_analyzer'):
+            while True:
+                outdated_time = datetime.utcnow() - timedelta(hours=OUTDATED_THRESHOLD)
+                try:
+                    async with SessionLocal() as session:
+                        if await is_match_stale(
+                                session, SOURCE_ANALYZER, match_id, outdated_time) \
+                                and await claim_matches(SOURCE_ANALYZER, [match_id]):
+                            await export_and_delete_analyzer_match(
+                                session, match_id, batcher)
+                except Exception as e:
+                    logger.error(f'❌ Ошибка событийной выгрузки match={match_id}: {e}')
+
+                if queue.empty():
+                    break
+                match_id = queue.get_nowait()
+
+            try:
+                await batcher.flush()
+            except Exception as e:
+                logger.error(f'❌ Ошибка пакетного удаления матчей: {e}')
 
 
 async def run_analyzer_collector_loop():
     """
     Циклично запускает сбор устаревших матчей с интервалом EXPORT_INTERVAL_SECONDS.
+    Служит страховкой для матчей, которые пропустило колесо таймеров.
     """
     while True:
         await collect_and_export_old_analyzer_data()
@@ -2,7 +2,7 @@ import asyncio
 import csv
 import logging
 import os
-from collections import defaultdict
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 
 from sqlalchemy import select, func
@@ -10,92 +10,66 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.constants.csv_columns import CSV_PINNACLE_COLUMNS
 from app.constants.paths import EXPORT_PINNACLE_DIR
-from app.constants.settings import OUTDATED_THRESHOLD, EXPORT_INTERVAL_SECONDS
+from app.batch_delete import MatchDeleteBatcher
+from app.cluster import claim_matches
+from app.constants.settings import (OUTDATED_THRESHOLD, EXPORT_INTERVAL_SECONDS,
+                                    LIVE_PIVOT_ENABLED, EXPORT_FETCH_CONCURRENCY,
+                                    EXPORT_PIVOT_CONCURRENCY, EXPORT_WRITE_CONCURRENCY,
+                                    EXPORT_PIPELINE_QUEUE_SIZE, ODDS_STORAGE_BACKEND,
+                                    ROLLUP_ENABLED)
 from app.db import SessionLocal
+from app.last_seen import (SOURCE_PINNACLE, delete_last_seen, find_match_ids,
+                           find_stale_match_ids, is_match_stale)
+from app.live_pivot import MatchPivotState, live_pivot
+from app.manifest import append_exports, make_entry
+from app.match_finish import pinnacle_finish_tracker
+from app.metrics import EXPORT_CYCLE_SECONDS
+from app.profiling import cycle, span
+from app.rollup import prune_rollups
 from app.models import LiveOddsParsed
-from app.utils import format_filename
+from app.pipeline import PipelineStage, run_pipeline
+from app.pivot import expand_market_map, render_snapshot_rows
+from app.segment_store import STORAGE_SEGMENTS, StoredOdds, segment_reader
+from app.utils import format_filename, fsync_dir, fsync_file
 
 logger = logging.getLogger(__name__)
 
+# Поллинг и событийная выгрузка не должны выгружать один матч одновременно
+_export_lock = asyncio.Lock()
 
-def expand_market_map(rows: list[LiveOddsParsed]) -> dict[str, dict[str, float]]:
-    """
-    Группирует данные по created_at и period, и преобразует их в формат для экспорта в CSV,
-    включая Totals, Handicap, First/Second Team Totals и Games (всё по слотам).
-    """
-    snapshot_dict = defaultdict(dict)
-
-    slot_maps = {
-        'Totals': [],
-        'Handicap': [],
-        'FirstTeamTotals': [],
-        'SecondTeamTotals': [],
-        'Games': [],
-    }
-
-    for row in rows:
-        timestamp = row.created_at.replace(microsecond=0).isoformat()
-        period_type = row.period
-        key = f'{timestamp}|{period_type}'
-
-        snap = snapshot_dict[key]
-        snap['CreatedAt'] = timestamp
-        snap['PeriodType'] = period_type
-        snap['homeName'] = row.home_team
-        snap['awayName'] = row.away_team
-        snap['HomeScore'] = row.home_score or 0
-        snap['AwayScore'] = row.away_score or 0
-
-        market = row.market
-        outcome = row.outcome
-        value = row.value
-        line = row.line
-
-        try:
-            line_value = float(line) if line else 0.0
-        except ValueError:
-            line_value = 0.0
-
-        col = None
-
-        if market == 'Totals' and outcome in {'WinMore', 'WinLess'}:
-            col = _slot_column('Totals', line_value, outcome, slot_maps, max_slots=3)
-        elif market == 'Handicap' and outcome in {'Win1', 'Win2'}:
-            col = _slot_column('Handicap', line_value, outcome, slot_maps, max_slots=3)
-        elif market == 'FirstTeamTotals' and outcome in {'WinMore', 'WinLess'}:
-            col = _slot_column('FirstTeamTotals', line_value, outcome, slot_maps, max_slots=2)
-        elif market == 'SecondTeamTotals' and outcome in {'WinMore', 'WinLess'}:
-            col = _slot_column('SecondTeamTotals', line_value, outcome, slot_maps, max_slots=2)
-        elif market == 'Games' and outcome in {'WinMore', 'WinLess'}:
-            col = _slot_column('Games', line_value, outcome, slot_maps, max_slots=3)
-        elif market == 'Win1x2':
-            col = outcome
 
-        if col in CSV_PINNACLE_COLUMNS:
-            snap[col] = value
-
-    return snapshot_dict
-
-
-def _slot_column(prefix: str, line_value: float, outcome: str, slot_maps: dict, max_slots: int) -> str:
+@dataclass
+class MatchExport:
     """
-    Возвращает имя колонки с номером слота на основе значения линии.
-    Привязывает линию к одному из max_slots слотов.
+    Матч, проходящий через конвейер выгрузки.
+
+    Поля:
+    - match_id: ID матча
+    - rows: строки матча из базы или сегментов (полный пересчёт)
+    - staged: состояние инкрементального разворота (выгрузка переименованием)
+    - file_name: имя итогового CSV-файла
+    - csv_rows: готовые строки CSV после стадии разворота
+    - date, sport: атрибуты матча для манифеста выгрузок
+    - watermark: последний CreatedAt, попавший в выгрузку (отметка для удаления)
     """
-    slots = slot_maps[prefix]
-    if line_value not in slots and len(slots) < max_slots:
-        slots.append(line_value)
-    try:
-        slot = slots.index(line_value) + 1
-        return f'{prefix}_{slot}_{outcome}'
-    except ValueError:
-        return ''
+    match_id: int
+    rows: list[LiveOddsParsed | StoredOdds] | None = None
+    staged: MatchPivotState | None = None
+    file_name: str | None = None
+    csv_rows: list[dict] | None = None
+    date: str | None = None
+    sport: str | None = None
+    watermark: datetime | None = None
 
 
 async def collect_and_export_old_data():
     """
     Находит устаревшие матчи по данным от Pinnacle и экспортирует их в CSV.
     После экспорта удаляет данные матчи из базы.
+
+    Матчи проходят конвейер fetch → pivot → write → delete, стадии работают
+    одновременно с собственными соединениями и ограниченными очередями между собой.
+    Удаление идёт пачками только по матчам, чьи файлы уже сброшены на диск.
     """
     now = datetime.utcnow()
     outdated_time = now - timedelta(hours=OUTDATED_THRESHOLD)
@@ -103,88 +77,291 @@ async def collect_and_export_old_data():
     async with SessionLocal() as session:
         match_ids = await find_stale_matches(session, outdated_time)
 
-        for match_id in match_ids:
-            await export_and_delete_match(session, match_id)
+    match_ids = await claim_matches(SOURCE_PINNACLE, match_ids)
+    if not match_ids:
+        return
+
+    batcher = _new_delete_batcher()
+    async with _export_lock, EXPORT_CYCLE_SECONDS.time(SOURCE_PINNACLE), \
+                cycle('export_pinnacle'):
+        await run_pipeline(
+            match_ids,
+            [
+                PipelineStage('fetch', fetch_match_export, EXPORT_FETCH_CONCURRENCY),
+                PipelineStage('pivot', pivot_match_export, EXPORT_PIVOT_CONCURRENCY),
+                PipelineStage('write', write_match_export, EXPORT_WRITE_CONCURRENCY),
+                PipelineStage('delete', lambda export: batcher.add(
+                    export.match_id, export.watermark), 1),
+            ],
+            queue_size=EXPORT_PIPELINE_QUEUE_SIZE,
+            name='pinnacle-export',
+        )
+        await batcher.flush()
 
 
 async def find_stale_matches(session: AsyncSession, outdated_time: datetime) -> list[int]:
     """
     Возвращает список матчей, которые не обновлялись дольше указанного времени.
+    Читает компактную таблицу match_last_seen, а не агрегирует live_odds_parsed.
     """
-    subquery = (
-        select(
-            LiveOddsParsed.match_id,
-            func.max(LiveOddsParsed.created_at).label('max_created_at')
-        )
-        .group_by(LiveOddsParsed.match_id)
-        .subquery()
-    )
-
-    result = await session.execute(
-        select(subquery.c.match_id)
-        .where(subquery.c.max_created_at < outdated_time)
-    )
-
-    match_ids = [row[0] for row in result.all()]
+    match_ids = await find_stale_match_ids(session, SOURCE_PINNACLE, outdated_time)
     logger.info(f'🔍 Найдено {len(match_ids)} устаревших матчей для выгрузки')
     return match_ids
 
 
-async def export_and_delete_match(session: AsyncSession, match_id: int):
+async def export_and_delete_match(match_id: int, batcher: MatchDeleteBatcher):
+    """
+    Экспортирует данные по заданному матчу Pinnacle в CSV и ставит матч
+    в пачку на удаление. Последовательно проходит те же стадии, что и конвейер.
     """
-    Экспортирует данные по заданному матчу Pinnacle в CSV и удаляет их из базы.
+    with span('pinnacle_export.fetch'):
+        export = await fetch_match_export(match_id)
+    if export is not None:
+        with span('pinnacle_export.pivot'):
+            export = await pivot_match_export(export)
+    if export is not None:
+        with span('pinnacle_export.write'):
+            export = await write_match_export(export)
+    if export is not None:
+        with span('pinnacle_export.delete'):
+            await batcher.add(match_id, export.watermark)
+
+
+def _new_delete_batcher() -> MatchDeleteBatcher:
+    if ODDS_STORAGE_BACKEND == STORAGE_SEGMENTS:
+        return MatchDeleteBatcher(None, None, SOURCE_PINNACLE)
+    return MatchDeleteBatcher(
+        LiveOddsParsed.__table__, LiveOddsParsed.match_id, SOURCE_PINNACLE)
+
+
+async def fetch_match_export(match_id: int) -> MatchExport | None:
+    """
+    Стадия fetch: читает строки матча в собственной сессии.
+    При включённом инкрементальном развороте сначала проверяет staging-файл.
     """
     logger.info(f'Обрабатываем матч {match_id}')
-    result = await session.stream(
-        select(LiveOddsParsed).where(LiveOddsParsed.match_id == match_id)
-    )
-    rows = []
-    async for row in result.scalars():
-        rows.append(row)
+    if ODDS_STORAGE_BACKEND == STORAGE_SEGMENTS:
+        return await fetch_segment_export(match_id)
+
+    async with SessionLocal() as session:
+        if LIVE_PIVOT_ENABLED:
+            staged = await check_staged_match(session, match_id)
+            if staged is not None:
+                state, watermark = staged
+                return MatchExport(match_id, staged=state, watermark=watermark)
+
+        result = await session.stream(
+            select(LiveOddsParsed).where(LiveOddsParsed.match_id == match_id)
+        )
+        rows = []
+        async for row in result.scalars():
+            rows.append(row)
 
+        if not rows:
+            logger.warning(f'⚠️ Нет данных для матча {match_id}')
+            await delete_last_seen(session, SOURCE_PINNACLE, [match_id])
+            await session.commit()
+            return None
+
+    return MatchExport(match_id, rows=rows,
+                       watermark=max(row.created_at for row in rows))
+
+
+async def fetch_segment_export(match_id: int) -> MatchExport | None:
+    """
+    Стадия fetch для сырых тиков в сегментах: невыгруженные строки матча
+    читаются через mmap по индексу сегментов.
+    """
+    rows = await asyncio.to_thread(segment_reader.read_match, match_id)
     if not rows:
         logger.warning(f'⚠️ Нет данных для матча {match_id}')
-        return
+        async with SessionLocal() as session:
+            await delete_last_seen(session, SOURCE_PINNACLE, [match_id])
+            await session.commit()
+        return None
+
+    watermark = max(row.created_at for row in rows)
+    if LIVE_PIVOT_ENABLED:
+        state = live_pivot.get_staged(match_id)
+        if state is not None and state.first_created_at == min(row.created_at for row in rows):
+            return MatchExport(match_id, staged=state, watermark=watermark)
+        live_pivot.discard(match_id)
+
+    return MatchExport(match_id, rows=rows, watermark=watermark)
 
+
+async def pivot_match_export(export: MatchExport) -> MatchExport:
+    """
+    Стадия pivot: разворачивает строки матча в широкий формат в отдельном потоке,
+    чтобы не блокировать event loop приёма данных.
+    """
+    if export.staged is not None:
+        state = export.staged
+        export.file_name = format_filename(
+            export.match_id, state.first_created_at, state.home, state.away, state.sport)
+        export.date = state.first_created_at.strftime('%Y-%m-%d')
+        export.sport = state.sport
+        return export
+
+    return await asyncio.to_thread(_build_csv_rows, export)
+
+
+def _build_csv_rows(export: MatchExport) -> MatchExport:
+    rows = export.rows
     snapshot_dict = expand_market_map(rows)
 
     created_at_sample = rows[0].created_at
     home = rows[0].home_team or 'home'
     away = rows[0].away_team or 'away'
     sport = rows[0].sport_name or 'sport'
-    file_name = format_filename(match_id, created_at_sample, home, away, sport)
-    file_path = os.path.join(EXPORT_PINNACLE_DIR, file_name)
+    export.file_name = format_filename(export.match_id, created_at_sample, home, away, sport)
+    export.date = created_at_sample.strftime('%Y-%m-%d')
+    export.sport = sport
+    export.csv_rows = render_snapshot_rows(
+        snapshot_dict, home, away, rows[0].home_score, rows[0].away_score)
+    export.rows = None
+    return export
+
 
+async def write_match_export(export: MatchExport) -> MatchExport:
+    """
+    Стадия write: записывает CSV (или переименовывает staging-файл), сбрасывает
+    его на диск и регистрирует в манифесте выгрузок. Строки матча в сегментах
+    отмечаются выгруженными.
+    Возвращает матч с отметкой выгрузки для стадии пакетного удаления.
+    """
+    match_id = export.match_id
+    file_path = os.path.join(EXPORT_PINNACLE_DIR, export.file_name)
+
+    if export.staged is not None:
+        await asyncio.to_thread(_replace_staged, live_pivot.csv_path(match_id), file_path)
+        live_pivot.discard(match_id)
+    else:
+        await asyncio.to_thread(_write_csv, file_path, export.csv_rows)
+
+    entry = make_entry(SOURCE_PINNACLE, file_path, match_id, export.date, export.sport)
+    await asyncio.to_thread(append_exports, [entry])
+    if ODDS_STORAGE_BACKEND == STORAGE_SEGMENTS:
+        await asyncio.to_thread(segment_reader.mark_exported, {match_id: export.watermark})
+    logger.info(f'✅ Матч {match_id} экспортирован')
+    export.csv_rows = None
+    return export
+
+
+def _write_csv(file_path: str, csv_rows: list[dict]):
     with open(file_path, mode='w', newline='', encoding='utf-8') as f:
         writer = csv.DictWriter(f, fieldnames=CSV_PINNACLE_COLUMNS)
         writer.writeheader()
+        writer.writerows(csv_rows)
+        f.flush()
+        os.fsync(f.fileno())
+    fsync_dir(EXPORT_PINNACLE_DIR)
 
-        for ts, row_data in sorted(snapshot_dict.items()):
-            row = {col: 'null' for col in CSV_PINNACLE_COLUMNS}
-            row['CreatedAt'] = ts
-            row['homeName'] = home
-            row['awayName'] = away
-            row['HomeScore'] = rows[0].home_score or 0
-            row['AwayScore'] = rows[0].away_score or 0
 
-            for k, v in row_data.items():
-                if k in row:
-                    row[k] = 'null' if v is None else v
+def _replace_staged(staged_path, file_path: str):
+    fsync_file(staged_path)
+    os.replace(staged_path, file_path)
+    fsync_dir(EXPORT_PINNACLE_DIR)
 
-            writer.writerow(row)
 
-    await session.execute(
-        LiveOddsParsed.__table__.delete().where(LiveOddsParsed.match_id == match_id)
-    )
-    await session.commit()
-    logger.info(f'✅ Матч {match_id} экспортирован и удалён')
+async def check_staged_match(
+    session: AsyncSession,
+    match_id: int
+) -> tuple[MatchPivotState, datetime] | None:
+    """
+    Проверяет, можно ли выгрузить матч переименованием staging-файла
+    инкрементального разворота.
+
+    Staging-файл используется, только если он начинается с той же строки,
+    что и данные матча в базе (разворот включили не посреди матча, состояние
+    не терялось). Иначе файл отбрасывается и выполняется полный пересчёт.
+    Возвращает состояние и последний created_at матча (отметку выгрузки).
+    """
+    state = live_pivot.get_staged(match_id)
+    if state is not None:
+        bounds = (await session.execute(
+            select(func.min(LiveOddsParsed.created_at), func.max(LiveOddsParsed.created_at))
+            .where(LiveOddsParsed.match_id == match_id)
+        )).one()
+        if bounds[0] == state.first_created_at:
+            return state, bounds[1]
+
+    live_pivot.discard(match_id)
+    return None
+
+
+async def run_pinnacle_export_worker():
+    """
+    Выгружает матчи из очереди колеса таймеров по мере их завершения.
+    Перед выгрузкой сверяется с match_last_seen: матч мог обновиться
+    или уже быть выгружен поллингом (в кластере — и другим экземпляром). Всё, что накопилось в очереди,
+    выгружается подряд и удаляется общими пачками.
+    """
+    batcher = _new_delete_batcher()
+    queue = pinnacle_finish_tracker.queue
+
+    while True:
+        match_id = await queue.get()
+        async with _export_lock, EXPORT_CYCLE_SECONDS.time(SOURCE_PINNACLE), \
+                cycle('export_pinnacle'):
+            while True:
+                outdated_time = datetime.utcnow() - timedelta(hours=OUTDATED_THRESHOLD)
+                try:
+                    async with SessionLocal() as session:
+                        stale = await is_match_stale(
+                            session, SOURCE_PINNACLE, match_id, outdated_time)
+                    if stale and await claim_matches(SOURCE_PINNACLE, [match_id]):
+                        await export_and_delete_match(match_id, batcher)
+                except Exception as e:
+                    logger.error(f'❌ Ошибка событийной выгрузки матча {match_id}: {e}')
+
+                if queue.empty():
+                    break
+                match_id = queue.get_nowait()
+
+            try:
+                await batcher.flush()
+            except Exception as e:
+                logger.error(f'❌ Ошибка пакетного удаления матчей: {e}')
 
 
 async def run_pinnacle_collector_loop():
     """
     Цикл экспорта и удаления устаревших матчей Pinnacle.
-    Выполняется с интервалом EXPORT_INTERVAL_SECONDS.
+    Выполняется с интервалом EXPORT_INTERVAL_SECONDS и подбирает всё,
+    что пропустило колесо таймеров (рестарт, переполнение очереди).
+    Там же чистятся устаревшие свёртки коэффициентов и полностью выгруженные
+    дни сегментов сырых тиков.
     """
     while True:
         await collect_and_export_old_data()
+        if ROLLUP_ENABLED:
+            await prune_old_rollups()
+        if ODDS_STORAGE_BACKEND == STORAGE_SEGMENTS:
+            await prune_old_segments()
         await asyncio.sleep(EXPORT_INTERVAL_SECONDS)
+
+
+async def prune_old_segments():
+    """
+    Удаляет дни сегментов, в которых не осталось матчей из match_last_seen.
+    """
+    try:
+        async with SessionLocal() as session:
+            pending = await find_match_ids(session, SOURCE_PINNACLE)
+        await asyncio.to_thread(segment_reader.prune, pending)
+    except Exception as e:
+        logger.error(f'❌ Ошибка очистки сегментов сырых тиков: {e}')
+
+
+async def prune_old_rollups():
+    """
+    Удаляет свёртки коэффициентов старше ROLLUP_RETENTION_DAYS. Сами свёртки
+    выгрузка матчей не трогает — они переживают удаление сырых строк.
+    """
+    try:
+        async with SessionLocal() as session:
+            await prune_rollups(session)
+            await session.commit()
+    except Exception as e:
+        logger.error(f'❌ Ошибка очистки свёрток коэффициентов: {e}')
@@ -0,0 +1,105 @@
+"""
+Компоненты сервиса для выборочного запуска (--components в scripts/run_pinnacle_streamer.py).
+
+- ingest: приём WebSocket
+- writers: разбор и запись в базу (в однопроцессном режиме приём и запись — один
+  цикл, выбор любого из них запускает оба)
+- collectors: выгрузка завершённых матчей (колёса таймеров и поллинг)
+- archiver: архивация выгрузок
+- uploader: загрузка архивов в хранилище
+
+Компоненты связаны только через базу и файлы выгрузок, поэтому их можно запускать
+отдельными процессами (контейнерами). Модули компонентов импортируются только при
+запуске: перезапуск процесса приёма не тянет за собой коллекторы и хранилища.
+"""
+
+from typing import Coroutine
+
+from app.constants.paths import ensure_export_dirs
+from app.constants.settings import CLUSTER_ENABLED, LIVE_PIVOT_ENABLED, ODDS_STORAGE_BACKEND
+from app.match_finish import analyzer_finish_tracker, pinnacle_finish_tracker
+
+
+INGEST = 'ingest'
+WRITERS = 'writers'
+COLLECTORS = 'collectors'
+ARCHIVER = 'archiver'
+UPLOADER = 'uploader'
+
+COMPONENTS = (INGEST, WRITERS, COLLECTORS, ARCHIVER, UPLOADER)
+
+# Компоненты процесса коллекторов многопроцессного режима
+BACKGROUND_COMPONENTS = (COLLECTORS, ARCHIVER, UPLOADER)
+
+
+def parse_components(value: str) -> frozenset[str]:
+    """
+    Разбирает список компонентов через запятую: 'ingest,writers' или 'all'.
+    """
+    if value.strip() == 'all':
+        return frozenset(COMPONENTS)
+    components = frozenset(part.strip() for part in value.split(',') if part.strip())
+    unknown = components - set(COMPONENTS)
+    if unknown:
+        raise ValueError(f'неизвестные компоненты: {", ".join(sorted(unknown))} '
+                         f'(доступны: {", ".join(COMPONENTS)})')
+    if not components:
+        raise ValueError('не выбран ни один компонент')
+    return components
+
+
+def check_settings():
+    """
+    Отклоняет несовместимые настройки до запуска компонентов.
+    """
+    if CLUSTER_ENABLED:
+        from app.segment_store import STORAGE_SEGMENTS
+
+        if ODDS_STORAGE_BACKEND == STORAGE_SEGMENTS:
+            # Сегменты и отметки выгрузки локальны для хоста: экземпляр, получивший
+            # аренду матча, не видит тиков, записанных другими экземплярами
+            raise RuntimeError(
+                "ODDS_STORAGE_BACKEND = 'segments' несовместим с CLUSTER_ENABLED")
+
+
+def prepare_components(components: frozenset[str]):
+    """
+    Готовит процесс к запуску выбранных компонентов: создаёт директории выгрузок
+    тем, кто в них пишет, и отключает отметки колёс таймеров, если коллекторов
+    в процессе нет.
+    """
+    if components & set(BACKGROUND_COMPONENTS) or (WRITERS in components and LIVE_PIVOT_ENABLED):
+        ensure_export_dirs()
+    if COLLECTORS not in components:
+        pinnacle_finish_tracker.disable()
+        analyzer_finish_tracker.disable()
+
+
+def background_tasks(components: frozenset[str]) -> list[Coroutine]:
+    """
+    Циклы выбранных фоновых компонентов: коллекторы, архиватор, загрузчик.
+    """
+    tasks = []
+    if COLLECTORS in components:
+        from app.collector_analyzer import (run_analyzer_collector_loop,
+                                            run_analyzer_export_worker)
+        from app.collector_pinnacle import (run_pinnacle_collector_loop,
+                                            run_pinnacle_export_worker)
+        from app.match_finish import run_match_finish_loop
+
+        tasks += [
+            run_match_finish_loop(),
+            run_pinnacle_export_worker(),
+            run_analyzer_export_worker(),
+            run_pinnacle_collector_loop(),
+            run_analyzer_collector_loop(),
+        ]
+    if ARCHIVER in components:
+        from app.archiver import run_archiver_loop
+
+        tasks.append(run_archiver_loop())
+    if UPLOADER in components:
+        from app.uploader import run_uploader_loop
+
+        tasks.append(run_uploader_loop())
+    return tasks
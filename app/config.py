@@ -1,4 +1,6 @@
+from functools import lru_cache
 from pathlib import Path
+from typing import Any
 
 from pydantic_settings import BaseSettings
 
@@ -15,6 +17,9 @@ class Settings(BaseSettings):
     - database_url: URL подключения к базе данных
     - mega_email: Email для входа в облачное хранилище Mega
     - mega_password: Пароль для Mega
+    - storage_backend: Хранилище архивов: mega, local или s3
+    - upload_local_dir: Директория для хранилища local
+    - s3_bucket, s3_endpoint_url, s3_access_key, s3_secret_key, s3_prefix: Параметры хранилища s3
 
     Примечание: чувствительность к регистру отключена, лишние переменные игнорируются.
     """
@@ -24,8 +29,15 @@ class Settings(BaseSettings):
     filter_name: str
     sports: list[str]
     database_url: str
-    mega_email: str
-    mega_password: str
+    mega_email: str = ''
+    mega_password: str = ''
+    storage_backend: str = 'mega'
+    upload_local_dir: str = 'uploaded'
+    s3_bucket: str = ''
+    s3_endpoint_url: str = ''
+    s3_access_key: str = ''
+    s3_secret_key: str = ''
+    s3_prefix: str = ''
 
     class Config:
         env_file = str(Path(__file__).resolve().parent.parent / '.env')
@@ -34,4 +46,22 @@ class Settings(BaseSettings):
         case_sensitive = False
 
 
-settings = Settings()
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """
+    Читает конфигурацию при первом обращении, а не при импорте:
+    модули можно импортировать без .env (например, для --help).
+    """
+    return Settings()
+
+
+class LazySettings:
+    """
+    Заместитель Settings: атрибуты читаются из get_settings() при первом обращении.
+    """
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(get_settings(), name)
+
+
+settings = LazySettings()
@@ -7,9 +7,33 @@ EXPORT_BASE_DIR = Path('exports')
 EXPORT_PINNACLE_DIR = EXPORT_BASE_DIR / 'pinnacle'   # Данные от Pinnacle
 EXPORT_ANALYZER_DIR = EXPORT_BASE_DIR / 'analyzer'   # Данные от анализатора
 ARCHIVE_DIR = EXPORT_BASE_DIR / 'archives'           # ZIP-архивы выгрузок
+EXPORT_STAGING_DIR = EXPORT_BASE_DIR / 'staging'     # Инкрементальный разворот живых матчей
+ARCHIVE_OPEN_DIR = ARCHIVE_DIR / 'open'              # Дневные архивы, в которые ещё дописываем
 
-# Создание директорий, если их ещё нет
-EXPORT_BASE_DIR.mkdir(parents=True, exist_ok=True)
-EXPORT_PINNACLE_DIR.mkdir(parents=True, exist_ok=True)
-EXPORT_ANALYZER_DIR.mkdir(parents=True, exist_ok=True)
-ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
\ No newline at end of file
+# Манифест готовых выгрузок, который инкрементально читает архиватор
+MANIFEST_PATH = EXPORT_BASE_DIR / 'manifest.jsonl'
+MANIFEST_PENDING_PATH = EXPORT_BASE_DIR / 'manifest.pending.jsonl'
+MANIFEST_CURSOR_PATH = EXPORT_BASE_DIR / 'manifest.cursor'
+MANIFEST_LOCK_PATH = EXPORT_BASE_DIR / 'manifest.lock'
+MANIFEST_REJECTED_PATH = EXPORT_BASE_DIR / 'manifest.rejected.jsonl'  # Повреждённые строки
+
+# Каталог архивов (SQLite): в каком архиве и по какому смещению лежит CSV матча
+ARCHIVE_CATALOG_PATH = EXPORT_BASE_DIR / 'archive_catalog.sqlite3'
+
+# Сегменты сырых тиков Pinnacle (ODDS_STORAGE_BACKEND = 'segments'), по папке на день;
+# создаётся при первой записи
+SEGMENTS_DIR = Path('segments')
+
+# Результаты профилирования по запросу (создаётся при первом захвате)
+PROFILE_DIR = Path('profiles')
+
+
+def ensure_export_dirs():
+    """
+    Создаёт директории выгрузок и архивов, если их ещё нет. Вызывается при запуске
+    компонентов, которые в них пишут, а не при импорте: процессу только приёма
+    и скриптам они не нужны.
+    """
+    for directory in (EXPORT_BASE_DIR, EXPORT_PINNACLE_DIR, EXPORT_ANALYZER_DIR,
+                      ARCHIVE_DIR, EXPORT_STAGING_DIR, ARCHIVE_OPEN_DIR):
+        directory.mkdir(parents=True, exist_ok=True)
@@ -13,8 +13,8 @@ OUTDATED_THRESHOLD = 3  # часы
 # Интервал проверки и выгрузки завершённых матчей (в секундах)
 EXPORT_INTERVAL_SECONDS = 7200  # 2 часа
 
-# Интервал отправки архивов на Mega (в секундах)
-MEGA_UPLOAD_INTERVAL_SECONDS = 9000  # 2,5 часа
+# Интервал отправки архивов в хранилище (в секундах)
+UPLOAD_INTERVAL_SECONDS = 9000  # 2,5 часа
 
 # Допустимые виды спорта
 ALLOWED_SPORTS = ('Soccer', 'Tennis')
@@ -32,3 +32,156 @@ PERIOD_MAP_TENNIS = {
     4: 'Set4',
     5: 'Set5'
 }
+
+# Шаг колеса таймеров для событийной выгрузки завершённых матчей (в секундах)
+TIMER_WHEEL_TICK_SECONDS = 30
+
+# Максимальный размер очереди матчей на событийную выгрузку
+EXPORT_QUEUE_MAXSIZE = 1000
+
+# Инкрементальный разворот Pinnacle: писатель дописывает широкие строки CSV
+# по мере сбросов, а выгрузка матча сводится к переименованию файла
+LIVE_PIVOT_ENABLED = False
+
+# Конвейер выгрузки Pinnacle: параллелизм стадий и размер очередей между ними
+EXPORT_FETCH_CONCURRENCY = 4
+EXPORT_PIVOT_CONCURRENCY = 2
+EXPORT_WRITE_CONCURRENCY = 2
+EXPORT_PIPELINE_QUEUE_SIZE = 8
+
+# Сколько выгруженных матчей удалять из базы одной транзакцией
+EXPORT_DELETE_BATCH_SIZE = 200
+
+# Формат архивов выгрузок: 'zip' (deflate, совместимость) или 'tar.zst'
+ARCHIVE_FORMAT = 'zip'
+
+# Число потоков сжатия в архиваторе
+ARCHIVE_WORKERS = 4
+
+# Уровни сжатия для deflate (0-9) и zstd (1-22)
+ARCHIVE_DEFLATE_LEVEL = 6
+ARCHIVE_ZSTD_LEVEL = 3
+
+# Загрузчик архивов: число параллельных загрузок (в Mega — по сессии на поток) и повторы при ошибках
+UPLOAD_WORKERS = 4
+UPLOAD_RETRY_ATTEMPTS = 5
+UPLOAD_RETRY_BASE_DELAY = 2  # секунды, удваивается с каждой попыткой
+
+# Потоковый режим: архиватор сжимает выгрузки сразу в загрузку частями
+# (хранилища s3 и local). Локальные дневные архивы пишутся только если
+# хранилище недоступно или не умеет потоковую загрузку (mega)
+ARCHIVE_STREAM_UPLOAD = False
+
+# Размер части при потоковой загрузке (в байтах)
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Размер LRU-кэша разобранных меток времени CreatedAt
+ISO_PARSE_CACHE_SIZE = 4096
+
+# HTTP-эндпоинт метрик Prometheus (/metrics). Без авторизации, поэтому по умолчанию
+# слушает только localhost; для сбора Prometheus с другого хоста задайте адрес интерфейса
+# (или '0.0.0.0') и закройте порт снаружи
+METRICS_ENABLED = True
+METRICS_HOST = '127.0.0.1'
+METRICS_PORT = 9108
+
+# Период замера задержки event loop (в секундах)
+EVENT_LOOP_LAG_INTERVAL = 0.5
+
+# Сколько следующих циклов (сбросов, выгрузок) профилировать по сигналу SIGUSR1
+# или запросу /profile?cycles=N к эндпоинту метрик (принимается только с localhost)
+PROFILE_CAPTURE_CYCLES = 3
+# Верхняя граница N в /profile?cycles=N
+PROFILE_MAX_CYCLES = 20
+
+# Многопроцессный режим: число процессов разбора и записи. 0 — всё в одном
+# процессе; больше нуля — отдельные процессы приёма WebSocket, записи
+# и коллекторов (см. app/multiprocess.py). Переопределяется --writers
+WRITER_PROCESSES = 0
+
+# Очередь кадров от процесса приёма к писателям: предел размера и сколько
+# кадров писатель забирает за один раз
+FRAME_QUEUE_MAXSIZE = 10000
+FRAME_BATCH_SIZE = 500
+
+# Очередь обновлений от писателей к процессу коллекторов (колёса таймеров,
+# кэш коэффициентов, раздача): если коллекторы отстают, отметки колёс таймеров ждут
+# места, а обновления кэшей и раздачи отбрасываются (метрика updates_dropped_total)
+UPDATE_QUEUE_MAXSIZE = 10000
+
+# Кластерный режим: несколько экземпляров делят поток и выгрузку через Postgres
+# (таблицы cluster_instances и export_leases, advisory-локи, см. app/cluster.py)
+CLUSTER_ENABLED = False
+
+# Ключ шардирования приёма: 'match' (match_id по модулю числа экземпляров)
+# или 'sport' (вид спорта целиком достаётся одному экземпляру)
+CLUSTER_SHARD_BY = 'match'
+
+# Период отметки экземпляра и через сколько секунд без отметки он выбывает
+CLUSTER_HEARTBEAT_INTERVAL = 10
+CLUSTER_MEMBER_TTL = 30
+
+# Срок аренды выгрузки матча (в секундах): за это время экземпляр должен
+# выгрузить и удалить матч, иначе его подхватит другой
+EXPORT_LEASE_SECONDS = 900
+
+# Локальный API запросов к данным в памяти (кэш последних коэффициентов и т. п.).
+# QUERY_API_PORT = None отключает TCP, QUERY_API_SOCKET задаёт путь Unix-сокета
+QUERY_API_ENABLED = True
+QUERY_API_HOST = '127.0.0.1'
+QUERY_API_PORT = 9120
+QUERY_API_SOCKET = None
+
+# Как часто вытеснять из кэша коэффициентов затихшие матчи, а из индекса ROI —
+# истёкшие возможности (в секундах). Вытеснение идёт на стороне записи,
+# при вливании сбросов
+QUERY_API_CACHE_SWEEP_INTERVAL = 60
+
+# Свёртки коэффициентов Pinnacle по интервалам (таблица odds_rollup): длины
+# интервалов в секундах, размер пачки upsert'а и срок хранения свёрток (в днях)
+ROLLUP_ENABLED = True
+ROLLUP_BUCKETS = (60, 300)
+ROLLUP_UPSERT_BATCH_SIZE = 2000
+ROLLUP_RETENTION_DAYS = 90
+
+# Потоковый детектор резких движений коэффициентов Pinnacle (см. app/line_moves.py):
+# движение на LINE_MOVE_THRESHOLD (доля) и больше относительно минимума/максимума
+# за последние LINE_MOVE_WINDOW_SECONDS секунд. LINE_MOVE_MARKETS = None — все маркеты.
+# В многопроцессном режиме работает только с одним писателем
+LINE_MOVE_ENABLED = False
+LINE_MOVE_WINDOW_SECONDS = 120
+LINE_MOVE_THRESHOLD = 0.08
+LINE_MOVE_MARKETS = None
+
+# Сколько последних событий движения хранить для API запросов
+LINE_MOVE_EVENTS_KEPT = 1000
+
+# Индекс живых возможностей анализатора по ROI (см. app/roi_index.py): через сколько
+# секунд без подтверждения анализатором возможность считается истёкшей. Должно быть
+# больше WRITE_INTERVAL — индекс обновляется на каждом сбросе буфера
+ROI_INDEX_TTL = 180
+
+# Локальная раздача разобранного потока подписчикам по WebSocket (см. app/fanout.py).
+# FANOUT_PORT = None отключает TCP, FANOUT_SOCKET задаёт путь Unix-сокета.
+# Подписчик, у которого в очереди накопилось FANOUT_QUEUE_SIZE сообщений, отключается
+FANOUT_ENABLED = False
+FANOUT_HOST = '127.0.0.1'
+FANOUT_PORT = 9121
+FANOUT_SOCKET = None
+FANOUT_QUEUE_SIZE = 1000
+
+# Где хранить сырые тики Pinnacle до выгрузки: 'postgres' (таблица live_odds_parsed)
+# или 'segments' — дописываемые файлы-сегменты по дням (см. app/segment_store.py).
+# match_last_seen и свёртки в обоих случаях остаются в Postgres. Сегменты локальны
+# для хоста и несовместимы с CLUSTER_ENABLED
+ODDS_STORAGE_BACKEND = 'postgres'
+
+# Размер, после которого писатель начинает новый сегмент, и fsync после каждого сброса
+SEGMENT_MAX_BYTES = 512 * 1024 * 1024
+SEGMENT_FSYNC = True
+
+# Обратная загрузка архивных CSV в live_odds_parsed (см. app/backfill.py):
+# число процессов разворота и соединений COPY, сколько прочитанных из архивов
+# CSV может ждать в очереди
+BACKFILL_WORKERS = 4
+BACKFILL_QUEUE_SIZE = 16
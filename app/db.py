@@ -1,18 +1,36 @@
-from sqlalchemy.ext.asyncio import create_async_engine,  AsyncSession
+from functools import lru_cache
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 from app.config import settings
 
 
-engine = create_async_engine(settings.database_url, echo=False)
-SessionLocal = sessionmaker(
-    bind=engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-)
-
 Base = declarative_base()
 
 
+@lru_cache(maxsize=None)
+def get_engine() -> AsyncEngine:
+    """
+    Движок создаётся при первом обращении: процессам без базы (например, только
+    приёму в многопроцессном режиме) он не нужен.
+    """
+    return create_async_engine(settings.database_url, echo=False)
+
+
+@lru_cache(maxsize=None)
+def _session_factory() -> sessionmaker:
+    return sessionmaker(
+        bind=get_engine(),
+        class_=AsyncSession,
+        expire_on_commit=False,
+    )
+
+
+def SessionLocal() -> AsyncSession:
+    """Новая асинхронная сессия базы данных."""
+    return _session_factory()()
+
+
 async def get_session() -> AsyncSession:
     """Асинхронный генератор сессии базы данных."""
     async with SessionLocal() as session:
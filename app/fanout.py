@@ -0,0 +1,352 @@
+"""
+Локальная раздача разобранного потока коэффициентов (FANOUT_ENABLED).
+
+Писатели после разбора сброса публикуют нормализованные строки Pinnacle и анализатора,
+а локальный WebSocket-сервер (TCP FANOUT_HOST:FANOUT_PORT и/или Unix-сокет
+FANOUT_SOCKET) раздаёт их подписчикам — другим сервисам не нужно опрашивать Postgres.
+
+Протокол: клиент шлёт JSON-запросы
+    {"action": "subscribe", "sport": "Soccer"}
+    {"action": "subscribe", "match_id": 1593012345, "source": "pinnacle"}
+    {"action": "subscribe"}                         — весь поток
+    {"action": "unsubscribe", "sport": "Soccer"}
+и получает по одному сообщению на матч и сброс:
+    {"source": "pinnacle", "match_id": ..., "sport": ..., "home": ..., "away": ...,
+     "home_score": ..., "away_score": ..., "rows": [{...}, ...]}
+
+У каждого подписчика своя ограниченная очередь (FANOUT_QUEUE_SIZE сообщений).
+Подписчик, не успевающий её разбирать, отключается — приём его не ждёт.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import queue
+from typing import Any, Callable, Iterable
+
+from websockets.asyncio.server import ServerConnection, serve, unix_serve
+from websockets.exceptions import ConnectionClosed
+
+from app.constants.settings import FANOUT_HOST, FANOUT_PORT, FANOUT_QUEUE_SIZE, FANOUT_SOCKET
+from app.last_seen import SOURCE_ANALYZER, SOURCE_PINNACLE
+from app.metrics import FANOUT_DROPPED, FANOUT_MESSAGES, FANOUT_SUBSCRIBERS, UPDATES_DROPPED
+
+
+logger = logging.getLogger(__name__)
+
+# Метка сообщений раздачи в очереди обновлений многопроцессного режима
+FORWARD_FANOUT = 'fanout'
+
+# (источник, вид подписки, значение): ('pinnacle', 'match', 1593012345),
+# ('analyzer', 'sport', 'Soccer'), ('pinnacle', 'all', None)
+Topic = tuple[str, str, Any]
+
+# Готовое сообщение: (источник, вид спорта, match_id, JSON)
+Message = tuple[str, str | None, int, str]
+
+# Поля строки, уходящие подписчикам; общие поля матча выносятся в сообщение
+ROW_FIELDS = {
+    SOURCE_PINNACLE: ('period', 'market', 'line', 'outcome', 'value', 'created_at'),
+    SOURCE_ANALYZER: ('match_id_lobbet', 'market_type', 'outcome', 'value_pinnacle',
+                      'value_lobbet', 'roi', 'margin', 'created_at'),
+}
+MATCH_ID_FIELD = {SOURCE_PINNACLE: 'match_id', SOURCE_ANALYZER: 'match_id_pinnacle'}
+
+# Общие поля матча в сообщении: (поле сообщения, колонка строки)
+MATCH_FIELDS = (('home', 'home_team'), ('away', 'away_team'),
+                ('home_score', 'home_score'), ('away_score', 'away_score'))
+
+# Код закрытия для отключённых медленных подписчиков (1013 — Try Again Later)
+CLOSE_TOO_SLOW = 1013
+
+
+class Subscriber:
+    __slots__ = ('connection', 'queue', 'topics')
+
+    def __init__(self, connection: ServerConnection, queue_size: int):
+        self.connection = connection
+        self.queue: asyncio.Queue[str] = asyncio.Queue(queue_size)
+        self.topics: set[Topic] = set()
+
+
+class FanoutHub:
+    """
+    Подписки и раздача сообщений. Публикация не ждёт подписчиков: сообщение
+    кладётся в их очереди без ожидания, переполнение очереди отключает подписчика.
+    """
+
+    def __init__(self, queue_size: int = FANOUT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.subscribers: set[Subscriber] = set()
+        self.topics: dict[Topic, set[Subscriber]] = {}
+        self.forward_queue = None
+        self.shared_subscribers = None
+        FANOUT_SUBSCRIBERS.set_function(func=lambda: len(self.subscribers))
+
+    def forward_to(self, queue, subscribers=None):
+        """
+        Многопроцессный режим: сервер раздачи живёт в процессе коллекторов,
+        писатели пересылают ему готовые сообщения (см. app.multiprocess).
+        Если очередь переполнена, сообщения сброса отбрасываются: раздача
+        не должна тормозить запись.
+
+        :param subscribers: Общий с процессом коллекторов счётчик подписчиков
+                            (multiprocessing.Value): пока он 0, сообщения не собираются
+        """
+        self.forward_queue = queue
+        self.shared_subscribers = subscribers
+
+    def share_subscribers(self, subscribers):
+        """
+        Процесс коллекторов: ведёт число подписчиков в общем счётчике для писателей.
+        """
+        self.shared_subscribers = subscribers
+        self._subscribers_changed()
+
+    def _subscribers_changed(self):
+        if self.shared_subscribers is not None:
+            self.shared_subscribers.value = len(self.subscribers)
+
+    def publish(self, source: str, rows: Iterable[Any], messages: Iterable[dict[str, Any]] = ()):
+        """
+        Публикует разобранные строки сброса (LiveOddsParsed или AnalyzerOddsParsed).
+        Без подписчиков ничего не делает; сообщения собираются только для матчей,
+        на которые кто-то подписан (при пересылке — только пока подписчики есть).
+
+        :param messages: Исходные сообщения Pinnacle: счёт берётся из них, в строках
+                         коэффициентов его нет
+        """
+        forwarding = self.forward_queue is not None
+        if forwarding:
+            if self.shared_subscribers is not None and not self.shared_subscribers.value:
+                return
+        elif not self.subscribers:
+            return
+
+        wanted = None if forwarding else (
+            lambda sport, match_id: bool(self._targets(source, sport, match_id)))
+        groups = group_rows(source, rows, wanted)
+        apply_message_scores(groups, messages)
+
+        encoded = []
+        for match_id, (sport, match, items) in groups.items():
+            if match is None:
+                continue
+            match['rows'] = items
+            encoded.append((source, sport, match_id,
+                            json.dumps(match, ensure_ascii=False, default=str)))
+
+        if not encoded:
+            return
+        if forwarding:
+            try:
+                self.forward_queue.put_nowait((FORWARD_FANOUT, encoded))
+            except queue.Full:
+                UPDATES_DROPPED.inc(FORWARD_FANOUT)
+        else:
+            self.deliver(encoded)
+
+    def deliver(self, messages: list[Message]):
+        """
+        Раскладывает готовые сообщения по очередям подписчиков.
+        """
+        for source, sport, match_id, payload in messages:
+            targets = self._targets(source, sport, match_id)
+            for subscriber in targets:
+                try:
+                    subscriber.queue.put_nowait(payload)
+                except asyncio.QueueFull:
+                    self._drop(subscriber)
+            if targets:
+                FANOUT_MESSAGES.inc(source)
+
+    def _targets(self, source: str, sport: str | None, match_id: int) -> set[Subscriber]:
+        topics = self.topics
+        targets = set()
+        for topic in ((source, 'match', match_id), (source, 'sport', sport), (source, 'all', None)):
+            subscribers = topics.get(topic)
+            if subscribers:
+                targets |= subscribers
+        return targets
+
+    def subscribe(self, subscriber: Subscriber, request: dict[str, Any], active: bool = True) -> int:
+        """
+        Применяет запрос subscribe/unsubscribe. Возвращает число подписок клиента.
+        """
+        source = request.get('source')
+        if source is not None and source not in ROW_FIELDS:
+            raise ValueError(f'unknown source: {source}')
+        if request.get('match_id') is not None:
+            kind, value = 'match', int(request['match_id'])
+        elif request.get('sport') is not None:
+            kind, value = 'sport', str(request['sport'])
+        else:
+            kind, value = 'all', None
+
+        for topic_source in ([source] if source else ROW_FIELDS):
+            topic = (topic_source, kind, value)
+            if active:
+                subscriber.topics.add(topic)
+                self.topics.setdefault(topic, set()).add(subscriber)
+            else:
+                subscriber.topics.discard(topic)
+                self._unlink(subscriber, topic)
+        return len(subscriber.topics)
+
+    def _unlink(self, subscriber: Subscriber, topic: Topic):
+        subscribers = self.topics.get(topic)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.topics[topic]
+
+    def _remove(self, subscriber: Subscriber):
+        for topic in subscriber.topics:
+            self._unlink(subscriber, topic)
+        subscriber.topics.clear()
+        self.subscribers.discard(subscriber)
+        self._subscribers_changed()
+
+    def _drop(self, subscriber: Subscriber):
+        if subscriber not in self.subscribers:
+            return
+        self._remove(subscriber)
+        FANOUT_DROPPED.inc()
+        logger.warning(f'🐢 Подписчик раздачи {subscriber.connection.remote_address} '
+                       f'не успевает ({self.queue_size} сообщений в очереди) и отключён')
+        asyncio.get_running_loop().create_task(
+            subscriber.connection.close(CLOSE_TOO_SLOW, 'subscriber too slow'))
+
+    async def _send_loop(self, subscriber: Subscriber):
+        try:
+            while True:
+                payload = await subscriber.queue.get()
+                await subscriber.connection.send(payload)
+        except ConnectionClosed:
+            pass
+
+    async def handle(self, connection: ServerConnection):
+        """
+        Обслуживает подписчика: читает запросы подписки, пока отдельная задача
+        отправляет ему сообщения из его очереди.
+        """
+        subscriber = Subscriber(connection, self.queue_size)
+        self.subscribers.add(subscriber)
+        self._subscribers_changed()
+        sender = asyncio.create_task(self._send_loop(subscriber))
+        try:
+            async for raw in connection:
+                try:
+                    request = json.loads(raw)
+                    action = request.get('action')
+                    if action not in ('subscribe', 'unsubscribe'):
+                        raise ValueError(f'unknown action: {action}')
+                    count = self.subscribe(subscriber, request, active=action == 'subscribe')
+                    reply = {'ok': True, 'subscriptions': count}
+                except (ValueError, TypeError, AttributeError) as e:
+                    reply = {'ok': False, 'error': str(e)}
+                try:
+                    subscriber.queue.put_nowait(json.dumps(reply))
+                except asyncio.QueueFull:
+                    self._drop(subscriber)
+        except ConnectionClosed:
+            pass
+        finally:
+            self._remove(subscriber)
+            sender.cancel()
+
+
+def group_rows(
+    source: str,
+    rows: Iterable[Any],
+    wanted: Callable[[str | None, int], bool] | None = None,
+) -> dict[int, tuple[str | None, dict | None, list]]:
+    """
+    Группирует строки сброса по матчу: match_id → (вид спорта, общие поля матча,
+    строки с полями ROW_FIELDS). Строки-заглушки Pinnacle без коэффициента
+    обновляют только общие поля (команды, счёт). Общее поле меняется только
+    строкой, в которой оно заполнено: в строках коэффициентов Pinnacle счёта нет.
+
+    :param wanted: (вид спорта, match_id) → нужен ли матч; для ненужных матчей
+                   строки не собираются, а общие поля равны None
+    """
+    fields = ROW_FIELDS[source]
+    match_id_field = MATCH_ID_FIELD[source]
+    groups: dict[int, tuple[str | None, dict | None, list]] = {}
+
+    for row in rows:
+        # Значения ещё не загруженных из базы строк лежат в __dict__ (см. odds_cache)
+        data = row.__dict__
+        match_id = data[match_id_field]
+        group = groups.get(match_id)
+        if group is None:
+            sport = data.get('sport_name')
+            match = ({'source': source, 'match_id': match_id, 'sport': sport, 'home': None,
+                      'away': None, 'home_score': None, 'away_score': None}
+                     if wanted is None or wanted(sport, match_id) else None)
+            group = groups[match_id] = (sport, match, [])
+        match = group[1]
+        if match is None:
+            continue
+        for field, column in MATCH_FIELDS:
+            value = data.get(column)
+            if value is not None:
+                match[field] = value
+
+        if source == SOURCE_PINNACLE and data.get('value') is None:
+            continue
+        item = {field: data.get(field) for field in fields}
+        created_at = item['created_at']
+        if created_at is not None:
+            item['created_at'] = created_at.isoformat()
+        group[2].append(item)
+
+    return groups
+
+
+def apply_message_scores(
+    groups: dict[int, tuple[str | None, dict | None, list]],
+    messages: Iterable[dict[str, Any]],
+):
+    """
+    Переносит счёт из исходных сообщений Pinnacle в общие поля сгруппированных
+    матчей (в порядке прихода, побеждает последнее заполненное значение).
+    """
+    for msg in messages:
+        try:
+            match_id = int(msg.get('MatchId', 0))
+        except (TypeError, ValueError):
+            continue
+        group = groups.get(match_id)
+        if group is None or group[1] is None:
+            continue
+        for field, key in (('home_score', 'HomeScore'), ('away_score', 'AwayScore')):
+            value = msg.get(key)
+            if value is not None:
+                group[1][field] = value
+
+
+async def run_fanout_server(
+    host: str = FANOUT_HOST,
+    port: int | None = FANOUT_PORT,
+    socket_path: str | None = FANOUT_SOCKET,
+):
+    """
+    Поднимает WebSocket-сервер раздачи на TCP-порту и/или Unix-сокете.
+    Сжатие отключено: сообщения одни на всех, а сжимать пришлось бы для каждого.
+    """
+    servers = []
+    if port:
+        servers.append(await serve(fanout.handle, host, port, compression=None))
+        logger.info(f'📡 Раздача потока доступна на ws://{host}:{port}')
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        servers.append(await unix_serve(fanout.handle, socket_path, compression=None))
+        logger.info(f'📡 Раздача потока доступна на unix:{socket_path}')
+
+    await asyncio.gather(*(server.serve_forever() for server in servers))
+
+
+fanout = FanoutHub()
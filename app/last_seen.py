@@ -0,0 +1,154 @@
+import logging
+from datetime import datetime
+from typing import Iterable
+
+from sqlalchemy import TIMESTAMP, bindparam, select, func, any_
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import MatchLastSeen
+from app.utils import match_ids_param
+
+
+SOURCE_PINNACLE = 'pinnacle'
+SOURCE_ANALYZER = 'analyzer'
+
+logger = logging.getLogger(__name__)
+
+
+def track_last_seen(last_seen: dict[int, datetime], match_id: int, created_at: datetime):
+    """
+    Обновляет словарь match_id → максимальный created_at в рамках одного сброса буфера.
+    """
+    current = last_seen.get(match_id)
+    if current is None or created_at > current:
+        last_seen[match_id] = created_at
+
+
+async def upsert_last_seen(
+    session: AsyncSession,
+    source: str,
+    last_seen: dict[int, datetime]
+):
+    """
+    Одним INSERT ... ON CONFLICT обновляет время последнего появления матчей.
+    Значение last_seen только растёт (GREATEST), поэтому порядок сбросов не важен.
+    Коммит остаётся за вызывающим кодом.
+    """
+    if not last_seen:
+        return
+
+    # Строки по возрастанию match_id: параллельные писатели блокируют
+    # строки match_last_seen в одном порядке и не ловят взаимоблокировку
+    stmt = pg_insert(MatchLastSeen).values([
+        {'source': source, 'match_id': match_id, 'last_seen': ts}
+        for match_id, ts in sorted(last_seen.items())
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[MatchLastSeen.source, MatchLastSeen.match_id],
+        set_={'last_seen': func.greatest(MatchLastSeen.last_seen, stmt.excluded.last_seen)},
+    )
+    await session.execute(stmt)
+
+
+async def find_stale_match_ids(
+    session: AsyncSession,
+    source: str,
+    outdated_time: datetime
+) -> list[int]:
+    """
+    Возвращает ID матчей источника, которые не обновлялись с outdated_time.
+    Запрос обслуживается индексом (source, last_seen).
+    """
+    result = await session.execute(
+        select(MatchLastSeen.match_id)
+        .where(MatchLastSeen.source == source,
+               MatchLastSeen.last_seen < outdated_time)
+    )
+    return [row[0] for row in result.all()]
+
+
+async def find_match_ids(session: AsyncSession, source: str) -> set[int]:
+    """
+    Возвращает ID всех ещё не выгруженных матчей источника.
+    """
+    result = await session.execute(
+        select(MatchLastSeen.match_id).where(MatchLastSeen.source == source))
+    return {row[0] for row in result.all()}
+
+
+def exported_watermarks(watermarks: dict[int, datetime]):
+    """
+    Подзапрос (match_id, watermark) из словаря отметок выгрузки:
+    `SELECT unnest(:match_ids), unnest(:watermarks)` для соединения в DELETE ... USING.
+    """
+    match_ids = list(watermarks)
+    return select(
+        func.unnest(match_ids_param(match_ids)).label('match_id'),
+        func.unnest(bindparam('watermarks', value=[watermarks[m] for m in match_ids],
+                              type_=ARRAY(TIMESTAMP))).label('watermark'),
+    ).subquery('exported')
+
+
+async def delete_last_seen(
+    session: AsyncSession,
+    source: str,
+    match_ids: Iterable[int]
+):
+    """
+    Удаляет записи о выгруженных матчах. Коммит остаётся за вызывающим кодом.
+    """
+    match_ids = list(match_ids)
+    if not match_ids:
+        return
+
+    await session.execute(
+        MatchLastSeen.__table__.delete().where(
+            MatchLastSeen.source == source,
+            MatchLastSeen.match_id == any_(match_ids_param(match_ids))
+        )
+    )
+
+
+async def delete_exported_last_seen(
+    session: AsyncSession,
+    source: str,
+    watermarks: dict[int, datetime]
+):
+    """
+    Удаляет записи о выгруженных матчах, если last_seen не новее отметки выгрузки
+    (match_id → последний выгруженный created_at). Ожившие после выгрузки матчи
+    остаются в match_last_seen и будут выгружены снова. Коммит остаётся
+    за вызывающим кодом.
+    """
+    if not watermarks:
+        return
+
+    exported = exported_watermarks(watermarks)
+    await session.execute(
+        MatchLastSeen.__table__.delete().where(
+            MatchLastSeen.source == source,
+            MatchLastSeen.match_id == exported.c.match_id,
+            MatchLastSeen.last_seen <= exported.c.watermark,
+        )
+    )
+
+
+async def is_match_stale(
+    session: AsyncSession,
+    source: str,
+    match_id: int,
+    outdated_time: datetime
+) -> bool:
+    """
+    Проверяет по match_last_seen, что матч всё ещё не обновлялся с outdated_time.
+    Отсутствие записи означает, что матч уже выгружен.
+    """
+    result = await session.execute(
+        select(MatchLastSeen.last_seen)
+        .where(MatchLastSeen.source == source,
+               MatchLastSeen.match_id == match_id)
+    )
+    last_seen = result.scalar_one_or_none()
+    return last_seen is not None and last_seen < outdated_time
@@ -0,0 +1,274 @@
+import logging
+import queue
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable
+
+from app.constants.settings import (LINE_MOVE_EVENTS_KEPT, LINE_MOVE_MARKETS,
+                                    LINE_MOVE_THRESHOLD, LINE_MOVE_WINDOW_SECONDS)
+from app.metrics import UPDATES_DROPPED
+from app.utils import safe_parse_iso
+from app.writer_pinnacle import get_period_label
+
+
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Метка событий в очереди обновлений многопроцессного режима
+FORWARD_MOVES = 'moves'
+
+
+@dataclass
+class LineMoveEvent:
+    """
+    Резкое движение коэффициента Pinnacle внутри окна.
+
+    Поля:
+    - match_id, sport, period, market, line, outcome: ключ коэффициента
+    - from_value: экстремум окна, от которого считается движение
+    - to_value: новое значение
+    - change: относительное изменение (to_value / from_value - 1)
+    - seconds: за сколько секунд произошло движение
+    - at: CreatedAt нового значения (ISO)
+    """
+    match_id: int
+    sport: str | None
+    period: str
+    market: str
+    line: str
+    outcome: str
+    from_value: float
+    to_value: float
+    change: float
+    seconds: float
+    at: str
+
+    def to_json(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+class _KeyWindow:
+    """
+    Окно значений одного ключа: две монотонные очереди (минимумы и максимумы).
+    Каждое значение добавляется и удаляется не больше одного раза, поэтому
+    обновление окна и запрос min/max — O(1) амортизированно.
+    """
+    __slots__ = ('mins', 'maxs', 'last_ts')
+
+    def __init__(self):
+        self.mins: deque[tuple[float, float]] = deque()
+        self.maxs: deque[tuple[float, float]] = deque()
+        self.last_ts = 0.0
+
+    def push(self, ts: float, value: float):
+        mins, maxs = self.mins, self.maxs
+        while mins and mins[-1][1] >= value:
+            mins.pop()
+        mins.append((ts, value))
+        while maxs and maxs[-1][1] <= value:
+            maxs.pop()
+        maxs.append((ts, value))
+        self.last_ts = ts
+
+    def expire(self, oldest: float):
+        mins, maxs = self.mins, self.maxs
+        while mins and mins[0][0] < oldest:
+            mins.popleft()
+        while maxs and maxs[0][0] < oldest:
+            maxs.popleft()
+
+    def reset(self, ts: float, value: float):
+        self.mins.clear()
+        self.maxs.clear()
+        self.push(ts, value)
+
+
+class LineMoveDetector:
+    """
+    Потоковый детектор резких движений коэффициентов Pinnacle.
+
+    Для каждого ключа (матч, период, маркет, линия, исход) держит скользящее окно
+    window секунд по CreatedAt и сравнивает новое значение с минимумом и максимумом
+    окна. Движение на threshold и больше порождает событие; после события окно
+    ключа начинается заново, чтобы одно движение не сообщалось на каждом сообщении.
+
+    События пишутся в лог, передаются подписчикам (add_listener) и хранятся
+    в кольце последних LINE_MOVE_EVENTS_KEPT событий для API запросов.
+    """
+
+    def __init__(
+        self,
+        window: float = LINE_MOVE_WINDOW_SECONDS,
+        threshold: float = LINE_MOVE_THRESHOLD,
+        markets: tuple[str, ...] | None = LINE_MOVE_MARKETS,
+        events_kept: int = LINE_MOVE_EVENTS_KEPT,
+    ):
+        self.window = window
+        self.threshold = threshold
+        self.markets = set(markets) if markets else None
+        self.keys: dict[tuple, _KeyWindow] = {}
+        self.events: deque[LineMoveEvent] = deque(maxlen=events_kept)
+        self.listeners: list[Callable[[LineMoveEvent], None]] = []
+        self.forward_queue = None
+        self._last_sweep = 0.0
+
+    def add_listener(self, callback: Callable[[LineMoveEvent], None]):
+        """
+        Подписывает callback на события. Вызывается синхронно из цикла приёма,
+        поэтому должен быть быстрым (например, положить событие в очередь).
+        """
+        self.listeners.append(callback)
+
+    def forward_to(self, queue):
+        """
+        Многопроцессный режим: события уходят в процесс коллекторов,
+        где их отдаёт API запросов (см. app.multiprocess). При переполненной
+        очереди событие остаётся только в логе и у подписчиков.
+        """
+        self.forward_queue = queue
+
+    def observe_message(self, msg: dict[str, Any]):
+        """
+        Прогоняет через окна все коэффициенты одного сообщения Pinnacle.
+        """
+        try:
+            match_id = int(msg.get('MatchId', 0))
+        except (TypeError, ValueError):
+            return
+        try:
+            created_at = safe_parse_iso(msg.get('CreatedAt'))
+        except (TypeError, ValueError):
+            # Без CreatedAt (или с битым) сообщению нет места в окне: оно уйдёт
+            # в базу как обычно, но мимо детектора
+            return
+        if created_at.tzinfo is not None:
+            created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+        ts = (created_at - _EPOCH).total_seconds()
+
+        oldest = ts - self.window
+        threshold = self.threshold
+        markets = self.markets
+        keys = self.keys
+
+        for period_index, period_data in enumerate(msg.get('Periods') or []):
+            if not isinstance(period_data, dict):
+                continue
+            for market, lines in period_data.items():
+                if not isinstance(lines, dict) or (markets is not None and market not in markets):
+                    continue
+                for line, outcome_values in lines.items():
+                    if not isinstance(outcome_values, dict):
+                        continue
+                    for outcome, value_data in outcome_values.items():
+                        value = value_data.get('value') if isinstance(value_data, dict) else None
+                        try:
+                            value = float(value)
+                        except (TypeError, ValueError):
+                            continue
+                        if value <= 0:
+                            continue
+
+                        key = (match_id, period_index, market, line, outcome)
+                        window = keys.get(key)
+                        if window is None:
+                            window = keys[key] = _KeyWindow()
+                            window.push(ts, value)
+                            continue
+
+                        # Хвост обеих очередей — последнее значение. Повтор цены
+                        # (самый частый случай) лишь продлевает его в окне: с меньшим
+                        # окном движение относительно экстремумов не может вырасти
+                        newest = window.mins[-1]
+                        if newest[1] == value:
+                            window.mins[-1] = window.maxs[-1] = (ts, value)
+                            window.last_ts = ts
+                            continue
+
+                        window.expire(oldest)
+                        if window.mins:
+                            low_ts, low = window.mins[0]
+                            high_ts, high = window.maxs[0]
+                            if value / low - 1 >= threshold:
+                                self._emit(msg, key, low, value, ts - low_ts, created_at)
+                                window.reset(ts, value)
+                                continue
+                            if 1 - value / high >= threshold:
+                                self._emit(msg, key, high, value, ts - high_ts, created_at)
+                                window.reset(ts, value)
+                                continue
+                        window.push(ts, value)
+
+        if ts - self._last_sweep > self.window:
+            self._sweep(oldest)
+            self._last_sweep = ts
+
+    def _sweep(self, oldest: float):
+        """
+        Забывает ключи без значений в окне (матч закончился, линию сняли).
+        """
+        idle = [key for key, window in self.keys.items() if window.last_ts < oldest]
+        for key in idle:
+            del self.keys[key]
+
+    def _emit(self, msg: dict, key: tuple, from_value: float, to_value: float,
+              seconds: float, created_at: datetime):
+        match_id, period_index, market, line, outcome = key
+        sport = msg.get('SportName')
+        event = LineMoveEvent(
+            match_id=match_id, sport=sport,
+            period=get_period_label(sport, period_index) or str(period_index),
+            market=market, line=str(line), outcome=outcome,
+            from_value=from_value, to_value=to_value,
+            change=round(to_value / from_value - 1, 4), seconds=round(seconds, 1),
+            at=created_at.isoformat(),
+        )
+        arrow = '📈' if event.change > 0 else '📉'
+        logger.info(f'{arrow} Движение линии: матч {match_id} {event.period} {market} '
+                    f'{event.line} {outcome}: {from_value} → {to_value} '
+                    f'({event.change:+.1%} за {event.seconds} с)')
+
+        if self.forward_queue is not None:
+            try:
+                self.forward_queue.put_nowait((FORWARD_MOVES, [event]))
+            except queue.Full:
+                UPDATES_DROPPED.inc(FORWARD_MOVES)
+        else:
+            self.record(event)
+        for callback in self.listeners:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error(f'❌ Ошибка обработчика движения линии: {e}')
+
+    def record(self, events: LineMoveEvent | list[LineMoveEvent]):
+        """
+        Сохраняет события в кольцо последних событий (для API запросов).
+        """
+        if isinstance(events, LineMoveEvent):
+            events = [events]
+        self.events.extend(events)
+
+    def recent(
+        self,
+        match_id: int | None = None,
+        sport: str | None = None,
+        limit: int = 100,
+    ) -> list[LineMoveEvent]:
+        """
+        Последние события (новые первыми) с фильтром по матчу и виду спорта.
+        """
+        result = []
+        for event in reversed(self.events):
+            if match_id is not None and event.match_id != match_id:
+                continue
+            if sport is not None and event.sport != sport:
+                continue
+            result.append(event)
+            if len(result) >= limit:
+                break
+        return result
+
+
+line_moves = LineMoveDetector()
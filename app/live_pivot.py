@@ -0,0 +1,189 @@
+import csv
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+from app.constants.csv_columns import CSV_PINNACLE_COLUMNS
+from app.constants.paths import EXPORT_STAGING_DIR
+from app.models import LiveOddsParsed
+from app.pivot import expand_market_map, new_slot_maps, render_snapshot_rows
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class MatchPivotState:
+    """
+    Состояние инкрементального разворота одного матча.
+
+    Поля:
+    - first_created_at: created_at первой строки матча (проверяется при выгрузке)
+    - home, away, sport: мета-информация для имени файла
+    - home_score, away_score: счёт из первой строки (как в полной выгрузке)
+    - slot_maps: привязка линий к слотам, общая для всех сбросов
+    - csv_size: размер CSV после последней дозаписи
+    - broken: состояние потеряно, матч выгружается полным пересчётом
+    """
+    first_created_at: datetime
+    home: str
+    away: str
+    sport: str
+    home_score: int | None = None
+    away_score: int | None = None
+    slot_maps: dict[str, list[float]] = field(default_factory=new_slot_maps)
+    csv_size: int = 0
+    broken: bool = False
+
+    def to_json(self) -> dict:
+        data = self.__dict__.copy()
+        data['first_created_at'] = self.first_created_at.isoformat()
+        return data
+
+    @classmethod
+    def from_json(cls, data: dict) -> 'MatchPivotState':
+        data = dict(data)
+        data['first_created_at'] = datetime.fromisoformat(data['first_created_at'])
+        return cls(**data)
+
+
+class LivePivot:
+    """
+    Поддерживает широкие строки CSV_PINNACLE_COLUMNS для живых матчей.
+
+    После каждого сброса буфера строки матча разворачиваются в снимки
+    (created_at, period) и дописываются в staging/<match_id>.csv. Состояние слотов
+    хранится в памяти и в соседнем <match_id>.json, чтобы переживать рестарт.
+    Снимки сортируются внутри одного сброса; если одна секунда попала на границу
+    двух сбросов, в файле будет две строки для неё.
+    """
+
+    def __init__(self, staging_dir: Path = EXPORT_STAGING_DIR):
+        self.staging_dir = Path(staging_dir)
+        self.states: dict[int, MatchPivotState] = {}
+
+    def csv_path(self, match_id: int) -> Path:
+        return self.staging_dir / f'{match_id}.csv'
+
+    def _state_path(self, match_id: int) -> Path:
+        return self.staging_dir / f'{match_id}.json'
+
+    def _load_state(self, match_id: int) -> MatchPivotState | None:
+        """
+        Возвращает состояние матча из памяти или из файла состояния.
+        CSV без согласованного файла состояния считается повреждённым.
+        """
+        state = self.states.get(match_id)
+        if state is not None:
+            return state
+
+        state_path = self._state_path(match_id)
+        csv_path = self.csv_path(match_id)
+        if state_path.exists():
+            state = MatchPivotState.from_json(
+                json.loads(state_path.read_text(encoding='utf-8')))
+            actual_size = csv_path.stat().st_size if csv_path.exists() else 0
+            if actual_size != state.csv_size:
+                state.broken = True
+        elif csv_path.exists():
+            return None
+
+        if state is not None:
+            self.states[match_id] = state
+        return state
+
+    def _save_state(self, match_id: int, state: MatchPivotState):
+        tmp_path = self._state_path(match_id).with_suffix('.json.tmp')
+        tmp_path.write_text(json.dumps(state.to_json()), encoding='utf-8')
+        os.replace(tmp_path, self._state_path(match_id))
+
+    def append(self, rows: list[LiveOddsParsed]):
+        """
+        Дописывает строки одного сброса в staging-файлы соответствующих матчей.
+        Вызывается после коммита строк в базу.
+        """
+        by_match: dict[int, list[LiveOddsParsed]] = {}
+        for row in rows:
+            by_match.setdefault(row.match_id, []).append(row)
+
+        for match_id, match_rows in by_match.items():
+            try:
+                self._append_match(match_id, match_rows)
+            except Exception as e:
+                logger.warning(f'⚠️ Инкрементальный разворот матча {match_id} сломан: {e}')
+                self._mark_broken(match_id, match_rows[0])
+
+    def _append_match(self, match_id: int, rows: list[LiveOddsParsed]):
+        state = self._load_state(match_id)
+        if state is None and self.csv_path(match_id).exists():
+            raise RuntimeError('staging-файл без состояния')
+
+        if state is None:
+            first = min(rows, key=lambda r: r.created_at)
+            state = MatchPivotState(
+                first_created_at=first.created_at,
+                home=rows[0].home_team or 'home',
+                away=rows[0].away_team or 'away',
+                sport=rows[0].sport_name or 'sport',
+                home_score=rows[0].home_score,
+                away_score=rows[0].away_score,
+            )
+            self.states[match_id] = state
+
+        if state.broken:
+            return
+
+        snapshot_dict = expand_market_map(rows, state.slot_maps)
+        csv_path = self.csv_path(match_id)
+        with open(csv_path, mode='a', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_PINNACLE_COLUMNS)
+            if state.csv_size == 0:
+                writer.writeheader()
+            writer.writerows(render_snapshot_rows(
+                snapshot_dict, state.home, state.away,
+                state.home_score, state.away_score))
+            state.csv_size = f.tell()
+
+        self._save_state(match_id, state)
+
+    def _mark_broken(self, match_id: int, sample: LiveOddsParsed):
+        state = self.states.get(match_id)
+        if state is None:
+            state = MatchPivotState(
+                first_created_at=sample.created_at,
+                home=sample.home_team or 'home',
+                away=sample.away_team or 'away',
+                sport=sample.sport_name or 'sport',
+            )
+            self.states[match_id] = state
+        state.broken = True
+        try:
+            self._save_state(match_id, state)
+        except OSError:
+            pass
+
+    def get_staged(self, match_id: int) -> MatchPivotState | None:
+        """
+        Возвращает состояние матча, если его staging-файл пригоден для выгрузки.
+        """
+        state = self._load_state(match_id)
+        if state is None or state.broken or not self.csv_path(match_id).exists():
+            return None
+        return state
+
+    def discard(self, match_id: int):
+        """
+        Забывает матч и удаляет его staging-файлы.
+        """
+        self.states.pop(match_id, None)
+        for path in (self.csv_path(match_id), self._state_path(match_id)):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+live_pivot = LivePivot()
@@ -0,0 +1,265 @@
+import fcntl
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from app.constants.paths import (EXPORT_ANALYZER_DIR, EXPORT_PINNACLE_DIR, MANIFEST_CURSOR_PATH,
+                                 MANIFEST_LOCK_PATH, MANIFEST_PATH, MANIFEST_PENDING_PATH,
+                                 MANIFEST_REJECTED_PATH)
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ManifestEntry:
+    """
+    Запись манифеста о готовом CSV-файле.
+
+    Поля:
+    - source: источник ("pinnacle" или "analyzer"), совпадает с именем папки выгрузки
+    - path: путь к CSV-файлу
+    - size: размер файла в байтах
+    - exported_at: время выгрузки (секунды от эпохи)
+    - match_id, date, sport, outcome: атрибуты матча для каталога архивов
+    """
+    source: str
+    path: str
+    size: int
+    exported_at: float
+    match_id: int | None = None
+    date: str | None = None
+    sport: str | None = None
+    outcome: str | None = None
+
+
+@contextmanager
+def _manifest_lock():
+    """
+    Межпроцессная блокировка манифеста: дозапись и ротация не пересекаются.
+    """
+    fd = os.open(MANIFEST_LOCK_PATH, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+def make_entry(
+    source: str,
+    path: str | Path,
+    match_id: int | None = None,
+    date: str | None = None,
+    sport: str | None = None,
+    outcome: str | None = None,
+) -> ManifestEntry:
+    """
+    Создаёт запись манифеста для только что записанного файла.
+    """
+    return ManifestEntry(
+        source=source,
+        path=str(path),
+        size=os.path.getsize(path),
+        exported_at=time.time(),
+        match_id=match_id,
+        date=date,
+        sport=sport,
+        outcome=outcome,
+    )
+
+
+def append_exports(entries: list[ManifestEntry]):
+    """
+    Дописывает записи о готовых выгрузках в манифест одной записью с fsync.
+    Вызывается коллекторами после того, как сами CSV сброшены на диск.
+    """
+    if not entries:
+        return
+
+    data = ''.join(json.dumps(asdict(e), ensure_ascii=False) + '\n' for e in entries).encode('utf-8')
+    with _manifest_lock():
+        fd = os.open(MANIFEST_PATH, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            size = os.fstat(fd).st_size
+            if size and os.pread(fd, 1, size - 1) != b'\n':
+                # Прошлая запись оборвалась на середине строки (падение процесса):
+                # закрываем её, чтобы не склеить с новой
+                data = b'\n' + data
+            os.write(fd, data)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def bootstrap_manifest():
+    """
+    Однократно переносит в манифест CSV, выгруженные до его появления.
+    Листинг директорий выполняется только пока архиватор ни разу не читал манифест.
+    """
+    if Path(MANIFEST_CURSOR_PATH).exists():
+        return
+
+    known_paths = set()
+    for manifest_path in (MANIFEST_PATH, MANIFEST_PENDING_PATH):
+        try:
+            with open(manifest_path, 'rb') as f:
+                for line in f:
+                    entry = _parse_line(line) if line.endswith(b'\n') else None
+                    if entry is not None:
+                        known_paths.add(entry.path)
+        except FileNotFoundError:
+            pass
+
+    entries = []
+    for source_dir in (EXPORT_PINNACLE_DIR, EXPORT_ANALYZER_DIR):
+        for file_path in Path(source_dir).glob('*.csv'):
+            if str(file_path) in known_paths:
+                continue
+            stat = file_path.stat()
+            parts = file_path.stem.split('_', 2)
+            match_id = int(parts[0]) if parts[0].isdigit() else None
+            date = parts[1] if len(parts) > 1 else None
+            entries.append(ManifestEntry(
+                source=Path(source_dir).name,
+                path=str(file_path),
+                size=stat.st_size,
+                exported_at=stat.st_mtime,
+                match_id=match_id,
+                date=date,
+            ))
+
+    entries.sort(key=lambda e: e.exported_at)
+    if entries:
+        # Старые файлы должны идти раньше новых, поэтому пишем их в pending-файл
+        _prepend_pending(entries)
+    Path(MANIFEST_CURSOR_PATH).write_text('0', encoding='utf-8')
+    logger.info(f'🗂️ Манифест дополнен существующими файлами: {len(entries)} записей')
+
+
+def _parse_line(line: bytes) -> ManifestEntry | None:
+    """
+    Разбирает строку манифеста; None — строка повреждена.
+
+    Строка, к которой до исправления дозаписи приклеилась оборванная запись,
+    заканчивается целой записью: её берём с последнего начала записи.
+    """
+    try:
+        return ManifestEntry(**json.loads(line))
+    except (ValueError, TypeError):
+        pass
+    start = line.rfind(b'{"source": ')
+    if start <= 0:
+        return None
+    try:
+        entry = ManifestEntry(**json.loads(line[start:]))
+    except (ValueError, TypeError):
+        return None
+    logger.warning(f'⚠️ Отброшена оборванная запись манифеста: {line[:start][:200]!r}')
+    return entry
+
+
+def _quarantine(line: bytes):
+    """
+    Откладывает повреждённую строку манифеста в отдельный файл для разбора вручную.
+    """
+    logger.warning(f'⚠️ Повреждённая строка манифеста отложена в {MANIFEST_REJECTED_PATH}: '
+                   f'{line[:200]!r}')
+    with open(MANIFEST_REJECTED_PATH, 'ab') as f:
+        f.write(line if line.endswith(b'\n') else line + b'\n')
+
+
+def _prepend_pending(entries: list[ManifestEntry]):
+    data = ''.join(json.dumps(asdict(e), ensure_ascii=False) + '\n' for e in entries)
+    pending_path = Path(MANIFEST_PENDING_PATH)
+    existing = pending_path.read_bytes() if pending_path.exists() else b''
+    tmp_path = pending_path.with_suffix('.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(data.encode('utf-8') + existing)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, pending_path)
+
+
+class ManifestReader:
+    """
+    Инкрементальное чтение манифеста архиватором.
+
+    Коллекторы пишут в manifest.jsonl. Архиватор переименовывает его в
+    manifest.pending.jsonl и читает от сохранённого курсора; когда pending-файл
+    прочитан и заархивирован целиком, он удаляется и ротируется следующий.
+    """
+
+    def __init__(self):
+        self.pending_path = Path(MANIFEST_PENDING_PATH)
+        self.cursor_path = Path(MANIFEST_CURSOR_PATH)
+
+    def _load_cursor(self) -> int:
+        try:
+            return int(self.cursor_path.read_text(encoding='utf-8') or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _save_cursor(self, offset: int):
+        tmp_path = self.cursor_path.with_suffix('.tmp')
+        tmp_path.write_text(str(offset), encoding='utf-8')
+        os.replace(tmp_path, self.cursor_path)
+
+    def _rotate(self) -> bool:
+        with _manifest_lock():
+            active = Path(MANIFEST_PATH)
+            if not active.exists() or active.stat().st_size == 0:
+                return False
+            os.replace(active, self.pending_path)
+        self._save_cursor(0)
+        return True
+
+    def take_older_than(self, horizon: float) -> tuple[list[ManifestEntry], int, bool]:
+        """
+        Читает из pending-файла записи, выгруженные раньше horizon.
+
+        :return: (записи, новый курсор, прочитан ли pending-файл до конца)
+        """
+        if not self.pending_path.exists() and not self._rotate():
+            return [], 0, False
+
+        offset = self._load_cursor()
+        entries = []
+        exhausted = True
+
+        with open(self.pending_path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # pending-файл уже не дописывается: хвост без перевода строки —
+                    # запись, оборванная падением до ротации
+                    _quarantine(line)
+                    offset += len(line)
+                    break
+                entry = _parse_line(line)
+                if entry is None:
+                    _quarantine(line)
+                    offset += len(line)
+                    continue
+                if entry.exported_at >= horizon:
+                    exhausted = False
+                    break
+                entries.append(entry)
+                offset += len(line)
+
+        return entries, offset, exhausted
+
+    def commit(self, offset: int, exhausted: bool):
+        """
+        Фиксирует прочитанное после того, как записи заархивированы.
+        """
+        if exhausted:
+            self.pending_path.unlink(missing_ok=True)
+            self._save_cursor(0)
+        else:
+            self._save_cursor(offset)
@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime, timezone
+
+from app.constants.settings import (OUTDATED_THRESHOLD, TIMER_WHEEL_TICK_SECONDS,
+                                    EXPORT_QUEUE_MAXSIZE)
+from app.metrics import EXPORT_QUEUE_DEPTH
+
+
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _to_epoch(dt: datetime) -> float:
+    """
+    Переводит naive-UTC (или aware) datetime в секунды от эпохи.
+    """
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return (dt - _EPOCH).total_seconds()
+
+
+class LastSeenTimerWheel:
+    """
+    Хешированное колесо таймеров «время последнего появления ключа».
+
+    Каждый ключ лежит ровно в одном слоте — слоте своего дедлайна (last_seen + timeout).
+    Повторное появление ключа переносит его из старого слота в новый. Стоимость touch
+    и истечения одного ключа — O(1), память — O(число живых ключей).
+    """
+
+    def __init__(self, timeout: float, tick: float):
+        """
+        :param timeout: Сколько секунд тишины считать завершением
+        :param tick: Шаг колеса в секундах
+        """
+        self.timeout = timeout
+        self.tick = tick
+        self.size = math.ceil(timeout / tick) + 2
+        self.slots: list[set[int]] = [set() for _ in range(self.size)]
+        self.last_seen: dict[int, float] = {}
+        self.deadline_tick: dict[int, int] = {}
+        self.cursor = int(time.time() // tick)
+
+    def __len__(self) -> int:
+        return len(self.last_seen)
+
+    def touch(self, key: int, ts: float):
+        """
+        Отмечает появление ключа в момент ts (секунды от эпохи).
+        Более старые отметки игнорируются.
+        """
+        prev = self.last_seen.get(key)
+        if prev is not None and ts <= prev:
+            return
+        self.last_seen[key] = ts
+
+        tick = max(int((ts + self.timeout) // self.tick) + 1, self.cursor + 1)
+        prev_tick = self.deadline_tick.get(key)
+        if prev_tick == tick:
+            return
+        if prev_tick is not None:
+            self.slots[prev_tick % self.size].discard(key)
+        self.deadline_tick[key] = tick
+        self.slots[tick % self.size].add(key)
+
+    def advance(self, now: float) -> list[int]:
+        """
+        Двигает курсор до момента now и возвращает ключи, чей дедлайн истёк.
+        """
+        expired = []
+        target = int(now // self.tick)
+
+        while self.cursor < target:
+            self.cursor += 1
+            slot = self.slots[self.cursor % self.size]
+            if not slot:
+                continue
+
+            for key in list(slot):
+                tick = self.deadline_tick.get(key)
+                if tick is not None and tick > self.cursor:
+                    if tick % self.size == self.cursor % self.size:
+                        # дедлайн дальше одного оборота (отметка из будущего) —
+                        # ключ ждёт следующего оборота колеса
+                        continue
+                    # запись не из слота дедлайна ключа
+                    slot.discard(key)
+                    continue
+                slot.discard(key)
+                if tick == self.cursor:
+                    expired.append(key)
+                    del self.deadline_tick[key]
+                    del self.last_seen[key]
+
+        return expired
+
+
+class MatchFinishTracker:
+    """
+    Отслеживает время последнего появления матчей в потоке и складывает «затихшие»
+    матчи в ограниченную очередь на выгрузку.
+
+    Очередь ограничена: при переполнении матч не теряется — его подберёт
+    периодический поллинг коллектора, который остаётся страховкой.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        timeout: float = OUTDATED_THRESHOLD * 3600,
+        tick: float = TIMER_WHEEL_TICK_SECONDS,
+        queue_size: int = EXPORT_QUEUE_MAXSIZE,
+    ):
+        self.name = name
+        self.wheel = LastSeenTimerWheel(timeout, tick)
+        self.queue: asyncio.Queue[int] = asyncio.Queue(maxsize=queue_size)
+        self.forward_queue = None
+        self.enabled = True
+        EXPORT_QUEUE_DEPTH.set_function(name.lower(), func=self.queue.qsize)
+
+    def forward_to(self, queue):
+        """
+        Многопроцессный режим: колесо живёт в процессе коллекторов, а писатели
+        только пересылают отметки в очередь multiprocessing (см. app.multiprocess).
+        """
+        self.forward_queue = queue
+
+    def disable(self):
+        """
+        Процесс без коллекторов (--components): колесо никто не продвигает,
+        поэтому отметки не копятся, а затихшие матчи выгружает поллинг.
+        """
+        self.enabled = False
+
+    def touch(self, last_seen: dict[int, datetime]):
+        """
+        Учитывает результат сброса буфера: match_id → максимальный created_at.
+        """
+        if not self.enabled:
+            return
+        epochs = {match_id: _to_epoch(created_at) for match_id, created_at in last_seen.items()}
+        if self.forward_queue is not None:
+            self.forward_queue.put((self.name, epochs))
+        else:
+            self.touch_epochs(epochs)
+
+    def touch_epochs(self, last_seen: dict[int, float]):
+        """
+        То же, что touch, но с отметками в секундах от эпохи.
+        """
+        if not self.enabled:
+            return
+        for match_id, ts in last_seen.items():
+            self.wheel.touch(match_id, ts)
+
+    def enqueue_expired(self, now: float | None = None) -> int:
+        """
+        Переносит истёкшие матчи в очередь выгрузки. Возвращает число поставленных.
+        """
+        expired = self.wheel.advance(time.time() if now is None else now)
+        queued = 0
+        for match_id in expired:
+            try:
+                self.queue.put_nowait(match_id)
+                queued += 1
+            except asyncio.QueueFull:
+                logger.warning(
+                    f'[{self.name}] Очередь выгрузки заполнена, матч {match_id} '
+                    f'будет выгружен поллингом')
+        if queued:
+            logger.info(f'[{self.name}] ⏰ {queued} матчей затихли, поставлены на выгрузку')
+        return queued
+
+    async def run_tick_loop(self):
+        """
+        Вечный цикл продвижения колеса таймеров.
+        """
+        while True:
+            await asyncio.sleep(self.wheel.tick)
+            self.enqueue_expired()
+
+
+pinnacle_finish_tracker = MatchFinishTracker('Pinnacle')
+analyzer_finish_tracker = MatchFinishTracker('Analyzer')
+
+
+async def run_match_finish_loop():
+    """
+    Запускает циклы колёс таймеров для Pinnacle и анализатора.
+    """
+    await asyncio.gather(
+        pinnacle_finish_tracker.run_tick_loop(),
+        analyzer_finish_tracker.run_tick_loop(),
+    )
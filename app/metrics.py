@@ -0,0 +1,305 @@
+import asyncio
+import ipaddress
+import logging
+import time
+from bisect import bisect_left
+from datetime import datetime, timezone
+from typing import Callable, Iterable
+from urllib.parse import parse_qs, urlsplit
+
+from app.constants.settings import (EVENT_LOOP_LAG_INTERVAL, METRICS_HOST, METRICS_PORT,
+                                    PROFILE_CAPTURE_CYCLES, PROFILE_MAX_CYCLES)
+from app.profiling import request_capture
+
+
+logger = logging.getLogger(__name__)
+
+# Границы гистограмм длительностей (в секундах)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+LAG_BUCKETS = (0.5, 1, 2, 5, 10, 30, 60, 90, 120, 300, 600)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+
+
+def _format_labels(labelnames: tuple[str, ...], values: tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    """
+    Базовая метрика: значения хранятся в словаре по кортежу меток.
+    Обновление — один поиск в словаре без блокировок: всё работает в одном event loop,
+    а из потоков метрики обновляются только целыми операциями.
+    """
+
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY.register(self)
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def _samples(self) -> list[str]:
+        return [f'{self.name}{_format_labels(self.labelnames, labels)} {value}'
+                for labels, value in list(self._values.items())]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple, float] = {}
+        self._functions: dict[tuple, Callable[[], float]] = {}
+
+    def set(self, *labels: str, value: float):
+        self._values[labels] = value
+
+    def set_function(self, *labels: str, func: Callable[[], float]):
+        """
+        Значение вычисляется при сборе метрик (например, длина очереди).
+        """
+        self._functions[labels] = func
+
+    def _samples(self) -> list[str]:
+        values = dict(self._values)
+        for labels, func in list(self._functions.items()):
+            try:
+                values[labels] = func()
+            except Exception:
+                continue
+        return [f'{self.name}{_format_labels(self.labelnames, labels)} {value}'
+                for labels, value in values.items()]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: tuple[float, ...] = DURATION_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # метки → [счётчики по корзинам (последняя — +Inf), сумма]
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, *labels: str, value: float):
+        state = self._values.get(labels)
+        if state is None:
+            state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def time(self, *labels: str) -> '_Timer':
+        """
+        Контекстный менеджер, измеряющий длительность блока.
+        """
+        return _Timer(self, labels)
+
+    def _samples(self) -> list[str]:
+        lines = []
+        for labels, (counts, total) in list(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                le_label = f'le="{le}"'
+                lines.append(f'{self.name}_bucket'
+                             f'{_format_labels(self.labelnames, labels, le_label)} {cumulative}')
+            suffix = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{suffix} {total}')
+            lines.append(f'{self.name}_count{suffix} {cumulative}')
+        return lines
+
+
+class _Timer:
+    """
+    Замер длительности блока; работает и как обычный, и как асинхронный контекст.
+    """
+
+    def __init__(self, histogram: Histogram, labels: tuple):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(*self.labels, value=time.perf_counter() - self.started)
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, *exc):
+        self.__exit__(*exc)
+
+
+class Registry:
+
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+
+    def register(self, metric: _Metric):
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+# Приём и буферизация
+WS_MESSAGES = Counter('ws_messages_total', 'Сообщения, полученные из WebSocket', ('source',))
+AGGREGATOR_BUFFER_MESSAGES = Gauge('aggregator_buffer_messages',
+                                   'Сообщений в буфере агрегатора', ('source',))
+AGGREGATOR_BUFFER_BYTES = Gauge('aggregator_buffer_bytes',
+                                'Размер буфера агрегатора в байтах исходного JSON', ('source',))
+AGGREGATOR_FLUSH_SECONDS = Histogram('aggregator_flush_seconds',
+                                     'Длительность сброса буфера агрегатора', ('source',))
+INGEST_FRAMES = Counter('ingest_frames_total',
+                        'Кадры, переданные процессам записи (многопроцессный режим)', ('source',))
+INGEST_QUEUE_DEPTH = Gauge('ingest_queue_depth',
+                           'Кадров в очереди к процессам записи (многопроцессный режим)')
+UPDATES_DROPPED = Counter('updates_dropped_total',
+                          'Обновления кэшей и раздачи, отброшенные писателями при переполненной '
+                          'очереди к коллекторам (многопроцессный режим)', ('kind',))
+
+# Раздача потока подписчикам
+FANOUT_SUBSCRIBERS = Gauge('fanout_subscribers', 'Подключённые подписчики раздачи потока')
+FANOUT_MESSAGES = Counter('fanout_messages_total',
+                          'Сообщения (матч за сброс), разосланные подписчикам', ('source',))
+FANOUT_DROPPED = Counter('fanout_dropped_total', 'Медленные подписчики, отключённые раздачей')
+
+# Запись в базу
+ROWS_COMMITTED = Counter('rows_committed_total', 'Строки, записанные в базу', ('source',))
+COMMIT_LAG_SECONDS = Histogram('commit_lag_seconds',
+                               'Задержка от CreatedAt до коммита (по последнему CreatedAt матча)',
+                               ('source',), buckets=LAG_BUCKETS)
+
+# Выгрузка и архивация
+EXPORT_QUEUE_DEPTH = Gauge('export_queue_depth', 'Матчей в очереди на выгрузку', ('source',))
+EXPORTED_MATCHES = Counter('exported_matches_total', 'Выгруженные матчи', ('source',))
+EXPORT_CYCLE_SECONDS = Histogram('export_cycle_seconds',
+                                 'Длительность цикла выгрузки матчей', ('source',))
+ARCHIVE_CYCLE_SECONDS = Histogram('archive_cycle_seconds', 'Длительность цикла архивации')
+ARCHIVED_FILES = Counter('archived_files_total', 'CSV-файлы, добавленные в архивы', ('source',))
+
+# Event loop
+EVENT_LOOP_LAG_SECONDS = Histogram('event_loop_lag_seconds',
+                                   'Задержка срабатывания таймера event loop',
+                                   buckets=LOOP_LAG_BUCKETS)
+
+
+def observe_commit_lag(source: str, last_seen: dict[int, datetime]):
+    """
+    Записывает задержку от CreatedAt до коммита для каждого матча сброса.
+    Наивные метки считаются UTC, как их присылают источники.
+    """
+    now = datetime.now(timezone.utc)
+    naive_now = now.replace(tzinfo=None)
+    for created_at in last_seen.values():
+        base = now if created_at.tzinfo is not None else naive_now
+        COMMIT_LAG_SECONDS.observe(source, value=max((base - created_at).total_seconds(), 0.0))
+
+
+async def run_event_loop_lag_monitor(interval: float = EVENT_LOOP_LAG_INTERVAL):
+    """
+    Засыпает на interval и измеряет, насколько позже event loop разбудил задачу.
+    Большая задержка означает, что что-то блокирует loop.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG_SECONDS.observe(value=max(loop.time() - started - interval, 0.0))
+
+
+def _is_local_peer(writer: asyncio.StreamWriter) -> bool:
+    """
+    Пришёл ли запрос с localhost: эндпоинт метрик слушает все интерфейсы,
+    а включать профилирование можно только локально.
+    """
+    peer = writer.get_extra_info('peername')
+    try:
+        return ipaddress.ip_address(peer[0]).is_loopback
+    except (TypeError, IndexError, ValueError):
+        return False
+
+
+async def _handle_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        # Заголовки запроса не нужны, но их надо дочитать
+        while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b'\r\n', b'\n', b''):
+            pass
+
+        parts = request_line.decode('latin-1').split()
+        url = urlsplit(parts[1] if len(parts) > 1 else '/')
+        if url.path == '/metrics':
+            status, body = '200 OK', REGISTRY.render().encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        elif url.path == '/profile':
+            if not _is_local_peer(writer):
+                status, body, content_type = '403 Forbidden', b'forbidden\n', 'text/plain'
+            else:
+                query = parse_qs(url.query)
+                cycles = min(int(query.get('cycles', [PROFILE_CAPTURE_CYCLES])[0]),
+                             PROFILE_MAX_CYCLES)
+                request_capture(cycles)
+                status, content_type = '200 OK', 'text/plain'
+                body = f'profiling next {cycles} cycles\n'.encode('utf-8')
+        else:
+            status, body, content_type = '404 Not Found', b'not found\n', 'text/plain'
+
+        writer.write(
+            f'HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n'
+            f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode('latin-1') + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def run_metrics_server(host: str = METRICS_HOST, port: int = METRICS_PORT):
+    """
+    Поднимает HTTP-эндпоинт /metrics в формате Prometheus и монитор задержки event loop.
+    GET /profile?cycles=N с localhost включает профилирование следующих N циклов
+    (не больше PROFILE_MAX_CYCLES, см. app.profiling).
+    """
+    server = await asyncio.start_server(_handle_request, host, port)
+    logger.info(f'📈 Метрики доступны на http://{host}:{port}/metrics')
+    async with server:
+        await asyncio.gather(server.serve_forever(), run_event_loop_lag_monitor())
@@ -1,5 +1,5 @@
 from sqlalchemy import (Column, BigInteger, String, Float, TIMESTAMP,
-                        Index, Integer, desc)
+                        Index, Integer, SmallInteger, desc)
 from sqlalchemy.orm import declarative_base
 
 
@@ -21,6 +21,8 @@ class LiveOddsParsed(Base):
     - market: Название маркета (например, Totals, Handicap)
     - outcome: Исход (например, Win1, WinMore)
     - line: Линия, если применимо (например, 2.5)
+    - line_slot: Слот линии в CSV (Totals_2_WinMore → 2) у строк обратной загрузки,
+      для которых сама линия неизвестна; у живых строк пусто
     - value: Коэффициент
     - created_at: Время получения данных
     - key_hash: Уникальный хеш записи (используется для поиска)
@@ -40,6 +42,7 @@ class LiveOddsParsed(Base):
     market = Column(String, nullable=False)
     outcome = Column(String, nullable=False)
     line = Column(String, nullable=True)
+    line_slot = Column(SmallInteger, nullable=True)
     value = Column(Float, nullable=True)
     created_at = Column(TIMESTAMP, nullable=False)
     key_hash = Column(String(64), nullable=False)
@@ -95,3 +98,132 @@ class AnalyzerOddsParsed(Base):
         Index('ix_analyzer_keyhash_created', 'key_hash', 'created_at'),
         Index('ix_analyzer_match_created', 'match_id_pinnacle', desc('created_at')),
     )
+
+
+class MatchLastSeen(Base):
+    """
+    Время последнего обновления матча по источнику.
+
+    Таблица поддерживается писателями (один upsert на сброс буфера) и позволяет
+    коллекторам находить устаревшие матчи индексным range scan'ом вместо
+    GROUP BY по всей таблице коэффициентов.
+
+    Поля:
+    - source: Источник данных ("pinnacle" или "analyzer")
+    - match_id: ID матча (для анализатора — match_id_pinnacle)
+    - last_seen: Максимальный created_at по матчу
+    """
+    __tablename__ = 'match_last_seen'
+
+    source = Column(String(16), primary_key=True)
+    match_id = Column(BigInteger, primary_key=True)
+    last_seen = Column(TIMESTAMP, nullable=False)
+
+    __table_args__ = (
+        Index('ix_match_last_seen_source_last_seen', 'source', 'last_seen'),
+    )
+
+
+class ClusterInstance(Base):
+    """
+    Живые экземпляры сервиса (кластерный режим, CLUSTER_ENABLED).
+
+    Каждый экземпляр раз в CLUSTER_HEARTBEAT_INTERVAL обновляет свою строку;
+    экземпляры без отметки дольше CLUSTER_MEMBER_TTL считаются выбывшими.
+
+    Поля:
+    - instance_id: ID экземпляра (хост, PID, случайный суффикс)
+    - hostname: Имя хоста
+    - started_at: Время запуска
+    - heartbeat_at: Время последней отметки
+    """
+    __tablename__ = 'cluster_instances'
+
+    instance_id = Column(String(64), primary_key=True)
+    hostname = Column(String(255), nullable=False)
+    started_at = Column(TIMESTAMP, nullable=False)
+    heartbeat_at = Column(TIMESTAMP, nullable=False)
+
+
+class ExportLease(Base):
+    """
+    Аренда выгрузки матча: матч выгружает только экземпляр, захвативший аренду.
+
+    Аренда снимается в одной транзакции с удалением выгруженного матча. Если
+    экземпляр упал посреди выгрузки, аренда истекает и матч подхватит другой.
+
+    Поля:
+    - source: Источник данных ("pinnacle" или "analyzer")
+    - match_id: ID матча
+    - owner: ID экземпляра-владельца
+    - expires_at: Время истечения аренды
+    """
+    __tablename__ = 'export_leases'
+
+    source = Column(String(16), primary_key=True)
+    match_id = Column(BigInteger, primary_key=True)
+    owner = Column(String(64), nullable=False)
+    expires_at = Column(TIMESTAMP, nullable=False)
+
+
+class OddsRollup(Base):
+    """
+    Свёртка коэффициентов Pinnacle по интервалам времени (ROLLUP_BUCKETS).
+
+    Писатель обновляет свёртки в той же транзакции, что и сырые строки, а коллектор
+    их не удаляет: история движения линий остаётся после выгрузки матча.
+
+    Поля:
+    - bucket_seconds: Длина интервала (например, 60 или 300)
+    - bucket_start: Начало интервала
+    - match_id, period, market, line, outcome: Ключ коэффициента (у каждой линии
+      своя свёртка; пустая строка — маркет без линии)
+    - sport_name: Вид спорта
+    - open_value, high_value, low_value, last_value: Первый, максимальный,
+      минимальный и последний коэффициент в интервале
+    - count: Число значений в интервале
+    - first_at, last_at: CreatedAt первого и последнего значения
+    """
+    __tablename__ = 'odds_rollup'
+
+    match_id = Column(BigInteger, primary_key=True)
+    bucket_seconds = Column(Integer, primary_key=True)
+    bucket_start = Column(TIMESTAMP, primary_key=True)
+    period = Column(String, primary_key=True)
+    market = Column(String, primary_key=True)
+    line = Column(String, primary_key=True)
+    outcome = Column(String, primary_key=True)
+    sport_name = Column(String, nullable=True)
+    open_value = Column(Float, nullable=False)
+    high_value = Column(Float, nullable=False)
+    low_value = Column(Float, nullable=False)
+    last_value = Column(Float, nullable=False)
+    count = Column(Integer, nullable=False)
+    first_at = Column(TIMESTAMP, nullable=False)
+    last_at = Column(TIMESTAMP, nullable=False)
+
+    __table_args__ = (
+        Index('ix_odds_rollup_bucket_start', 'bucket_start'),
+    )
+
+
+class BackfillCheckpoint(Base):
+    """
+    Прогресс импорта архивных CSV обратно в live_odds_parsed (scripts/backfill_import.py).
+
+    Строка пишется в одной транзакции с COPY строк CSV, поэтому повторный запуск
+    пропускает уже загруженные файлы и не дублирует строки.
+
+    Поля:
+    - archive, member: Архив и имя CSV внутри него
+    - match_id: ID матча
+    - rows: Сколько строк live_odds_parsed получено из CSV
+    - imported_at: Время загрузки
+    """
+    __tablename__ = 'backfill_checkpoints'
+
+    archive = Column(String, primary_key=True)
+    member = Column(String, primary_key=True)
+    match_id = Column(BigInteger, nullable=True)
+    rows = Column(Integer, nullable=False)
+    imported_at = Column(TIMESTAMP, nullable=False)
@@ -0,0 +1,298 @@
+"""
+Многопроцессный режим запуска.
+
+- Процесс приёма (главный) держит WebSocket-соединения и без разбора кладёт
+  кадры (байты JSON) в общую очередь multiprocessing.
+- N процессов записи забирают кадры из очереди, разбирают их, копят в своих
+  агрегаторах и пишут в базу. Очередь общая, поэтому кадры распределяются
+  между писателями сами: кто свободен, тот и забирает.
+- Процесс коллекторов выполняет событийную и поллинговую выгрузку, архивацию
+  и загрузку. Состояние, которое должно видеть весь поток (колёса таймеров,
+  кэш коэффициентов для API запросов), живёт здесь: писатели пересылают
+  обновления через отдельную очередь.
+
+Каждый процесс поднимает свой эндпоинт метрик: приём — METRICS_PORT,
+коллекторы — METRICS_PORT + 1, писатель i — METRICS_PORT + 2 + i.
+
+Процесс приёма импортирует только WebSocket-клиент и очередь: разбор, запись
+и коллекторы импортируются в своих процессах, поэтому приём после перезапуска
+начинает принимать кадры быстро, а писатели догоняют по очереди.
+"""
+
+import asyncio
+import logging
+import multiprocessing as mp
+import queue
+
+from app.components import (COMPONENTS, INGEST, WRITERS, background_tasks,
+                            prepare_components)
+from app.config import settings
+from app.constants.settings import (CLUSTER_ENABLED, FANOUT_ENABLED, FRAME_BATCH_SIZE,
+                                    FRAME_QUEUE_MAXSIZE, LINE_MOVE_ENABLED, LIVE_PIVOT_ENABLED,
+                                    METRICS_ENABLED, METRICS_PORT, QUERY_API_ENABLED,
+                                    UPDATE_QUEUE_MAXSIZE, WRITE_INTERVAL)
+from app.match_finish import analyzer_finish_tracker, pinnacle_finish_tracker
+from app.metrics import INGEST_FRAMES, INGEST_QUEUE_DEPTH, run_metrics_server
+from app.profiling import install_signal_handler
+from app.utils import setup_logging
+from app.websocket_client import WebSocketClient
+
+
+logger = logging.getLogger(__name__)
+
+# Как часто процесс приёма проверяет, что дочерние процессы живы (в секундах)
+PROCESS_CHECK_INTERVAL = 5
+
+
+def drain_queue(q, max_items: int) -> list:
+    """
+    Блокирующе ждёт первый элемент очереди и забирает ещё до max_items без ожидания.
+    Вызывается в потоке, чтобы не держать event loop.
+    """
+    items = [q.get()]
+    while len(items) < max_items:
+        try:
+            items.append(q.get_nowait())
+        except queue.Empty:
+            break
+    return items
+
+
+class FrameQueue:
+    """
+    Обёртка над очередью кадров на стороне процесса приёма.
+    """
+
+    def __init__(self, frames):
+        self.frames = frames
+        INGEST_QUEUE_DEPTH.set_function(func=frames.qsize)
+
+    async def put(self, source_name: str, message: str | bytes):
+        """
+        Кладёт кадр в очередь. Если писатели не успевают и очередь заполнена,
+        ожидание уходит в поток — приём притормаживает, но кадры не теряются.
+        """
+        if isinstance(message, str):
+            message = message.encode('utf-8')
+        item = (source_name, message)
+        INGEST_FRAMES.inc(source_name.lower())
+        try:
+            self.frames.put_nowait(item)
+        except queue.Full:
+            await asyncio.to_thread(self.frames.put, item)
+
+
+class ForwardingWebSocketClient(WebSocketClient):
+    """
+    WebSocket-клиент процесса приёма: кадры не разбираются, а уходят писателям.
+    """
+
+    async def listen(self, ws, frame_queue: FrameQueue) -> None:
+        logger.info(f'[{self.source_name}] Ожидание входящих сообщений (пересылка писателям)')
+        async for message in ws:
+            await frame_queue.put(self.source_name, message)
+
+
+async def _writer_main(index: int, frames, updates, fanout_subscribers):
+    """
+    Процесс записи: разбор кадров, буферизация и запись в базу.
+    В кластере писатель отбрасывает сообщения чужих шардов, поэтому
+    перечитывает состав кластера (но не отмечается в нём сам).
+    """
+    from app.aggregator import Aggregator, handle_frame
+    from app.cluster import membership
+    from app.fanout import fanout
+    from app.last_seen import SOURCE_ANALYZER, SOURCE_PINNACLE
+    from app.line_moves import line_moves
+    from app.odds_cache import latest_odds
+    from app.roi_index import roi_index
+
+    install_signal_handler(asyncio.get_running_loop())
+    pinnacle_finish_tracker.forward_to(updates)
+    analyzer_finish_tracker.forward_to(updates)
+    if QUERY_API_ENABLED:
+        latest_odds.forward_to(updates)
+        roi_index.forward_to(updates)
+    line_moves.forward_to(updates)
+    if FANOUT_ENABLED:
+        fanout.forward_to(updates, fanout_subscribers)
+
+    aggregators = {
+        'Pinnacle': Aggregator(flush_interval=WRITE_INTERVAL, name=SOURCE_PINNACLE),
+        'Analyzer': Aggregator(flush_interval=WRITE_INTERVAL, name=SOURCE_ANALYZER),
+    }
+
+    async def receive():
+        logger.info(f'✍️ Писатель {index} запущен')
+        while True:
+            batch = await asyncio.to_thread(drain_queue, frames, FRAME_BATCH_SIZE)
+            for source_name, message in batch:
+                await handle_frame(source_name, message, aggregators[source_name])
+
+    tasks = [receive()] + [aggregator.run_flush_loop() for aggregator in aggregators.values()]
+    if CLUSTER_ENABLED:
+        tasks.append(membership.run_heartbeat_loop(register=False))
+    if METRICS_ENABLED:
+        tasks.append(run_metrics_server(port=METRICS_PORT + 2 + index))
+
+    await asyncio.gather(*tasks)
+
+
+async def run_update_receiver(updates):
+    """
+    Применяет обновления, присланные писателями: отметки last_seen для колёс
+    таймеров, сжатые сбросы для кэша коэффициентов и индекса ROI, события
+    движения линии и готовые сообщения раздачи потока.
+    """
+    from app.fanout import FORWARD_FANOUT, fanout
+    from app.line_moves import FORWARD_MOVES, line_moves
+    from app.odds_cache import FORWARD_ODDS, latest_odds
+    from app.roi_index import FORWARD_ROI, roi_index
+
+    appliers = {
+        pinnacle_finish_tracker.name: pinnacle_finish_tracker.touch_epochs,
+        analyzer_finish_tracker.name: analyzer_finish_tracker.touch_epochs,
+        FORWARD_ODDS: latest_odds.merge,
+        FORWARD_MOVES: line_moves.record,
+        FORWARD_ROI: roi_index.merge,
+        FORWARD_FANOUT: fanout.deliver,
+    }
+    while True:
+        batch = await asyncio.to_thread(drain_queue, updates, FRAME_BATCH_SIZE)
+        for target, payload in batch:
+            appliers[target](payload)
+
+
+async def _collector_main(updates, fanout_subscribers, components: frozenset[str]):
+    """
+    Процесс коллекторов: выгрузка завершённых матчей, архивация и загрузка
+    (из выбранных компонентов), а также приёмник обновлений писателей
+    с API запросов и раздачей потока.
+    """
+    install_signal_handler(asyncio.get_running_loop())
+    tasks = [run_update_receiver(updates)] + background_tasks(components)
+    if METRICS_ENABLED:
+        tasks.append(run_metrics_server(port=METRICS_PORT + 1))
+    if QUERY_API_ENABLED:
+        from app.query_api import run_query_api
+
+        tasks.append(run_query_api())
+    if FANOUT_ENABLED:
+        from app.fanout import fanout, run_fanout_server
+
+        fanout.share_subscribers(fanout_subscribers)
+        tasks.append(run_fanout_server())
+    await asyncio.gather(*tasks)
+
+
+def _join_cluster(instance_id: str | None):
+    """
+    Все процессы экземпляра выступают в кластере под одним ID.
+    """
+    if instance_id is not None:
+        from app.cluster import membership
+
+        membership.instance_id = instance_id
+
+
+def _run_writer(index: int, frames, updates, fanout_subscribers, instance_id: str | None,
+                components: frozenset[str]):
+    setup_logging()
+    _join_cluster(instance_id)
+    prepare_components(components)
+    asyncio.run(_writer_main(index, frames, updates, fanout_subscribers))
+
+
+def _run_collector(updates, fanout_subscribers, instance_id: str | None,
+                   components: frozenset[str]):
+    setup_logging()
+    _join_cluster(instance_id)
+    prepare_components(components)
+    asyncio.run(_collector_main(updates, fanout_subscribers, components))
+
+
+async def _watch_processes(processes: list[mp.Process]):
+    """
+    Завершает процесс приёма, если упал любой дочерний процесс:
+    перезапуск целиком остаётся за Docker (restart: always).
+    """
+    while True:
+        await asyncio.sleep(PROCESS_CHECK_INTERVAL)
+        for process in processes:
+            if not process.is_alive():
+                raise RuntimeError(
+                    f'Процесс {process.name} завершился с кодом {process.exitcode}')
+
+
+async def _ingest_main(frames, processes: list[mp.Process]):
+    install_signal_handler(asyncio.get_running_loop())
+    frame_queue = FrameQueue(frames)
+    clients = [
+        ForwardingWebSocketClient(settings.ws_pinnacle_url, settings.filter_name,
+                                  source_name='Pinnacle'),
+        ForwardingWebSocketClient(settings.ws_analyzer_url, settings.filter_name,
+                                  source_name='Analyzer'),
+    ]
+
+    tasks = [client.connect(frame_queue) for client in clients]
+    tasks.append(_watch_processes(processes))
+    if METRICS_ENABLED:
+        tasks.append(run_metrics_server())
+    if CLUSTER_ENABLED:
+        from app.cluster import membership
+
+        tasks.append(membership.run_heartbeat_loop())
+    await asyncio.gather(*tasks)
+
+
+def run_multiprocess(writers: int, components: frozenset[str] = frozenset(COMPONENTS)):
+    """
+    Запускает процесс коллекторов и writers процессов записи, а в текущем
+    процессе — приём WebSocket.
+
+    :param writers: Число процессов разбора и записи
+    :param components: Выбранные компоненты (см. app.components); приём и писатели
+                       связаны очередью кадров и выбираются только вместе, процесс
+                       коллекторов запускается всегда и выполняет выбранные фоновые циклы
+    """
+    if (INGEST in components) != (WRITERS in components):
+        raise RuntimeError('В многопроцессном режиме приём и писатели запускаются только вместе')
+    if LIVE_PIVOT_ENABLED:
+        # Состояние разворота живёт в памяти писателя, а кадры матча
+        # попадают к разным писателям — режимы несовместимы
+        raise RuntimeError('LIVE_PIVOT_ENABLED не поддерживается в многопроцессном режиме')
+    if LINE_MOVE_ENABLED and writers > 1:
+        # Окно детектора по ключу живёт в писателе: кадры одного матча
+        # расходятся по писателям, и каждый видит только часть движений
+        raise RuntimeError('LINE_MOVE_ENABLED в многопроцессном режиме требует одного писателя')
+
+    # spawn: дочерние процессы создают свои движки БД и event loop с нуля
+    ctx = mp.get_context('spawn')
+    frames = ctx.Queue(maxsize=FRAME_QUEUE_MAXSIZE)
+    updates = ctx.Queue(maxsize=UPDATE_QUEUE_MAXSIZE)
+    # Число подписчиков раздачи: его ведёт процесс коллекторов, а писатели
+    # без подписчиков не собирают сообщения раздачи
+    fanout_subscribers = ctx.Value('i', 0, lock=False)
+
+    instance_id = None
+    if CLUSTER_ENABLED:
+        from app.cluster import membership
+
+        instance_id = membership.instance_id
+    processes = [ctx.Process(target=_run_collector,
+                             args=(updates, fanout_subscribers, instance_id, components),
+                             name='collector', daemon=True)]
+    processes += [ctx.Process(target=_run_writer,
+                              args=(index, frames, updates, fanout_subscribers, instance_id,
+                                    components),
+                              name=f'writer-{index}', daemon=True)
+                  for index in range(writers)]
+    for process in processes:
+        process.start()
+
+    logger.info(f'🚀 Многопроцессный режим: приём + {writers} писателей + коллекторы')
+    try:
+        asyncio.run(_ingest_main(frames, processes))
+    finally:
+        for process in processes:
+            process.terminate()
@@ -0,0 +1,228 @@
+import logging
+import queue
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Iterable
+
+from app.constants.settings import OUTDATED_THRESHOLD, QUERY_API_CACHE_SWEEP_INTERVAL
+from app.metrics import UPDATES_DROPPED
+from app.models import LiveOddsParsed
+
+
+logger = logging.getLogger(__name__)
+
+# Ключ коэффициента внутри матча: (период, маркет, линия, исход)
+OddsKey = tuple[str, str, str, str]
+
+# Метка сброса кэша в очереди обновлений многопроцессного режима
+FORWARD_ODDS = 'odds'
+
+
+
+@dataclass
+class MatchOdds:
+    """
+    Последнее известное состояние живого матча Pinnacle.
+
+    Поля:
+    - match_id, sport, home, away: мета-информация матча
+    - home_score, away_score: текущий счёт
+    - updated_at: максимальный CreatedAt по матчу
+    - touched: time.monotonic() последнего обновления (для вытеснения)
+    - odds: (период, маркет, линия, исход) → (коэффициент, CreatedAt)
+    """
+    match_id: int
+    sport: str | None = None
+    home: str | None = None
+    away: str | None = None
+    home_score: int | None = None
+    away_score: int | None = None
+    updated_at: datetime | None = None
+    touched: float = 0.0
+    odds: dict[OddsKey, tuple[float, datetime]] = field(default_factory=dict)
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            'match_id': self.match_id,
+            'sport': self.sport,
+            'home': self.home,
+            'away': self.away,
+            'home_score': self.home_score,
+            'away_score': self.away_score,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'odds_count': len(self.odds),
+        }
+
+    def to_json(self) -> dict[str, Any]:
+        data = self.summary()
+        data['odds'] = [
+            {'period': period, 'market': market, 'line': line, 'outcome': outcome,
+             'value': value, 'created_at': created_at.isoformat()}
+            for (period, market, line, outcome), (value, created_at) in self.odds.items()
+        ]
+        return data
+
+
+class LatestOddsCache:
+    """
+    Кэш последних коэффициентов живых матчей Pinnacle в памяти процесса.
+
+    Обновляется на каждом сбросе буфера по уже разобранным строкам, поэтому
+    запросы «текущие коэффициенты матча / вида спорта» не ходят в live_odds_parsed.
+    Значение по ключу заменяется только более свежим (по CreatedAt), счёт — только
+    из более свежего сброса, так что порядок сбросов не важен. Матчи без обновлений
+    дольше max_age секунд вытесняются при вливании сбросов, не чаще раза
+    в sweep_interval секунд, — независимо от того, читает ли кэш API.
+    """
+
+    def __init__(
+        self,
+        max_age: float = OUTDATED_THRESHOLD * 3600,
+        sweep_interval: float = QUERY_API_CACHE_SWEEP_INTERVAL,
+    ):
+        self.max_age = max_age
+        self.sweep_interval = sweep_interval
+        self.matches: dict[int, MatchOdds] = {}
+        self.by_sport: dict[str, set[int]] = {}
+        self.forward_queue = None
+        self.last_sweep = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.matches)
+
+    def forward_to(self, queue):
+        """
+        Многопроцессный режим: кэш живёт в процессе коллекторов, а писатели
+        пересылают ему сжатые сбросы через очередь (см. app.multiprocess).
+        Если очередь переполнена, сброс отбрасывается: кэш не должен тормозить запись.
+        """
+        self.forward_queue = queue
+
+    def update(
+        self,
+        messages: Iterable[dict[str, Any]],
+        rows: Iterable[LiveOddsParsed],
+        last_seen: dict[int, datetime],
+    ):
+        """
+        Учитывает сброс буфера: коэффициенты — из разобранных строк, счёт и названия
+        команд — из сообщений (в порядке прихода, побеждает последнее).
+
+        :param last_seen: match_id → максимальный CreatedAt в сбросе
+        """
+        snapshot = build_snapshot(messages, rows, last_seen)
+        if self.forward_queue is not None:
+            try:
+                self.forward_queue.put_nowait((FORWARD_ODDS, snapshot))
+            except queue.Full:
+                UPDATES_DROPPED.inc(FORWARD_ODDS)
+        else:
+            self.merge(snapshot)
+
+    def merge(self, snapshot: dict[int, MatchOdds]):
+        """
+        Вливает сжатый сброс (match_id → MatchOdds только с последними значениями).
+        """
+        now = time.monotonic()
+        for match_id, update in snapshot.items():
+            state = self.matches.get(match_id)
+            if state is None:
+                update.touched = now
+                self.matches[match_id] = update
+                self.by_sport.setdefault(update.sport, set()).add(match_id)
+                continue
+
+            state.touched = now
+            for key, (value, created_at) in update.odds.items():
+                current = state.odds.get(key)
+                if current is None or created_at >= current[1]:
+                    state.odds[key] = (value, created_at)
+
+            if state.updated_at is None or (update.updated_at is not None
+                                            and update.updated_at >= state.updated_at):
+                state.updated_at = update.updated_at
+                state.home = update.home or state.home
+                state.away = update.away or state.away
+                state.home_score = update.home_score
+                state.away_score = update.away_score
+
+        if now - self.last_sweep >= self.sweep_interval:
+            self.last_sweep = now
+            self.evict_stale(now)
+
+    def get_match(self, match_id: int) -> MatchOdds | None:
+        return self.matches.get(match_id)
+
+    def get_sport(self, sport: str) -> list[MatchOdds]:
+        return [self.matches[match_id] for match_id in self.by_sport.get(sport, ())]
+
+    def discard(self, match_id: int):
+        state = self.matches.pop(match_id, None)
+        if state is not None:
+            ids = self.by_sport.get(state.sport)
+            if ids is not None:
+                ids.discard(match_id)
+
+    def evict_stale(self, now: float | None = None) -> int:
+        """
+        Удаляет матчи без обновлений дольше max_age. Возвращает число удалённых.
+        """
+        deadline = (time.monotonic() if now is None else now) - self.max_age
+        stale = [match_id for match_id, state in self.matches.items() if state.touched < deadline]
+        for match_id in stale:
+            self.discard(match_id)
+        if stale:
+            logger.info(f'🧹 Из кэша коэффициентов вытеснено {len(stale)} затихших матчей')
+        return len(stale)
+
+
+def build_snapshot(
+    messages: Iterable[dict[str, Any]],
+    rows: Iterable[LiveOddsParsed],
+    last_seen: dict[int, datetime],
+) -> dict[int, MatchOdds]:
+    """
+    Сжимает сброс буфера до последнего значения по каждому ключу матча.
+    """
+    snapshot: dict[int, MatchOdds] = {}
+
+    for row in rows:
+        # Строки ещё не загружены из базы: значения лежат в __dict__, и чтение
+        # оттуда в разы дешевле инструментированных атрибутов ORM
+        data = row.__dict__
+        value = data.get('value')
+        if value is None:
+            continue
+        match_id = data['match_id']
+        state = snapshot.get(match_id)
+        if state is None:
+            state = snapshot[match_id] = MatchOdds(match_id, sport=data.get('sport_name'))
+        key = (data['period'], data['market'], data['line'], data['outcome'])
+        created_at = data['created_at']
+        current = state.odds.get(key)
+        if current is None or created_at >= current[1]:
+            state.odds[key] = (value, created_at)
+
+    for msg in messages:
+        try:
+            match_id = int(msg.get('MatchId', 0))
+        except (TypeError, ValueError):
+            continue
+        state = snapshot.get(match_id)
+        if state is None:
+            state = snapshot[match_id] = MatchOdds(match_id, sport=msg.get('SportName'))
+        state.home = msg.get('homeName') or state.home
+        state.away = msg.get('awayName') or state.away
+        state.home_score = msg.get('HomeScore', state.home_score)
+        state.away_score = msg.get('AwayScore', state.away_score)
+
+    for match_id, created_at in last_seen.items():
+        state = snapshot.get(match_id)
+        if state is not None:
+            state.updated_at = created_at
+
+    return snapshot
+
+
+latest_odds = LatestOddsCache()
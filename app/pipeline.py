@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Iterable
+
+from app.profiling import span
+
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+@dataclass
+class PipelineStage:
+    """
+    Стадия конвейера.
+
+    :param name: Имя стадии для отчёта
+    :param handler: Корутина обработки элемента; None означает «дальше не передавать»
+    :param concurrency: Число одновременно работающих обработчиков
+    """
+    name: str
+    handler: Callable[[Any], Awaitable[Any]]
+    concurrency: int = 1
+
+
+@dataclass
+class StageStats:
+    """
+    Статистика стадии за один прогон конвейера.
+    """
+    name: str
+    concurrency: int
+    processed: int = 0
+    dropped: int = 0
+    failed: int = 0
+    busy_seconds: float = 0.0
+
+    def report(self, elapsed: float) -> str:
+        rate = self.processed / elapsed if elapsed > 0 else 0.0
+        utilization = (self.busy_seconds / (elapsed * self.concurrency)
+                       if elapsed > 0 else 0.0)
+        return (f'{self.name}: {self.processed} шт. ({rate:.2f}/с), '
+                f'отброшено {self.dropped}, ошибок {self.failed}, '
+                f'загрузка {utilization:.0%} при x{self.concurrency}')
+
+
+async def run_pipeline(
+    items: Iterable[Any],
+    stages: list[PipelineStage],
+    queue_size: int,
+    name: str = 'pipeline',
+) -> list[StageStats]:
+    """
+    Прогоняет элементы через последовательность стадий с ограниченными очередями
+    между ними. Стадии работают одновременно, поэтому ожидание БД одной стадии
+    перекрывается с работой остальных. Ошибка обработки элемента логируется
+    и не останавливает конвейер.
+
+    :return: Статистика по стадиям (также пишется в лог)
+    """
+    queues = [asyncio.Queue(maxsize=queue_size) for _ in stages]
+    stats = [StageStats(stage.name, stage.concurrency) for stage in stages]
+
+    async def feed():
+        for item in items:
+            await queues[0].put(item)
+        for _ in range(stages[0].concurrency):
+            await queues[0].put(_DONE)
+
+    async def worker(index: int):
+        stage, stage_stats = stages[index], stats[index]
+        output = queues[index + 1] if index + 1 < len(stages) else None
+
+        while True:
+            item = await queues[index].get()
+            if item is _DONE:
+                return
+
+            started = time.perf_counter()
+            try:
+                with span(f'{name}.{stage.name}'):
+                    result = await stage.handler(item)
+            except Exception as e:
+                stage_stats.failed += 1
+                logger.error(f'❌ [{name}/{stage.name}] Ошибка обработки {item!r}: {e}')
+                continue
+            finally:
+                stage_stats.busy_seconds += time.perf_counter() - started
+
+            if result is None:
+                stage_stats.dropped += 1
+                continue
+
+            stage_stats.processed += 1
+            if output is not None:
+                await output.put(result)
+
+    async def run_stage(index: int):
+        await asyncio.gather(*(worker(index) for _ in range(stages[index].concurrency)))
+        if index + 1 < len(stages):
+            for _ in range(stages[index + 1].concurrency):
+                await queues[index + 1].put(_DONE)
+
+    started = time.perf_counter()
+    await asyncio.gather(feed(), *(run_stage(i) for i in range(len(stages))))
+    elapsed = time.perf_counter() - started
+
+    if any(s.processed or s.dropped or s.failed for s in stats):
+        logger.info(f'📊 [{name}] Прогон за {elapsed:.1f} с: ' +
+                    '; '.join(s.report(elapsed) for s in stats))
+    return stats
@@ -0,0 +1,159 @@
+from collections import defaultdict
+
+from app.constants.csv_columns import CSV_PINNACLE_COLUMNS
+from app.models import LiveOddsParsed
+
+
+def new_slot_maps() -> dict[str, list[float]]:
+    """
+    Возвращает пустое состояние привязки линий к слотам для одного матча.
+    """
+    return {
+        'Totals': [],
+        'Handicap': [],
+        'FirstTeamTotals': [],
+        'SecondTeamTotals': [],
+        'Games': [],
+    }
+
+
+def expand_market_map(
+    rows: list[LiveOddsParsed],
+    slot_maps: dict[str, list[float]] | None = None
+) -> dict[str, dict[str, float]]:
+    """
+    Группирует данные по created_at и period, и преобразует их в формат для экспорта в CSV,
+    включая Totals, Handicap, First/Second Team Totals и Games (всё по слотам).
+
+    :param slot_maps: Состояние слотов матча; передаётся при инкрементальном
+                      развороте, чтобы линии сохраняли слоты между сбросами
+    """
+    snapshot_dict = defaultdict(dict)
+
+    if slot_maps is None:
+        slot_maps = new_slot_maps()
+
+    for row in rows:
+        timestamp = row.created_at.replace(microsecond=0).isoformat()
+        period_type = row.period
+        key = f'{timestamp}|{period_type}'
+
+        snap = snapshot_dict[key]
+        snap['CreatedAt'] = timestamp
+        snap['PeriodType'] = period_type
+        snap['homeName'] = row.home_team
+        snap['awayName'] = row.away_team
+        snap['HomeScore'] = row.home_score or 0
+        snap['AwayScore'] = row.away_score or 0
+
+        market = row.market
+        outcome = row.outcome
+        value = row.value
+        line = row.line
+
+        try:
+            line_value = float(line) if line else 0.0
+        except ValueError:
+            line_value = 0.0
+
+        col = None
+        # Строки обратной загрузки: линия неизвестна, но известен её слот в CSV
+        line_slot = getattr(row, 'line_slot', None)
+
+        if line_slot is not None:
+            col = f'{market}_{line_slot}_{outcome}'
+        elif market == 'Totals' and outcome in {'WinMore', 'WinLess'}:
+            col = _slot_column('Totals', line_value, outcome, slot_maps, max_slots=3)
+        elif market == 'Handicap' and outcome in {'Win1', 'Win2'}:
+            col = _slot_column('Handicap', line_value, outcome, slot_maps, max_slots=3)
+        elif market == 'FirstTeamTotals' and outcome in {'WinMore', 'WinLess'}:
+            col = _slot_column('FirstTeamTotals', line_value, outcome, slot_maps, max_slots=2)
+        elif market == 'SecondTeamTotals' and outcome in {'WinMore', 'WinLess'}:
+            col = _slot_column('SecondTeamTotals', line_value, outcome, slot_maps, max_slots=2)
+        elif market == 'Games' and outcome in {'WinMore', 'WinLess'}:
+            col = _slot_column('Games', line_value, outcome, slot_maps, max_slots=3)
+        elif market == 'Win1x2':
+            col = outcome
+
+        if col in CSV_PINNACLE_COLUMNS:
+            snap[col] = value
+
+    return snapshot_dict
+
+
+def _slot_column(prefix: str, line_value: float, outcome: str, slot_maps: dict, max_slots: int) -> str:
+    """
+    Возвращает имя колонки с номером слота на основе значения линии.
+    Привязывает линию к одному из max_slots слотов.
+    """
+    slots = slot_maps[prefix]
+    if line_value not in slots and len(slots) < max_slots:
+        slots.append(line_value)
+    try:
+        slot = slots.index(line_value) + 1
+        return f'{prefix}_{slot}_{outcome}'
+    except ValueError:
+        return ''
+
+
+def render_snapshot_rows(
+    snapshot_dict: dict[str, dict[str, float]],
+    home: str,
+    away: str,
+    home_score: int | None,
+    away_score: int | None
+) -> list[dict]:
+    """
+    Превращает снимки expand_market_map в строки CSV по шаблону CSV_PINNACLE_COLUMNS,
+    отсортированные по времени и периоду. Пропуски заполняются значением 'null'.
+    """
+    csv_rows = []
+    for ts, row_data in sorted(snapshot_dict.items()):
+        row = {col: 'null' for col in CSV_PINNACLE_COLUMNS}
+        row['CreatedAt'] = ts
+        row['homeName'] = home
+        row['awayName'] = away
+        row['HomeScore'] = home_score or 0
+        row['AwayScore'] = away_score or 0
+
+        for k, v in row_data.items():
+            if k in row:
+                row[k] = 'null' if v is None else v
+
+        csv_rows.append(row)
+
+    return csv_rows
+
+
+def _wide_column_keys() -> dict[str, tuple[str, str, int | None]]:
+    keys = {}
+    for column in CSV_PINNACLE_COLUMNS:
+        if column in ('Win1', 'WinNone', 'Win2'):
+            keys[column] = ('Win1x2', column, None)
+        elif column.count('_') == 2:
+            market, slot, outcome = column.split('_')
+            keys[column] = (market, outcome, int(slot))
+    return keys
+
+
+# Колонка коэффициента широкого CSV → (маркет, исход, слот линии; у Win1x2 — None)
+WIDE_COLUMN_KEYS = _wide_column_keys()
+
+
+def unpivot_snapshot_row(row: dict[str, str]) -> list[tuple[str, str, int | None, float]]:
+    """
+    Обратное преобразование строки CSV (render_snapshot_rows): коэффициенты
+    в виде (маркет, исход, слот, значение). Значения линий в CSV не сохраняются —
+    только номера слотов в именах колонок (Totals_1_Over → слот 1), поэтому
+    вместо линии возвращается слот; у Win1x2 слота нет (None).
+    """
+    values = []
+    for column, (market, outcome, slot) in WIDE_COLUMN_KEYS.items():
+        raw = row.get(column)
+        if raw in (None, '', 'null'):
+            continue
+        try:
+            values.append((market, outcome, slot, float(raw)))
+        except ValueError:
+            continue
+    return values
@@ -0,0 +1,182 @@
+import cProfile
+import io
+import logging
+import pstats
+import signal
+import time
+import tracemalloc
+from collections import defaultdict
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+
+from app.constants.paths import PROFILE_DIR
+from app.constants.settings import PROFILE_CAPTURE_CYCLES, PROFILE_MAX_CYCLES
+
+
+logger = logging.getLogger(__name__)
+
+
+class _NullSpan:
+    """
+    Пустой контекст: используется, когда захват выключен.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _CycleCapture:
+    """
+    Данные одного профилируемого цикла: длительности стадий и (для цикла,
+    запустившего профилировщик) cProfile и снимок tracemalloc.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.spans: dict[str, list[float]] = defaultdict(list)
+        self.profile: cProfile.Profile | None = None
+        self.started_tracemalloc = False
+        self.snapshot = None
+        self.started = time.perf_counter()
+
+
+class _Span:
+
+    def __init__(self, capture: _CycleCapture, name: str):
+        self.capture = capture
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.capture.spans[self.name].append(time.perf_counter() - self.started)
+        return False
+
+
+class _Cycle:
+    """
+    Контекст цикла (сброс буфера, выгрузка). Пока захват не запрошен,
+    только проверяет счётчик и ничего не измеряет.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.capture: _CycleCapture | None = None
+        self.token = None
+
+    def __enter__(self):
+        global _profile_active
+        if _remaining_cycles <= 0:
+            return self
+
+        self.capture = _CycleCapture(self.name)
+        # cProfile в потоке может быть только один: его получает первый цикл,
+        # параллельные циклы записывают только стадии
+        if not _profile_active:
+            _profile_active = True
+            self.capture.profile = cProfile.Profile()
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.capture.started_tracemalloc = True
+            self.capture.snapshot = tracemalloc.take_snapshot()
+            self.capture.profile.enable()
+        self.token = _current_capture.set(self.capture)
+        return self
+
+    def __exit__(self, *exc):
+        if self.capture is None:
+            return False
+        _current_capture.reset(self.token)
+        _finish_capture(self.capture)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, *exc):
+        return self.__exit__(*exc)
+
+
+_current_capture: ContextVar[_CycleCapture | None] = ContextVar('profile_capture', default=None)
+_remaining_cycles = 0
+_profile_active = False
+
+
+def span(name: str):
+    """
+    Замер стадии внутри цикла. Вне захвата возвращает пустой контекст.
+
+    Пример:
+        with span('commit'):
+            await session.commit()
+    """
+    capture = _current_capture.get()
+    if capture is None:
+        return _NULL_SPAN
+    return _Span(capture, name)
+
+
+def cycle(name: str) -> _Cycle:
+    """
+    Обрамляет один цикл (сброс буфера, выгрузку). Если захват запрошен,
+    цикл профилируется и результат пишется в PROFILE_DIR.
+    """
+    return _Cycle(name)
+
+
+def request_capture(cycles: int = PROFILE_CAPTURE_CYCLES):
+    """
+    Включает захват для следующих cycles циклов (не больше PROFILE_MAX_CYCLES).
+    """
+    global _remaining_cycles
+    _remaining_cycles = min(max(cycles, 0), PROFILE_MAX_CYCLES)
+    logger.info(f'🔬 Профилирование включено на {_remaining_cycles} циклов')
+
+
+def install_signal_handler(loop, signum: int = signal.SIGUSR1):
+    """
+    Захват по сигналу: kill -USR1 <pid> профилирует следующие PROFILE_CAPTURE_CYCLES циклов.
+    """
+    loop.add_signal_handler(signum, request_capture)
+
+
+def _finish_capture(capture: _CycleCapture):
+    global _remaining_cycles, _profile_active
+    elapsed = time.perf_counter() - capture.started
+
+    lines = [f'Цикл: {capture.name}', f'Длительность: {elapsed:.3f} с', '', 'Стадии:']
+    for name, durations in capture.spans.items():
+        lines.append(f'  {name:<24} {sum(durations):>9.3f} с  вызовов: {len(durations)}')
+
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    base = Path(PROFILE_DIR) / f'{stamp}_{capture.name}'
+    Path(PROFILE_DIR).mkdir(parents=True, exist_ok=True)
+
+    if capture.profile is not None:
+        capture.profile.disable()
+        _profile_active = False
+        capture.profile.dump_stats(f'{base}.prof')
+
+        stream = io.StringIO()
+        pstats.Stats(capture.profile, stream=stream).sort_stats('cumulative').print_stats(30)
+        lines += ['', 'cProfile (топ-30 по cumulative):', stream.getvalue()]
+
+        snapshot = tracemalloc.take_snapshot()
+        if capture.started_tracemalloc:
+            tracemalloc.stop()
+        lines.append('tracemalloc (топ-20 прироста по строкам):')
+        for stat in snapshot.compare_to(capture.snapshot, 'lineno')[:20]:
+            lines.append(f'  {stat}')
+
+    Path(f'{base}.txt').write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    _remaining_cycles = max(_remaining_cycles - 1, 0)
+    logger.info(f'🔬 Профиль цикла {capture.name} сохранён: {base}.txt')
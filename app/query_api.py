@@ -0,0 +1,198 @@
+"""
+Локальный API запросов к данным в памяти (кэш коэффициентов и т. п.).
+
+Маленький HTTP/1.1-сервер на asyncio с keep-alive: отвечает JSON'ом из памяти
+процесса и не обращается к базе. Слушает TCP (QUERY_API_HOST:QUERY_API_PORT)
+и/или Unix-сокет QUERY_API_SOCKET.
+
+Маршруты регистрируются через route(prefix): обработчик получает оставшиеся
+части пути и параметры запроса и возвращает объект для json.dumps
+(или None — тогда 404).
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Callable
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from app.constants.settings import QUERY_API_HOST, QUERY_API_PORT, QUERY_API_SOCKET
+from app.line_moves import line_moves
+from app.odds_cache import latest_odds
+from app.roi_index import roi_index
+
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[list[str], dict[str, str]], Any]
+
+_routes: dict[str, Handler] = {}
+
+
+def route(prefix: str):
+    """
+    Регистрирует обработчик для путей /<prefix>/...
+
+    Пример:
+        @route('odds')
+        def odds(parts, params): ...
+    """
+    def decorator(func: Handler) -> Handler:
+        _routes[prefix] = func
+        return func
+    return decorator
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def dispatch(path: str, params: dict[str, str]) -> tuple[int, Any]:
+    """
+    Находит обработчик по первой части пути. Возвращает (HTTP-статус, данные).
+    """
+    parts = [unquote(part) for part in path.strip('/').split('/') if part]
+    handler = _routes.get(parts[0]) if parts else None
+    if handler is None:
+        return 404, {'error': 'not found'}
+    try:
+        payload = handler(parts[1:], params)
+    except BadRequest as e:
+        return 400, {'error': str(e)}
+    if payload is None:
+        return 404, {'error': 'not found'}
+    return 200, payload
+
+
+def int_param(value: str | None, name: str, default: int | None = None) -> int | None:
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise BadRequest(f'{name} must be an integer')
+
+
+def float_param(value: str | None, name: str, default: float | None = None) -> float | None:
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        raise BadRequest(f'{name} must be a number')
+
+
+@route('odds')
+def _odds(parts: list[str], params: dict[str, str]):
+    """
+    GET /odds/match/<match_id>       — все текущие коэффициенты и счёт матча
+    GET /odds/sport/<sport>[?full=1] — живые матчи вида спорта (сводка или полностью)
+    """
+    if len(parts) != 2:
+        return None
+    kind, value = parts
+    if kind == 'match':
+        state = latest_odds.get_match(int_param(value, 'match_id'))
+        return state.to_json() if state is not None else None
+    if kind == 'sport':
+        full = params.get('full') == '1'
+        return [state.to_json() if full else state.summary()
+                for state in latest_odds.get_sport(value)]
+    return None
+
+
+@route('moves')
+def _moves(parts: list[str], params: dict[str, str]):
+    """
+    GET /moves[?match_id=&sport=&limit=] — последние движения линии (новые первыми)
+    """
+    if parts:
+        return None
+    limit = int_param(params.get('limit'), 'limit', 100)
+    return [event.to_json() for event in line_moves.recent(
+        match_id=int_param(params.get('match_id'), 'match_id'),
+        sport=params.get('sport'), limit=limit)]
+
+
+@route('roi')
+def _roi(parts: list[str], params: dict[str, str]):
+    """
+    GET /roi/top[?sport=&k=&min_roi=&max_margin=] — лучшие живые возможности анализатора
+    """
+    if parts != ['top']:
+        return None
+    return [entry.to_json() for entry in roi_index.top(
+        k=int_param(params.get('k'), 'k', 10), sport=params.get('sport'),
+        min_roi=float_param(params.get('min_roi'), 'min_roi'),
+        max_margin=float_param(params.get('max_margin'), 'max_margin'))]
+
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found'}
+
+
+async def _handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """
+    Обслуживает соединение: запросы читаются по очереди, пока клиент не закроет
+    соединение или не попросит Connection: close.
+    """
+    try:
+        while True:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=30)
+            if not request_line:
+                break
+            keep_alive = True
+            while True:
+                header = await asyncio.wait_for(reader.readline(), timeout=5)
+                if header in (b'\r\n', b'\n', b''):
+                    break
+                if header.lower().startswith(b'connection:') and b'close' in header.lower():
+                    keep_alive = False
+
+            parts = request_line.decode('latin-1').split()
+            url = urlsplit(parts[1] if len(parts) > 1 else '/')
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+            started = time.perf_counter()
+            status, payload = dispatch(url.path, params)
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            elapsed_us = (time.perf_counter() - started) * 1e6
+
+            writer.write(
+                f'HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n'
+                f'Content-Type: application/json; charset=utf-8\r\n'
+                f'Content-Length: {len(body)}\r\n'
+                f'X-Handler-Time-Us: {elapsed_us:.0f}\r\n'
+                f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'
+                .encode('latin-1') + body
+            )
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.TimeoutError, ConnectionError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def run_query_api(
+    host: str = QUERY_API_HOST,
+    port: int | None = QUERY_API_PORT,
+    socket_path: str | None = QUERY_API_SOCKET,
+):
+    """
+    Поднимает API запросов на TCP-порту и/или Unix-сокете. Затихшие матчи
+    и истёкшие возможности кэш и индекс ROI вытесняют сами при вливании сбросов.
+    """
+    servers = []
+    if port:
+        servers.append(await asyncio.start_server(_handle_connection, host, port))
+        logger.info(f'🔎 API запросов доступен на http://{host}:{port}')
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        servers.append(await asyncio.start_unix_server(_handle_connection, socket_path))
+        logger.info(f'🔎 API запросов доступен на unix:{socket_path}')
+
+    await asyncio.gather(*(server.serve_forever() for server in servers))
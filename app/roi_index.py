@@ -0,0 +1,229 @@
+import heapq
+import logging
+import math
+import queue
+import time
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Iterable
+
+from app.constants.settings import QUERY_API_CACHE_SWEEP_INTERVAL, ROI_INDEX_TTL
+from app.metrics import UPDATES_DROPPED
+from app.models import AnalyzerOddsParsed
+
+
+logger = logging.getLogger(__name__)
+
+# Ключ возможности: (match_id_pinnacle, match_id_lobbet, market_type, outcome)
+OpportunityKey = tuple[int, int, int, str]
+
+# Метка сброса индекса в очереди обновлений многопроцессного режима
+FORWARD_ROI = 'roi'
+
+
+@dataclass
+class Opportunity:
+    """
+    Последнее значение возможности анализатора (пара Pinnacle/Lobbet, маркет, исход).
+
+    Поля:
+    - roi, margin: ROI и маржа из последнего сообщения анализатора
+    - value_pinnacle, value_lobbet: коэффициенты обеих контор
+    - created_at: createdAt сообщения
+    - touched: time.monotonic() последнего обновления (для истечения)
+    """
+    match_id_pinnacle: int
+    match_id_lobbet: int
+    market_type: int
+    outcome: str
+    roi: float
+    margin: float | None = None
+    value_pinnacle: float | None = None
+    value_lobbet: float | None = None
+    sport: str | None = None
+    home: str | None = None
+    away: str | None = None
+    home_score: Any = None
+    away_score: Any = None
+    created_at: datetime | None = None
+    touched: float = 0.0
+
+    @property
+    def key(self) -> OpportunityKey:
+        return self.match_id_pinnacle, self.match_id_lobbet, self.market_type, self.outcome
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            'match_id_pinnacle': self.match_id_pinnacle,
+            'match_id_lobbet': self.match_id_lobbet,
+            'market_type': self.market_type,
+            'outcome': self.outcome,
+            'roi': self.roi,
+            'margin': self.margin,
+            'value_pinnacle': self.value_pinnacle,
+            'value_lobbet': self.value_lobbet,
+            'sport': self.sport,
+            'home': self.home,
+            'away': self.away,
+            'home_score': self.home_score,
+            'away_score': self.away_score,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+        }
+
+
+class RoiIndex:
+    """
+    Индекс живых возможностей анализатора, упорядоченный по ROI.
+
+    Для каждого вида спорта держит отсортированный список (-roi, ключ): обновление —
+    bisect и вставка, top-K — проход с начала списка (по всем видам спорта — слиянием
+    списков через heapq.merge), который останавливается на K-й подходящей записи или
+    на ROI ниже порога. Возможность, не подтверждённая анализатором дольше ttl
+    секунд, в выдачу не попадает и удаляется при вливании сбросов, не чаще раза
+    в sweep_interval секунд (evict_expired), — независимо от того, читает ли индекс API.
+    """
+
+    def __init__(
+        self,
+        ttl: float = ROI_INDEX_TTL,
+        sweep_interval: float = QUERY_API_CACHE_SWEEP_INTERVAL,
+    ):
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.entries: dict[OpportunityKey, Opportunity] = {}
+        self.by_sport: dict[str | None, list[tuple[float, OpportunityKey]]] = {}
+        self.forward_queue = None
+        self.last_sweep = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def forward_to(self, queue):
+        """
+        Многопроцессный режим: индекс живёт в процессе коллекторов рядом с API
+        запросов, писатели пересылают ему сжатые сбросы (см. app.multiprocess).
+        Если очередь переполнена, сброс отбрасывается: индекс не должен тормозить запись.
+        """
+        self.forward_queue = queue
+
+    def update(self, rows: Iterable[AnalyzerOddsParsed]):
+        """
+        Учитывает сброс буфера анализатора по уже разобранным строкам.
+        """
+        snapshot = build_opportunities(rows)
+        if self.forward_queue is not None:
+            try:
+                self.forward_queue.put_nowait((FORWARD_ROI, snapshot))
+            except queue.Full:
+                UPDATES_DROPPED.inc(FORWARD_ROI)
+        else:
+            self.merge(snapshot)
+
+    def merge(self, snapshot: dict[OpportunityKey, Opportunity]):
+        """
+        Вливает сжатый сброс. Значение по ключу заменяется только более свежим
+        (по createdAt), так что порядок сбросов разных писателей не важен.
+        """
+        now = time.monotonic()
+        for key, update in snapshot.items():
+            current = self.entries.get(key)
+            if current is not None:
+                if update.created_at < current.created_at:
+                    current.touched = now
+                    continue
+                self._unlink(current)
+            update.touched = now
+            self.entries[key] = update
+            insort(self.by_sport.setdefault(update.sport, []), (-update.roi, key))
+
+        if now - self.last_sweep >= self.sweep_interval:
+            self.last_sweep = now
+            self.evict_expired(now)
+
+    def _unlink(self, entry: Opportunity):
+        ranked = self.by_sport.get(entry.sport)
+        if not ranked:
+            return
+        item = (-entry.roi, entry.key)
+        position = bisect_left(ranked, item)
+        if position < len(ranked) and ranked[position] == item:
+            del ranked[position]
+            if not ranked:
+                del self.by_sport[entry.sport]
+
+    def top(
+        self,
+        k: int = 10,
+        sport: str | None = None,
+        min_roi: float | None = None,
+        max_margin: float | None = None,
+    ) -> list[Opportunity]:
+        """
+        K живых возможностей с наибольшим ROI (по виду спорта или по всем),
+        не ниже min_roi и с маржой не выше max_margin.
+        """
+        if sport is not None:
+            ranked = iter(self.by_sport.get(sport, ()))
+        else:
+            ranked = heapq.merge(*self.by_sport.values())
+
+        deadline = time.monotonic() - self.ttl
+        result = []
+        for neg_roi, key in ranked:
+            if len(result) >= k or (min_roi is not None and -neg_roi < min_roi):
+                break
+            entry = self.entries[key]
+            if entry.touched < deadline:
+                continue
+            if max_margin is not None and (entry.margin is None or entry.margin > max_margin):
+                continue
+            result.append(entry)
+        return result
+
+    def evict_expired(self, now: float | None = None) -> int:
+        """
+        Удаляет возможности без подтверждения дольше ttl. Возвращает число удалённых.
+        """
+        deadline = (time.monotonic() if now is None else now) - self.ttl
+        expired = [entry for entry in self.entries.values() if entry.touched < deadline]
+        for entry in expired:
+            del self.entries[entry.key]
+            self._unlink(entry)
+        if expired:
+            logger.info(f'🧹 Из индекса ROI удалено {len(expired)} истёкших возможностей')
+        return len(expired)
+
+
+def build_opportunities(rows: Iterable[AnalyzerOddsParsed]) -> dict[OpportunityKey, Opportunity]:
+    """
+    Сжимает сброс буфера анализатора до последнего значения по каждому ключу.
+    Строки без ROI или времени в индекс не попадают, как и строки с NaN
+    или бесконечным ROI: они ломают порядок отсортированных списков.
+    """
+    snapshot: dict[OpportunityKey, Opportunity] = {}
+
+    for row in rows:
+        # Значения ещё не загруженных из базы строк лежат в __dict__ (см. odds_cache)
+        data = row.__dict__
+        roi = data.get('roi')
+        created_at = data.get('created_at')
+        if roi is None or created_at is None or not math.isfinite(roi):
+            continue
+        key = (data['match_id_pinnacle'], data['match_id_lobbet'],
+               data['market_type'], data['outcome'])
+        current = snapshot.get(key)
+        if current is not None and created_at < current.created_at:
+            continue
+        snapshot[key] = Opportunity(
+            *key, roi=roi, margin=data.get('margin'),
+            value_pinnacle=data.get('value_pinnacle'), value_lobbet=data.get('value_lobbet'),
+            sport=data.get('sport_name'), home=data.get('home_team'),
+            away=data.get('away_team'), home_score=data.get('home_score'),
+            away_score=data.get('away_score'), created_at=created_at,
+        )
+
+    return snapshot
+
+
+roi_index = RoiIndex()
@@ -0,0 +1,154 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from sqlalchemy import case, delete, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.constants.settings import (ROLLUP_BUCKETS, ROLLUP_RETENTION_DAYS,
+                                    ROLLUP_UPSERT_BATCH_SIZE)
+from app.models import LiveOddsParsed, OddsRollup
+
+
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1)
+
+# (match_id, bucket_seconds, bucket_start, period, market, line, outcome)
+RollupKey = tuple[int, int, datetime, str, str, str, str]
+
+
+def build_rollups(
+    rows: Iterable[LiveOddsParsed],
+    buckets: tuple[int, ...] = ROLLUP_BUCKETS,
+) -> dict[RollupKey, dict]:
+    """
+    Сворачивает строки одного сброса по интервалам: для каждого ключа и интервала
+    считает open/high/low/last и число значений. Линия входит в ключ: коэффициенты
+    Totals 2.5 и Totals 3.0 одного интервала — разные свёртки, а не одна
+    с перемешанными high/low. Строки-заглушки без коэффициента пропускаются.
+    """
+    rollups: dict[RollupKey, dict] = {}
+    # Меток CreatedAt в сбросе немного: начало интервалов считаем один раз на метку
+    starts_cache: dict[datetime, list[tuple[int, datetime]]] = {}
+
+    for row in rows:
+        # Значения ещё не загруженных из базы строк лежат в __dict__ (см. odds_cache)
+        data = row.__dict__
+        value = data.get('value')
+        if value is None:
+            continue
+        created_at = data['created_at']
+
+        starts = starts_cache.get(created_at)
+        if starts is None:
+            epoch = int((created_at.replace(tzinfo=None) - _EPOCH).total_seconds())
+            starts = starts_cache[created_at] = [
+                (seconds, _EPOCH + timedelta(seconds=epoch - epoch % seconds))
+                for seconds in buckets
+            ]
+
+        match_id = data['match_id']
+        period = data.get('period') or ''
+        market = data['market']
+        line = data.get('line') or ''
+        outcome = data['outcome']
+
+        for seconds, bucket_start in starts:
+            key = (match_id, seconds, bucket_start, period, market, line, outcome)
+            rollup = rollups.get(key)
+            if rollup is None:
+                rollups[key] = {
+                    'match_id': match_id, 'bucket_seconds': seconds,
+                    'bucket_start': bucket_start, 'period': period, 'market': market,
+                    'line': line, 'outcome': outcome, 'sport_name': data.get('sport_name'),
+                    'open_value': value, 'high_value': value, 'low_value': value,
+                    'last_value': value, 'count': 1,
+                    'first_at': created_at, 'last_at': created_at,
+                }
+                continue
+
+            rollup['count'] += 1
+            if value > rollup['high_value']:
+                rollup['high_value'] = value
+            if value < rollup['low_value']:
+                rollup['low_value'] = value
+            if created_at >= rollup['last_at']:
+                rollup['last_value'] = value
+                rollup['last_at'] = created_at
+            if created_at < rollup['first_at']:
+                rollup['open_value'] = value
+                rollup['first_at'] = created_at
+
+    return rollups
+
+
+async def upsert_rollups(session: AsyncSession, rollups: dict[RollupKey, dict]):
+    """
+    Вливает свёртки сброса в odds_rollup пачками INSERT ... ON CONFLICT DO UPDATE.
+    Пачки упорядочены по ключу, чтобы параллельные писатели блокировали строки
+    в одном порядке. Коммит остаётся за вызывающим кодом.
+    """
+    if not rollups:
+        return
+
+    values = [rollups[key] for key in sorted(rollups)]
+    table = OddsRollup.__table__
+    for start in range(0, len(values), ROLLUP_UPSERT_BATCH_SIZE):
+        stmt = pg_insert(OddsRollup).values(values[start:start + ROLLUP_UPSERT_BATCH_SIZE])
+        new = stmt.excluded
+        is_later = new.last_at >= table.c.last_at
+        is_earlier = new.first_at < table.c.first_at
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.match_id, table.c.bucket_seconds, table.c.bucket_start,
+                            table.c.period, table.c.market, table.c.line, table.c.outcome],
+            set_={
+                'high_value': func.greatest(table.c.high_value, new.high_value),
+                'low_value': func.least(table.c.low_value, new.low_value),
+                'count': table.c.count + new.count,
+                'last_value': case((is_later, new.last_value), else_=table.c.last_value),
+                'last_at': case((is_later, new.last_at), else_=table.c.last_at),
+                'open_value': case((is_earlier, new.open_value), else_=table.c.open_value),
+                'first_at': case((is_earlier, new.first_at), else_=table.c.first_at),
+            },
+        )
+        await session.execute(stmt)
+
+
+async def fetch_rollups(
+    session: AsyncSession,
+    match_id: int,
+    bucket_seconds: int,
+    period: str | None = None,
+    market: str | None = None,
+    line: str | None = None,
+) -> list[OddsRollup]:
+    """
+    История коэффициентов матча по интервалам (например, движение Totals 2.5):
+    читает первичный ключ odds_rollup, сырые строки не нужны.
+    """
+    query = select(OddsRollup).where(OddsRollup.match_id == match_id,
+                                     OddsRollup.bucket_seconds == bucket_seconds)
+    if period is not None:
+        query = query.where(OddsRollup.period == period)
+    if market is not None:
+        query = query.where(OddsRollup.market == market)
+    if line is not None:
+        query = query.where(OddsRollup.line == line)
+    result = await session.execute(
+        query.order_by(OddsRollup.bucket_start, OddsRollup.period,
+                       OddsRollup.market, OddsRollup.line, OddsRollup.outcome))
+    return list(result.scalars())
+
+
+async def prune_rollups(session: AsyncSession, retention_days: int = ROLLUP_RETENTION_DAYS):
+    """
+    Удаляет свёртки старше retention_days. Коммит остаётся за вызывающим кодом.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    result = await session.execute(
+        delete(OddsRollup).where(OddsRollup.bucket_start < cutoff)
+        .execution_options(synchronize_session=False))
+    if result.rowcount:
+        logger.info(f'🧹 Удалено {result.rowcount} устаревших свёрток коэффициентов')
@@ -0,0 +1,429 @@
+"""
+Хранилище сырых тиков Pinnacle в сегментах (ODDS_STORAGE_BACKEND = 'segments').
+
+Вместо строк live_odds_parsed писатель дописывает каждый сброс в конец файла-сегмента
+одним последовательным write (+ fsync). Сегменты лежат по дням (SEGMENTS_DIR/ГГГГ-ММ-ДД/),
+у каждого процесса записи свой файл; файл сменяется с новым днём, после SEGMENT_MAX_BYTES
+и при перезапуске (поэтому оборванный хвост никогда не дописывается).
+
+Формат сегмента: заголовок FILE_MAGIC, затем блоки «тип, число элементов, длина»:
+- DICT: новые строки словаря сегмента (период, маркет, исход, линия, команды, спорт);
+  в записях строки хранятся номерами, 0 — None
+- RECS: записи фиксированной ширины RECORD, отсортированные по match_id
+- INDX: разреженный индекс предыдущего RECS — match_id, смещение первой записи, число записей
+Блок, не дописанный до конца (падение посреди записи), читатель пропускает.
+Сброс попадает в сегмент до коммита в базу, поэтому повтор сброса после неудачного
+коммита дублирует строки — читатель отдаёт одинаковые строки матча один раз.
+
+Выгрузка читает матч через mmap по индексу всех сегментов. Выгруженные матчи
+отмечаются в TOMBSTONES_FILE (match_id и последний выгруженный CreatedAt), а дни,
+в которых не осталось невыгруженных матчей, удаляются целиком (prune).
+Сегменты и отметки локальны для хоста, поэтому с CLUSTER_ENABLED хранилище не запускается.
+"""
+
+import logging
+import math
+import mmap
+import os
+import shutil
+import socket
+import struct
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterable, NamedTuple
+
+from app.constants.paths import SEGMENTS_DIR
+from app.constants.settings import SEGMENT_FSYNC, SEGMENT_MAX_BYTES
+from app.models import LiveOddsParsed
+from app.utils import fsync_dir
+
+
+logger = logging.getLogger(__name__)
+
+FILE_MAGIC = b'PSEG\x01\x00\x00\x00'
+BLOCK_HEADER = struct.Struct('<4sIQ')
+BLOCK_DICT = b'DICT'
+BLOCK_RECORDS = b'RECS'
+BLOCK_INDEX = b'INDX'
+
+# match_id, CreatedAt (мкс от эпохи), коэффициент (NaN — нет), номера строк словаря:
+# период, маркет, исход, линия, хозяева, гости, спорт; счёт (NO_SCORE — нет)
+RECORD = struct.Struct('<qqdIIIIIIIii')
+INDEX_ENTRY = struct.Struct('<qQI')
+STRING_LENGTH = struct.Struct('<H')
+TOMBSTONE = struct.Struct('<qq')
+
+NO_SCORE = -2 ** 31
+STORAGE_POSTGRES = 'postgres'
+STORAGE_SEGMENTS = 'segments'
+TOMBSTONES_FILE = 'tombstones.bin'
+SEGMENT_SUFFIX = '.seg'
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class StoredOdds(NamedTuple):
+    """
+    Строка, прочитанная из сегмента. Повторяет поля LiveOddsParsed, которые
+    нужны развороту в CSV, поэтому выгрузка работает с ней так же, как со строкой ORM.
+    """
+    match_id: int
+    created_at: datetime
+    value: float | None
+    period: str | None
+    market: str | None
+    outcome: str | None
+    line: str | None
+    home_team: str | None
+    away_team: str | None
+    sport_name: str | None
+    home_score: int | None
+    away_score: int | None
+
+
+def _to_micros(value: datetime) -> int:
+    return (value.replace(tzinfo=None) - _EPOCH) // timedelta(microseconds=1)
+
+
+class SegmentWriter:
+    """
+    Дописывает сбросы буфера в сегмент текущего дня. Один экземпляр на процесс записи;
+    append синхронный и вызывается через asyncio.to_thread.
+    """
+
+    def __init__(self, root: Path = SEGMENTS_DIR, max_bytes: int = SEGMENT_MAX_BYTES,
+                 fsync: bool = SEGMENT_FSYNC):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        self.file = None
+        self.path: Path | None = None
+        self.day: str | None = None
+        self.size = 0
+        self.strings: dict[str, int] = {}
+        self._sequence = 0
+
+    def _open(self, day: str):
+        self.close()
+        directory = self.root / day
+        directory.mkdir(parents=True, exist_ok=True)
+        self._sequence += 1
+        name = f'{socket.gethostname()}-{os.getpid()}-{self._sequence:04d}{SEGMENT_SUFFIX}'
+        self.path = directory / name
+        self.file = open(self.path, 'xb')
+        self.file.write(FILE_MAGIC)
+        self.size = len(FILE_MAGIC)
+        self.day = day
+        self.strings = {}
+        fsync_dir(directory)
+        logger.info(f'🗂️ Новый сегмент сырых тиков: {self.path}')
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def append(self, rows: Iterable[LiveOddsParsed]) -> int:
+        """
+        Дописывает строки сброса одним блоком DICT + RECS + INDX.
+        Возвращает число записанных байт.
+        """
+        # Значения ещё не загруженных из базы строк лежат в __dict__ (см. odds_cache)
+        data_rows = sorted((row.__dict__ for row in rows), key=lambda data: data['match_id'])
+        if not data_rows:
+            return 0
+
+        day = datetime.utcnow().strftime('%Y-%m-%d')
+        if self.file is None or day != self.day or self.size >= self.max_bytes:
+            self._open(day)
+
+        try:
+            block, added = self._encode(data_rows)
+            self.file.write(block)
+            self.file.flush()
+            if self.fsync:
+                os.fsync(self.file.fileno())
+        except Exception:
+            # Блок мог дойти до диска частично: следующий сброс начнёт новый сегмент
+            # (оборванный хвост читатель пропускает)
+            self.close()
+            raise
+        # Новые строки попадают в словарь сегмента только вместе с записанным блоком DICT
+        self.strings.update(added)
+        self.size += len(block)
+        return len(block)
+
+    def _encode(self, data_rows: list[dict]) -> tuple[bytes, dict[str, int]]:
+        """
+        Собирает блок DICT + RECS + INDX. Возвращает блок и строки, которых ещё нет
+        в словаре сегмента, с их номерами; сам словарь не меняется.
+        """
+        strings = self.strings
+        added: dict[str, int] = {}
+        new_strings: list[bytes] = []
+
+        def string_id(value) -> int:
+            if value is None:
+                return 0
+            number = strings.get(value)
+            if number is None:
+                number = added.get(value)
+                if number is None:
+                    number = added[value] = len(strings) + len(added) + 1
+                    new_strings.append(value.encode('utf-8'))
+            return number
+
+        micros_cache: dict[datetime, int] = {}
+        pack = RECORD.pack
+        records = []
+        for data in data_rows:
+            created_at = data['created_at']
+            micros = micros_cache.get(created_at)
+            if micros is None:
+                micros = micros_cache[created_at] = _to_micros(created_at)
+            value = data.get('value')
+            home_score = data.get('home_score')
+            away_score = data.get('away_score')
+            records.append(pack(
+                data['match_id'], micros, math.nan if value is None else value,
+                string_id(data.get('period')), string_id(data.get('market')),
+                string_id(data.get('outcome')), string_id(data.get('line')),
+                string_id(data.get('home_team')), string_id(data.get('away_team')),
+                string_id(data.get('sport_name')),
+                NO_SCORE if home_score is None else home_score,
+                NO_SCORE if away_score is None else away_score,
+            ))
+
+        chunks = []
+        if new_strings:
+            payload = b''.join(STRING_LENGTH.pack(len(raw)) + raw for raw in new_strings)
+            chunks += [BLOCK_HEADER.pack(BLOCK_DICT, len(new_strings), len(payload)), payload]
+
+        payload = b''.join(records)
+        records_offset = self.size + sum(map(len, chunks)) + BLOCK_HEADER.size
+        chunks += [BLOCK_HEADER.pack(BLOCK_RECORDS, len(records), len(payload)), payload]
+
+        # Разреженный индекс: одна запись на непрерывный отрезок матча в блоке
+        index = []
+        start = 0
+        for position in range(1, len(data_rows) + 1):
+            if position == len(data_rows) or \
+                    data_rows[position]['match_id'] != data_rows[start]['match_id']:
+                index.append(INDEX_ENTRY.pack(data_rows[start]['match_id'],
+                                              records_offset + start * RECORD.size,
+                                              position - start))
+                start = position
+        payload = b''.join(index)
+        chunks += [BLOCK_HEADER.pack(BLOCK_INDEX, len(index), len(payload)), payload]
+        return b''.join(chunks), added
+
+
+@dataclass
+class _SegmentState:
+    """
+    Прочитанная часть сегмента: словарь, индекс и до какого смещения разобран файл.
+    """
+    path: Path
+    scanned: int = len(FILE_MAGIC)
+    strings: list[str | None] = field(default_factory=lambda: [None])
+    matches: dict[int, list[tuple[int, int]]] = field(default_factory=dict)
+    mapped: mmap.mmap | None = None
+    mapped_size: int = 0
+
+    def view(self, size: int) -> mmap.mmap:
+        if self.mapped is None or self.mapped_size < size:
+            if self.mapped is not None:
+                self.mapped.close()
+            with open(self.path, 'rb') as f:
+                self.mapped = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+            self.mapped_size = size
+        return self.mapped
+
+    def close(self):
+        if self.mapped is not None:
+            self.mapped.close()
+            self.mapped = None
+
+
+class SegmentReader:
+    """
+    Чтение матчей из сегментов для выгрузки. Индекс всех сегментов держится в памяти
+    и дочитывается инкрементально: при каждом refresh разбираются только новые блоки.
+    Методы синхронные и потокобезопасные (выгрузка вызывает их через asyncio.to_thread).
+    """
+
+    def __init__(self, root: Path = SEGMENTS_DIR):
+        self.root = Path(root)
+        self.segments: dict[Path, _SegmentState] = {}
+        self.tombstones: dict[int, int] = {}
+        self._tombstones_loaded = False
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """
+        Находит новые сегменты и дочитывает новые блоки существующих.
+        """
+        if not self.root.exists():
+            return
+        for path in sorted(self.root.glob(f'*/*{SEGMENT_SUFFIX}')):
+            state = self.segments.get(path)
+            if state is None:
+                state = self.segments[path] = _SegmentState(path)
+            try:
+                size = path.stat().st_size
+            except FileNotFoundError:
+                continue
+            if size > state.scanned:
+                self._scan(state, size)
+
+    def _scan(self, state: _SegmentState, size: int):
+        view = state.view(size)
+        if view[:len(FILE_MAGIC)] != FILE_MAGIC:
+            logger.error(f'❌ {state.path}: не сегмент сырых тиков, пропускаем')
+            state.scanned = size
+            return
+
+        offset = state.scanned
+        while offset + BLOCK_HEADER.size <= size:
+            kind, count, length = BLOCK_HEADER.unpack_from(view, offset)
+            payload = offset + BLOCK_HEADER.size
+            if payload + length > size:
+                break  # блок ещё дописывается или оборван падением
+            if kind == BLOCK_DICT:
+                position = payload
+                for _ in range(count):
+                    (string_length,) = STRING_LENGTH.unpack_from(view, position)
+                    position += STRING_LENGTH.size
+                    state.strings.append(view[position:position + string_length].decode('utf-8'))
+                    position += string_length
+            elif kind == BLOCK_INDEX:
+                for match_id, first, records in INDEX_ENTRY.iter_unpack(
+                        view[payload:payload + length]):
+                    state.matches.setdefault(match_id, []).append((first, records))
+            offset = payload + length
+        state.scanned = offset
+
+    def _load_tombstones(self):
+        if self._tombstones_loaded:
+            return
+        path = self.root / TOMBSTONES_FILE
+        if path.exists():
+            raw = path.read_bytes()
+            raw = raw[:len(raw) - len(raw) % TOMBSTONE.size]
+            for match_id, micros in TOMBSTONE.iter_unpack(raw):
+                self.tombstones[match_id] = max(micros, self.tombstones.get(match_id, micros))
+        self._tombstones_loaded = True
+
+    def read_match(self, match_id: int) -> list[StoredOdds]:
+        """
+        Все невыгруженные строки матча в порядке записи.
+
+        Сброс дописывается в сегмент до коммита в базу, и после неудачного коммита
+        агрегатор повторяет его целиком, поэтому одинаковые строки пропускаются.
+        """
+        with self._lock:
+            self._load_tombstones()
+            self.refresh()
+            exported = self.tombstones.get(match_id)
+            rows: list[StoredOdds] = []
+            seen: set[StoredOdds] = set()
+            datetimes: dict[int, datetime] = {}
+
+            for state in self.segments.values():
+                runs = state.matches.get(match_id)
+                if not runs:
+                    continue
+                view = state.view(state.scanned)
+                strings = state.strings
+                for first, count in runs:
+                    for (record_match_id, micros, value, period, market, outcome, line,
+                         home, away, sport, home_score, away_score) in RECORD.iter_unpack(
+                            view[first:first + count * RECORD.size]):
+                        if exported is not None and micros <= exported:
+                            continue
+                        created_at = datetimes.get(micros)
+                        if created_at is None:
+                            created_at = datetimes[micros] = _EPOCH + timedelta(microseconds=micros)
+                        row = StoredOdds(
+                            record_match_id, created_at, None if math.isnan(value) else value,
+                            strings[period], strings[market], strings[outcome], strings[line],
+                            strings[home], strings[away], strings[sport],
+                            None if home_score == NO_SCORE else home_score,
+                            None if away_score == NO_SCORE else away_score,
+                        )
+                        if row not in seen:
+                            seen.add(row)
+                            rows.append(row)
+            return rows
+
+    def mark_exported(self, watermarks: dict[int, datetime]):
+        """
+        Отмечает матчи выгруженными по последний CreatedAt включительно. Строки,
+        дописанные позже (матч ожил), попадут в следующую выгрузку.
+        """
+        if not watermarks:
+            return
+        with self._lock:
+            self._load_tombstones()
+            self.root.mkdir(parents=True, exist_ok=True)
+            entries = {match_id: _to_micros(created_at)
+                       for match_id, created_at in watermarks.items()}
+            with open(self.root / TOMBSTONES_FILE, 'ab') as f:
+                f.write(b''.join(TOMBSTONE.pack(match_id, micros)
+                                 for match_id, micros in entries.items()))
+                f.flush()
+                os.fsync(f.fileno())
+            for match_id, micros in entries.items():
+                self.tombstones[match_id] = max(micros, self.tombstones.get(match_id, micros))
+
+    def prune(self, pending_match_ids: set[int], now: datetime | None = None) -> int:
+        """
+        Удаляет дни, в которых не осталось матчей, ожидающих выгрузки, и переписывает
+        отметки только по матчам, ещё лежащим в сегментах. Сегодняшний и вчерашний дни
+        не трогаются: сброс на границе суток может ещё не закоммитить match_last_seen.
+        Ожившие после выгрузки матчи остаются ожидающими: запись match_last_seen
+        удаляется, только если last_seen не новее отметки (см. MatchDeleteBatcher).
+        Возвращает число удалённых дней.
+        """
+        keep_from = ((now or datetime.utcnow()) - timedelta(days=1)).strftime('%Y-%m-%d')
+        with self._lock:
+            self._load_tombstones()
+            self.refresh()
+            days: dict[Path, list[_SegmentState]] = {}
+            for path, state in self.segments.items():
+                days.setdefault(path.parent, []).append(state)
+
+            removed = 0
+            for directory, states in days.items():
+                if directory.name >= keep_from:
+                    continue
+                if any(match_id in pending_match_ids
+                       for state in states for match_id in state.matches):
+                    continue
+                for state in states:
+                    state.close()
+                    del self.segments[state.path]
+                shutil.rmtree(directory, ignore_errors=True)
+                removed += 1
+
+            if removed:
+                alive = {match_id for state in self.segments.values() for match_id in state.matches}
+                self.tombstones = {match_id: micros for match_id, micros in self.tombstones.items()
+                                   if match_id in alive}
+                path = self.root / TOMBSTONES_FILE
+                temp_path = path.with_suffix('.tmp')
+                with open(temp_path, 'wb') as f:
+                    f.write(b''.join(TOMBSTONE.pack(match_id, micros)
+                                     for match_id, micros in self.tombstones.items()))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_path, path)
+                fsync_dir(self.root)
+                logger.info(f'🧹 Удалено {removed} дней сегментов сырых тиков')
+            return removed
+
+
+segment_writer = SegmentWriter()
+segment_reader = SegmentReader()
@@ -0,0 +1,313 @@
+import logging
+import os
+import shutil
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+
+from app.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+STORAGE_BACKEND_MEGA = 'mega'
+STORAGE_BACKEND_LOCAL = 'local'
+STORAGE_BACKEND_S3 = 's3'
+
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class UploadStream(ABC):
+    """
+    Потоковая загрузка одного объекта: данные приходят кусками через write,
+    копятся до chunk_size и отправляются частями. Объект появляется
+    в хранилище только после commit; abort отменяет загрузку.
+    """
+
+    def __init__(self, chunk_size: int):
+        self.chunk_size = chunk_size
+        self._buffer = bytearray()
+
+    def write(self, data: bytes) -> int:
+        self._buffer += data
+        while len(self._buffer) >= self.chunk_size:
+            self._send_part(bytes(self._buffer[:self.chunk_size]))
+            del self._buffer[:self.chunk_size]
+        return len(data)
+
+    def commit(self):
+        if self._buffer:
+            self._send_part(bytes(self._buffer))
+            self._buffer.clear()
+        self._complete()
+
+    @abstractmethod
+    def _send_part(self, data: bytes):
+        """
+        Отправляет очередную часть объекта.
+        """
+
+    @abstractmethod
+    def _complete(self):
+        """
+        Завершает загрузку объекта.
+        """
+
+    @abstractmethod
+    def abort(self):
+        """
+        Отменяет загрузку и удаляет отправленные части.
+        """
+
+
+class StorageBackend(ABC):
+    """
+    Облачное (или тестовое) хранилище архивов.
+
+    Одна сессия живёт между циклами загрузки; upload вызывается из пула потоков
+    одновременно, поэтому реализации должны быть потокобезопасны.
+    """
+
+    name = 'storage'
+
+    # Умеет ли хранилище принимать объект частями (см. open_stream)
+    supports_streaming = False
+
+    @abstractmethod
+    def connect(self):
+        """
+        Открывает сессию. Повторный вызов пересоздаёт её (например, после ошибки).
+        """
+
+    @abstractmethod
+    def upload(self, path: Path):
+        """
+        Загружает файл под его именем.
+        """
+
+    def open_stream(self, object_name: str, chunk_size: int) -> UploadStream:
+        """
+        Начинает потоковую загрузку объекта object_name.
+        """
+        raise NotImplementedError(f'Хранилище {self.name} не поддерживает потоковую загрузку')
+
+    @contextmanager
+    def stream_upload(self, object_name: str, chunk_size: int):
+        """
+        Контекст потоковой загрузки: commit при успехе, abort при любой ошибке,
+        в том числе в самом commit (иначе незавершённые части остаются в хранилище).
+        """
+        stream = self.open_stream(object_name, chunk_size)
+        try:
+            yield stream
+            stream.commit()
+        except BaseException:
+            try:
+                stream.abort()
+            except Exception as e:
+                logger.warning(f'⚠️ Не удалось отменить загрузку {object_name}: {e}')
+            raise
+
+    def close(self):
+        """
+        Закрывает сессию.
+        """
+
+
+class MegaBackend(StorageBackend):
+    """
+    Загрузка в Mega через mega.py. mega.py загружает только готовые файлы,
+    поэтому потоковый режим не поддерживается.
+    Клиент mega.py не потокобезопасен, поэтому у каждого потока пула
+    UPLOAD_WORKERS своя сессия: вход выполняется при первой загрузке потока
+    и повторяется через connect после ошибки.
+    """
+
+    name = STORAGE_BACKEND_MEGA
+
+    def __init__(self, email: str, password: str):
+        self.email = email
+        self.password = password
+        self._sessions = threading.local()
+
+    def connect(self):
+        from mega import Mega  # тяжёлый импорт, нужен только для этого бэкенда
+
+        logger.info(f'🔐 Подключаемся к Mega ({threading.current_thread().name})...')
+        self._sessions.client = Mega().login(self.email, self.password)
+
+    def upload(self, path: Path):
+        client = getattr(self._sessions, 'client', None)
+        if client is None:
+            self.connect()
+            client = self._sessions.client
+        client.upload(str(path))
+
+    def close(self):
+        # Сессии остальных потоков уходят вместе со старым хранилищем
+        self._sessions = threading.local()
+
+
+class _LocalUploadStream(UploadStream):
+
+    def __init__(self, target: Path, chunk_size: int):
+        super().__init__(chunk_size)
+        self.target = target
+        self.tmp_path = target.with_name(target.name + '.part')
+        self._fp = open(self.tmp_path, 'wb')
+
+    def _send_part(self, data: bytes):
+        self._fp.write(data)
+
+    def _complete(self):
+        self._fp.flush()
+        os.fsync(self._fp.fileno())
+        self._fp.close()
+        os.replace(self.tmp_path, self.target)
+
+    def abort(self):
+        self._fp.close()
+        self.tmp_path.unlink(missing_ok=True)
+
+
+class LocalDirBackend(StorageBackend):
+    """
+    Копирование архивов в локальную директорию — замена облака для тестов
+    и для монтированных сетевых дисков.
+    """
+
+    name = STORAGE_BACKEND_LOCAL
+    supports_streaming = True
+
+    def __init__(self, target_dir: str | Path):
+        self.target_dir = Path(target_dir)
+
+    def connect(self):
+        self.target_dir.mkdir(parents=True, exist_ok=True)
+
+    def upload(self, path: Path):
+        target = self.target_dir / Path(path).name
+        tmp_path = target.with_name(target.name + '.part')
+        with open(path, 'rb') as src, open(tmp_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(tmp_path, target)
+
+    def open_stream(self, object_name: str, chunk_size: int) -> UploadStream:
+        self.connect()
+        return _LocalUploadStream(self.target_dir / object_name, chunk_size)
+
+
+class _S3UploadStream(UploadStream):
+    """
+    Multipart-загрузка S3: части не меньше 5 МиБ (кроме последней).
+    """
+
+    def __init__(self, client, bucket: str, key: str, chunk_size: int):
+        super().__init__(max(chunk_size, S3_MIN_PART_SIZE))
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.upload_id = client.create_multipart_upload(Bucket=bucket, Key=key)['UploadId']
+        self.parts = []
+
+    def _send_part(self, data: bytes):
+        part_number = len(self.parts) + 1
+        response = self.client.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+            PartNumber=part_number, Body=data,
+        )
+        self.parts.append({'ETag': response['ETag'], 'PartNumber': part_number})
+
+    def _complete(self):
+        if not self.parts:
+            # Multipart-загрузка не может быть пустой
+            self.abort()
+            self.client.put_object(Bucket=self.bucket, Key=self.key, Body=b'')
+            return
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+            MultipartUpload={'Parts': self.parts},
+        )
+
+    def abort(self):
+        self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key,
+                                           UploadId=self.upload_id)
+
+
+class S3Backend(StorageBackend):
+    """
+    Загрузка в S3-совместимое хранилище (AWS, MinIO и т.п.) через boto3.
+    Клиент boto3 потокобезопасен и переиспользует соединения между загрузками.
+    """
+
+    name = STORAGE_BACKEND_S3
+    supports_streaming = True
+
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: str | None = None,
+        access_key: str | None = None,
+        secret_key: str | None = None,
+        prefix: str = '',
+    ):
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.prefix = prefix
+        self._client = None
+
+    def connect(self):
+        try:
+            import boto3
+        except ImportError as e:  # boto3 — необязательная зависимость
+            raise RuntimeError('Для S3-хранилища нужен пакет boto3') from e
+
+        self._client = boto3.client(
+            's3',
+            endpoint_url=self.endpoint_url or None,
+            aws_access_key_id=self.access_key or None,
+            aws_secret_access_key=self.secret_key or None,
+        )
+
+    def key_for(self, path: Path) -> str:
+        return f'{self.prefix}{Path(path).name}'
+
+    def upload(self, path: Path):
+        if self._client is None:
+            self.connect()
+        self._client.upload_file(str(path), self.bucket, self.key_for(path))
+
+    def open_stream(self, object_name: str, chunk_size: int) -> UploadStream:
+        if self._client is None:
+            self.connect()
+        return _S3UploadStream(self._client, self.bucket, f'{self.prefix}{object_name}',
+                               chunk_size)
+
+    def close(self):
+        self._client = None
+
+
+def create_backend(backend_name: str | None = None) -> StorageBackend:
+    """
+    Создаёт хранилище по имени из настроек (STORAGE_BACKEND в .env).
+    """
+    backend_name = (backend_name or settings.storage_backend).lower()
+
+    if backend_name == STORAGE_BACKEND_MEGA:
+        return MegaBackend(settings.mega_email, settings.mega_password)
+    if backend_name == STORAGE_BACKEND_LOCAL:
+        return LocalDirBackend(settings.upload_local_dir)
+    if backend_name == STORAGE_BACKEND_S3:
+        return S3Backend(
+            bucket=settings.s3_bucket,
+            endpoint_url=settings.s3_endpoint_url,
+            access_key=settings.s3_access_key,
+            secret_key=settings.s3_secret_key,
+            prefix=settings.s3_prefix,
+        )
+    raise ValueError(f'Неизвестное хранилище: {backend_name}')
@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from app.cluster import cluster_lock
+from app.constants.paths import ARCHIVE_DIR
+from app.constants.settings import (UPLOAD_INTERVAL_SECONDS, UPLOAD_RETRY_ATTEMPTS,
+                                    UPLOAD_RETRY_BASE_DELAY, UPLOAD_WORKERS)
+from app.storage_backends import StorageBackend, create_backend
+
+
+logger = logging.getLogger(__name__)
+
+
+def list_sealed_archives(archive_dir: Path = ARCHIVE_DIR) -> list[Path]:
+    """
+    Возвращает закрытые архивы (zip и tar.zst), готовые к отправке, старые первыми.
+    """
+    archive_dir = Path(archive_dir)
+    files = list(archive_dir.glob('*.zip')) + list(archive_dir.glob('*.tar.zst'))
+    return sorted(files, key=lambda f: f.stat().st_mtime)
+
+
+class ArchiveUploader:
+    """
+    Загрузчик архивов в хранилище.
+
+    Держит одну сессию хранилища между циклами и загружает файлы в пуле
+    из UPLOAD_WORKERS потоков, так что накопившийся после простоя бэклог
+    уходит параллельно. Неудачная загрузка повторяется с экспоненциальной
+    задержкой; после ошибки сессия пересоздаётся.
+    """
+
+    def __init__(
+        self,
+        backend: StorageBackend,
+        workers: int = UPLOAD_WORKERS,
+        retry_attempts: int = UPLOAD_RETRY_ATTEMPTS,
+        retry_base_delay: float = UPLOAD_RETRY_BASE_DELAY,
+    ):
+        self.backend = backend
+        self.workers = max(1, workers)
+        self.retry_attempts = max(1, retry_attempts)
+        self.retry_base_delay = retry_base_delay
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='uploader')
+        self._connected = False
+        self._connect_lock = threading.Lock()
+
+    def _ensure_connected(self, force: bool = False):
+        with self._connect_lock:
+            if force or not self._connected:
+                self.backend.connect()
+                self._connected = True
+
+    def _upload_with_retries(self, path: Path) -> int:
+        """
+        Загружает файл с повторами.
+
+        :return: Размер загруженного файла в байтах
+        """
+        size = path.stat().st_size
+        for attempt in range(1, self.retry_attempts + 1):
+            try:
+                self._ensure_connected()
+                self.backend.upload(path)
+                return size
+            except Exception as e:
+                if attempt == self.retry_attempts:
+                    raise
+                delay = self.retry_base_delay * 2 ** (attempt - 1)
+                logger.warning(f'⚠️ Ошибка загрузки {path.name} (попытка {attempt}): {e}, '
+                               f'повтор через {delay:.0f} с')
+                time.sleep(delay)
+                try:
+                    self._ensure_connected(force=True)
+                except Exception as connect_error:
+                    logger.warning(f'⚠️ Не удалось переподключиться к {self.backend.name}: '
+                                   f'{connect_error}')
+
+    def upload_files(self, files: list[Path]) -> int:
+        """
+        Загружает файлы параллельно и удаляет их локально после успеха.
+
+        :return: Число успешно загруженных файлов
+        """
+        if not files:
+            return 0
+
+        started = time.perf_counter()
+        futures = {self._pool.submit(self._upload_with_retries, path): path for path in files}
+        uploaded = 0
+        total_bytes = 0
+
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                size = future.result()
+            except Exception as e:
+                logger.error(f'❌ Не удалось загрузить {path.name}: {e}')
+                continue
+
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Файл уже убран (например, другим процессом): загрузка всё равно прошла
+                logger.warning(f'⚠️ {path.name} загружен, но уже удалён локально')
+            uploaded += 1
+            total_bytes += size
+            logger.info(f'✅ Загружено и удалено: {path.name} ({size / 1024 / 1024:.1f} МБ)')
+
+        elapsed = max(time.perf_counter() - started, 1e-6)
+        logger.info(f'📤 Загружено {uploaded}/{len(files)} архивов, '
+                    f'{total_bytes / 1024 / 1024:.1f} МБ за {elapsed:.1f} с '
+                    f'({total_bytes / elapsed / 1024 / 1024:.2f} МБ/с)')
+        return uploaded
+
+    def upload_pending(self) -> int:
+        """
+        Загружает все закрытые архивы из ARCHIVE_DIR.
+        """
+        files = list_sealed_archives()
+        if not files:
+            logger.info('📂 Нет архивов для загрузки')
+            return 0
+        return self.upload_files(files)
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        self.backend.close()
+
+
+async def run_uploader_loop():
+    """
+    Циклично отправляет закрытые архивы в хранилище с интервалом
+    UPLOAD_INTERVAL_SECONDS. Загрузка идёт в потоках и не блокирует event loop.
+    В кластере цикл выполняет только экземпляр, взявший лок 'uploader'.
+    """
+    uploader = ArchiveUploader(create_backend())
+    try:
+        while True:
+            logger.info(f'🚚 Отправка архивов в хранилище {uploader.backend.name}...')
+            try:
+                async with cluster_lock('uploader') as acquired:
+                    if acquired:
+                        await asyncio.to_thread(uploader.upload_pending)
+                    else:
+                        logger.info('🚚 Загрузку выполняет другой экземпляр, пропускаем')
+            except Exception as e:
+                logger.error(f'❌ Ошибка загрузки архивов: {e}')
+            await asyncio.sleep(UPLOAD_INTERVAL_SECONDS)
+    finally:
+        uploader.close()
@@ -1,7 +1,11 @@
 import logging
 import hashlib
+import os
 import re
 from datetime import datetime
+from functools import lru_cache
+
+from app.constants.settings import ISO_PARSE_CACHE_SIZE
 
 
 def setup_logging():
@@ -92,11 +96,7 @@ def format_filename(
 
 
 
-def safe_parse_iso(dt_str: str) -> datetime:
-    """
-    Безопасно парсит ISO-строку даты с поддержкой наносекунд.
-    Обрезает дробную часть до микросекунд, чтобы избежать ошибки от datetime.fromisoformat.
-    """
+def _parse_iso_slow(dt_str: str) -> datetime:
     if dt_str.endswith('Z'):
         dt_str = dt_str[:-1]
     if '.' in dt_str:
@@ -104,3 +104,72 @@ def safe_parse_iso(dt_str: str) -> datetime:
         micro_part = (micro_part + '000000')[:6]  # дополняем и обрезаем
         dt_str = f'{date_part}.{micro_part}'
     return datetime.fromisoformat(dt_str)
+
+
+def _parse_iso_fast(dt_str: str) -> datetime | None:
+    """
+    Разбор фиксированного формата источников без промежуточных строк:
+    YYYY-MM-DDTHH:MM:SS[.дробная часть][Z] — отрезается срезом до микросекунд.
+    Для любого другого формата возвращает None.
+    """
+    end = len(dt_str)
+    if end and dt_str[-1] == 'Z':
+        end -= 1
+    if end == 19:
+        return datetime.fromisoformat(dt_str[:19])
+    if end >= 26 and dt_str[19] == '.':
+        fraction = dt_str[20:end]
+        if fraction.isascii() and fraction.isdigit():
+            return datetime.fromisoformat(dt_str[:26])
+    return None
+
+
+@lru_cache(maxsize=ISO_PARSE_CACHE_SIZE)
+def safe_parse_iso(dt_str: str) -> datetime:
+    """
+    Безопасно парсит ISO-строку даты с поддержкой наносекунд.
+    Обрезает дробную часть до микросекунд, чтобы избежать ошибки от datetime.fromisoformat.
+
+    В одном пакете сообщений обычно лишь несколько разных CreatedAt, поэтому
+    результат кэшируется (datetime неизменяем). Форматы Pinnacle и анализатора
+    разбираются по фиксированным позициям, остальные — через fromisoformat.
+    """
+    return _parse_iso_fast(dt_str) or _parse_iso_slow(dt_str)
+
+
+def fsync_file(path) -> None:
+    """
+    Сбрасывает содержимое уже записанного файла на диск.
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def fsync_dir(path) -> None:
+    """
+    Сбрасывает на диск запись каталога (нужно после создания или переименования файла).
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def match_ids_param(match_ids: list[int]):
+    """
+    Возвращает bind-параметр BIGINT[] для условий вида `match_id = ANY(:match_ids)`.
+    """
+    # SQLAlchemy не импортируется вместе с утилитами: они нужны и процессу приёма
+    from sqlalchemy import BigInteger, bindparam
+    from sqlalchemy.dialects.postgresql import ARRAY
+
+    return bindparam('match_ids', value=list(match_ids), type_=ARRAY(BigInteger))
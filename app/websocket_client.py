@@ -1,15 +1,20 @@
 import asyncio
 import json
 import logging
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 import websockets
 from websockets.legacy.client import WebSocketClientProtocol
 
-from app.aggregator import Aggregator
 from app.config import settings
 from app.constants.settings import WRITE_INTERVAL
 
+if TYPE_CHECKING:
+    from app.aggregator import Aggregator
+
+# Разбор кадров, агрегатор и запись в базу (SQLAlchemy) импортируются при запуске
+# клиента: процессу приёма многопроцессного режима они не нужны (см. app.multiprocess)
+
 logger = logging.getLogger(__name__)
 
 
@@ -40,7 +45,7 @@ class WebSocketClient:
             ]
         }
 
-    async def connect(self, aggregator: Aggregator) -> None:
+    async def connect(self, aggregator: 'Aggregator') -> None:
         """
         Устанавливает WebSocket-соединение, отправляет фильтр и начинает слушать сообщения.
         """
@@ -56,42 +61,26 @@ class WebSocketClient:
         await ws.send(json.dumps(self.filter))
         logger.info(f'[{self.source_name}] Фильтр отправлен')
 
-    async def listen(self, ws: WebSocketClientProtocol, aggregator: Aggregator) -> None:
+    async def listen(self, ws: WebSocketClientProtocol, aggregator: 'Aggregator') -> None:
         """
-        Получает входящие сообщения из WebSocket-потока, разбирает JSON и отправляет их в агрегатор.
-        Поддерживает как список сообщений, так и отдельные словари.
+        Получает входящие сообщения из WebSocket-потока и передаёт их в handle_frame.
         """
+        from app.aggregator import handle_frame
+
         logger.info(f'[{self.source_name}] Ожидание входящих сообщений')
         async for message in ws:
-            try:
-                data = json.loads(message)
-
-                if isinstance(data, list):
-                    for item in data:
-                        if isinstance(item, dict):
-                            await aggregator.add(item)
-                        else:
-                            logger.warning(
-                                f'[{self.source_name}] Элемент в списке не dict: {type(item)}')
-
-                elif isinstance(data, dict):
-                    await aggregator.add(data)
-
-                else:
-                    logger.warning(
-                        f'[{self.source_name}] Неподдерживаемый формат данных: {type(data)}')
-
-            except json.JSONDecodeError:
-                logger.warning(
-                    f'[{self.source_name}] Ошибка декодирования JSON: {message!r}')
+            await handle_frame(self.source_name, message, aggregator)
 
 
 async def run_ws_client() -> None:
     """
     Запускает два клиента WebSocket — для Pinnacle и Analyzer — и их циклы сброса буфера.
     """
-    aggregator_pinnacle = Aggregator(flush_interval=WRITE_INTERVAL)
-    aggregator_analyzer = Aggregator(flush_interval=WRITE_INTERVAL)
+    from app.aggregator import Aggregator
+    from app.last_seen import SOURCE_ANALYZER, SOURCE_PINNACLE
+
+    aggregator_pinnacle = Aggregator(flush_interval=WRITE_INTERVAL, name=SOURCE_PINNACLE)
+    aggregator_analyzer = Aggregator(flush_interval=WRITE_INTERVAL, name=SOURCE_ANALYZER)
 
     client_pinnacle = WebSocketClient(
         settings.ws_pinnacle_url, settings.filter_name, source_name='Pinnacle'
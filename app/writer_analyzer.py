@@ -1,8 +1,16 @@
 import logging
+from datetime import datetime
 from typing import Any
 
+from app.constants.settings import FANOUT_ENABLED, QUERY_API_ENABLED
 from app.db import SessionLocal
+from app.fanout import fanout
+from app.last_seen import SOURCE_ANALYZER, track_last_seen, upsert_last_seen
+from app.match_finish import analyzer_finish_tracker
 from app.models import AnalyzerOddsParsed
+from app.metrics import ROWS_COMMITTED, observe_commit_lag
+from app.profiling import span
+from app.roi_index import roi_index
 from app.utils import generate_analyzer_key_hash, safe_parse_iso
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -13,15 +21,42 @@ logger = logging.getLogger(__name__)
 async def write_analyzer_to_storage(messages: list[dict[str, Any]]):
     """
     Обрабатывает список сообщений от анализатора, преобразует их в объекты AnalyzerOddsParsed
-    и сохраняет в базу данных.
+    и сохраняет в базу данных. Разобранные строки сразу публикуются подписчикам раздачи
+    (FANOUT_ENABLED), а после коммита обновляется индекс возможностей по ROI
+    для API запросов (QUERY_API_ENABLED).
 
     :param messages: Список словарей с данными от анализатора
     """
     if not messages:
         return
 
+    with span('analyzer.parse'):
+        parsed_rows, last_seen = parse_analyzer_messages(messages)
+
+    if parsed_rows and FANOUT_ENABLED:
+        with span('analyzer.fanout'):
+            fanout.publish(SOURCE_ANALYZER, parsed_rows)
+
+    if parsed_rows:
+        async with SessionLocal() as session:
+            await save_analyzer_rows(session, parsed_rows, last_seen)
+        analyzer_finish_tracker.touch(last_seen)
+        if QUERY_API_ENABLED:
+            with span('analyzer.roi_index'):
+                roi_index.update(parsed_rows)
+
+
+def parse_analyzer_messages(
+    messages: list[dict[str, Any]]
+) -> tuple[list[AnalyzerOddsParsed], dict[int, datetime]]:
+    """
+    Разбирает сообщения анализатора в строки AnalyzerOddsParsed (включая хеширование ключей).
+
+    :return: (строки для записи, match_id_pinnacle → максимальный created_at)
+    """
     parsed_rows = []
     seen_keys = set()
+    last_seen: dict[int, datetime] = {}
 
     for msg in messages:
         try:
@@ -35,6 +70,7 @@ async def write_analyzer_to_storage(messages: list[dict[str, Any]]):
 
             created_at_str = msg['createdAt']
             created_at_dt = safe_parse_iso(created_at_str)
+            track_last_seen(last_seen, match_id_pinnacle, created_at_dt)
 
             home_team = first['homeName']
             away_team = first['awayName']
@@ -82,20 +118,31 @@ async def write_analyzer_to_storage(messages: list[dict[str, Any]]):
         except Exception as e:
             logger.warning(f'❌ Ошибка при обработке analyzer-сообщения: {e}\n📦 Сообщение: {msg}')
 
-    if parsed_rows:
-        async with SessionLocal() as session:
-            await save_analyzer_rows(session, parsed_rows)
+    return parsed_rows, last_seen
 
 
-async def save_analyzer_rows(session: AsyncSession, rows: list[AnalyzerOddsParsed]):
+async def save_analyzer_rows(
+    session: AsyncSession,
+    rows: list[AnalyzerOddsParsed],
+    last_seen: dict[int, datetime] | None = None
+):
     """
     Сохраняет список объектов AnalyzerOddsParsed в базу данных через переданную сессию.
+    В той же транзакции обновляет match_last_seen одним upsert'ом.
 
     :param session: Асинхронная сессия SQLAlchemy
     :param rows: Список строк для записи
+    :param last_seen: Словарь match_id_pinnacle → максимальный created_at в этом сбросе
     """
-    session.add_all(rows)
-    await session.commit()
+    with span('analyzer.orm'):
+        session.add_all(rows)
+        if last_seen:
+            await upsert_last_seen(session, SOURCE_ANALYZER, last_seen)
+    with span('analyzer.commit'):
+        await session.commit()
+    ROWS_COMMITTED.inc(SOURCE_ANALYZER, amount=len(rows))
+    if last_seen:
+        observe_commit_lag(SOURCE_ANALYZER, last_seen)
     logger.info(f'✅ Сохранили {len(rows)} строк от анализатора')
 
 
@@ -1,9 +1,22 @@
+import asyncio
 import logging
+from datetime import datetime
 from typing import Any
 
-from app.constants.settings import PERIOD_MAP_TENNIS, PERIOD_MAP_FOOTBALL
+from app.constants.settings import (PERIOD_MAP_TENNIS, PERIOD_MAP_FOOTBALL, LIVE_PIVOT_ENABLED,
+                                    FANOUT_ENABLED, ODDS_STORAGE_BACKEND, ROLLUP_ENABLED,
+                                    QUERY_API_ENABLED)
 from app.db import SessionLocal
+from app.fanout import fanout
+from app.last_seen import SOURCE_PINNACLE, track_last_seen, upsert_last_seen
+from app.live_pivot import live_pivot
+from app.match_finish import pinnacle_finish_tracker
 from app.models import LiveOddsParsed
+from app.odds_cache import latest_odds
+from app.metrics import ROWS_COMMITTED, observe_commit_lag
+from app.profiling import span
+from app.rollup import build_rollups, upsert_rollups
+from app.segment_store import STORAGE_SEGMENTS, segment_writer
 from app.utils import generate_pinnacle_key_hash, safe_parse_iso
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -29,15 +42,45 @@ async def write_to_storage(messages: list[dict[str, Any]]):
     """
     Обрабатывает список сообщений от Pinnacle, преобразует их в объекты LiveOddsParsed
     и сохраняет в базу данных. Если в сообщении нет коэффициентов, добавляется строка-заглушка
-    с мета-информацией (команды, счёт, время).
+    с мета-информацией (команды, счёт, время). Разобранные строки сразу публикуются
+    подписчикам раздачи (FANOUT_ENABLED), а после коммита обновляется кэш последних
+    коэффициентов для API запросов (QUERY_API_ENABLED).
 
     :param messages: Список словарей с сообщениями от Pinnacle
     """
     if not messages:
         return
 
+    with span('pinnacle.parse'):
+        parsed_rows, last_seen = parse_pinnacle_messages(messages)
+
+    if parsed_rows and FANOUT_ENABLED:
+        with span('pinnacle.fanout'):
+            fanout.publish(SOURCE_PINNACLE, parsed_rows, messages)
+
+    if parsed_rows:
+        async with SessionLocal() as session:
+            await save_parsed_rows(session, parsed_rows, last_seen)
+        pinnacle_finish_tracker.touch(last_seen)
+        if QUERY_API_ENABLED:
+            with span('pinnacle.odds_cache'):
+                latest_odds.update(messages, parsed_rows, last_seen)
+        if LIVE_PIVOT_ENABLED:
+            with span('pinnacle.live_pivot'):
+                live_pivot.append(parsed_rows)
+
+
+def parse_pinnacle_messages(
+    messages: list[dict[str, Any]]
+) -> tuple[list[LiveOddsParsed], dict[int, datetime]]:
+    """
+    Разбирает сообщения Pinnacle в строки LiveOddsParsed (включая хеширование ключей).
+
+    :return: (строки для записи, match_id → максимальный created_at)
+    """
     # logger.info(f'🔽 Обрабатываем {len(messages)} сообщений для записи')
     parsed_rows = []
+    last_seen: dict[int, datetime] = {}
 
     for msg in messages:
         try:
@@ -51,6 +94,7 @@ async def write_to_storage(messages: list[dict[str, Any]]):
             away_score = msg.get('AwayScore', 0)
 
             created_at_dt = safe_parse_iso(created_at)
+            track_last_seen(last_seen, match_id, created_at_dt)
             empty_periods = []
 
             for period_index, period_data in enumerate(periods):
@@ -121,18 +165,43 @@ async def write_to_storage(messages: list[dict[str, Any]]):
         except Exception as e:
             logger.warning(f'❌ Ошибка при разборе сообщения:\n{msg}\n🧨 {e}')
 
-    if parsed_rows:
-        async with SessionLocal() as session:
-            await save_parsed_rows(session, parsed_rows)
+    return parsed_rows, last_seen
 
 
-async def save_parsed_rows(session: AsyncSession, rows: list[LiveOddsParsed]):
+async def save_parsed_rows(
+    session: AsyncSession,
+    rows: list[LiveOddsParsed],
+    last_seen: dict[int, datetime] | None = None,
+    backend: str = ODDS_STORAGE_BACKEND,
+):
     """
     Сохраняет список объектов LiveOddsParsed в базу данных через переданную сессию.
+    В той же транзакции обновляет match_last_seen одним upsert'ом и свёртки
+    коэффициентов odds_rollup (если ROLLUP_ENABLED).
+
+    С backend = 'segments' сами строки дописываются в сегмент (app.segment_store)
+    до коммита, а в базу идут только match_last_seen и свёртки. Если коммит
+    не прошёл, повтор сброса допишет строки ещё раз: выгрузка пропускает повторы.
 
     :param session: Асинхронная сессия SQLAlchemy
     :param rows: Список строк для записи
+    :param last_seen: Словарь match_id → максимальный created_at в этом сбросе
+    :param backend: Хранилище сырых строк ('postgres' или 'segments')
     """
-    session.add_all(rows)
-    await session.commit()
+    if backend == STORAGE_SEGMENTS:
+        with span('pinnacle.segments'):
+            await asyncio.to_thread(segment_writer.append, rows)
+    with span('pinnacle.orm'):
+        if backend != STORAGE_SEGMENTS:
+            session.add_all(rows)
+        if last_seen:
+            await upsert_last_seen(session, SOURCE_PINNACLE, last_seen)
+    if ROLLUP_ENABLED:
+        with span('pinnacle.rollup'):
+            await upsert_rollups(session, build_rollups(rows))
+    with span('pinnacle.commit'):
+        await session.commit()
+    ROWS_COMMITTED.inc(SOURCE_PINNACLE, amount=len(rows))
+    if last_seen:
+        observe_commit_lag(SOURCE_PINNACLE, last_seen)
     logger.info(f'✅ Сохранили {len(rows)} строк от пинакл')
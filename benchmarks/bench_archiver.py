@@ -0,0 +1,131 @@
+"""
+Бенчмарк архиватора на синтетическом дне выгрузок.
+
+Генерирует CSV-файлы Pinnacle и анализатора во временной директории и сравнивает:
+- последовательный zipfile.ZIP_DEFLATED (прежняя реализация),
+- параллельный deflate-zip,
+- параллельный tar.zst (если установлен zstandard).
+
+Запуск:
+    python -m benchmarks.bench_archiver --pinnacle 2000 --analyzer 6000 --workers 8
+"""
+
+import argparse
+import csv
+import random
+import tempfile
+import time
+import zipfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from app.archive_format import ARCHIVE_FORMAT_TAR_ZST, ARCHIVE_FORMAT_ZIP, zstd_available
+from app.archiver import build_archive
+from app.constants.csv_columns import CSV_ANALYZER_COLUMNS, CSV_PINNACLE_COLUMNS
+from benchmarks.results import record_results
+
+
+def generate_day(target: Path, pinnacle_files: int, analyzer_files: int, seed: int = 42) -> list[Path]:
+    """
+    Создаёт синтетические выгрузки за сутки: широкие CSV Pinnacle (~1 строка в 10 с
+    на 2 часа матча) и CSV исходов анализатора.
+    """
+    rnd = random.Random(seed)
+    start = datetime(2025, 4, 7)
+    files = []
+
+    for i in range(pinnacle_files):
+        path = target / f'{100000 + i}_2025-04-07_team_{i}_vs_team_{i + 1}_soccer.csv'
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_PINNACLE_COLUMNS)
+            ts = start + timedelta(seconds=rnd.randrange(86400))
+            for step in range(720):
+                row = [(ts + timedelta(seconds=10 * step)).isoformat(),
+                       rnd.choice(('Match', '1H', '2H')),
+                       f'team_{i}', f'team_{i + 1}', rnd.randrange(4), rnd.randrange(4)]
+                row += [f'{rnd.uniform(1.01, 9.0):.3f}' if rnd.random() < 0.8 else 'null'
+                        for _ in CSV_PINNACLE_COLUMNS[6:]]
+                writer.writerow(row)
+        files.append(path)
+
+    for i in range(analyzer_files):
+        path = target / f'{200000 + i}_2025-04-07_team_{i}_vs_team_{i + 1}_soccer_over_2.5.csv'
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_ANALYZER_COLUMNS)
+            ts = start + timedelta(seconds=rnd.randrange(86400))
+            for step in range(120):
+                writer.writerow([
+                    (ts + timedelta(seconds=30 * step)).isoformat() + '.123456789Z', 'Soccer',
+                    200000 + i, 300000 + i, f'team_{i}', f'team_{i + 1}', 0, 1,
+                    'League', 'League', 'Pinnacle', 'Lobbet', 3, 'Over 2.5',
+                    f'{rnd.uniform(1.5, 2.5):.3f}', f'{rnd.uniform(1.5, 2.5):.3f}',
+                    f'{rnd.uniform(-5, 5):.4f}', f'{rnd.uniform(0, 8):.4f}', 3,
+                ])
+        files.append(path)
+
+    return files
+
+
+def _serial_zipfile(files: list[Path], archive_path: Path):
+    with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        for file_path in files:
+            zipf.write(file_path, arcname=file_path.name)
+
+
+def _measure(name: str, func, files: list[Path], archive_path: Path, source_bytes: int) -> dict:
+    started = time.perf_counter()
+    func(files, archive_path)
+    elapsed = time.perf_counter() - started
+    archive_bytes = archive_path.stat().st_size
+    return {
+        'name': name,
+        'seconds': round(elapsed, 3),
+        'mb_per_s': round(source_bytes / elapsed / 1e6, 1),
+        'ratio': round(source_bytes / archive_bytes, 2),
+        'archive_mb': round(archive_bytes / 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pinnacle', type=int, default=500)
+    parser.add_argument('--analyzer', type=int, default=1500)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--output', help='JSON-файл результатов')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        source_dir = tmp_path / 'exports'
+        source_dir.mkdir()
+        files = generate_day(source_dir, args.pinnacle, args.analyzer)
+        source_bytes = sum(f.stat().st_size for f in files)
+        print(f'Синтетический день: {len(files)} файлов, {source_bytes / 1e6:.1f} МБ')
+
+        results = [_measure('zipfile serial', _serial_zipfile, files,
+                            tmp_path / 'serial.zip', source_bytes)]
+        results.append(_measure(
+            f'zip parallel x{args.workers}',
+            lambda fs, p: build_archive(fs, p, ARCHIVE_FORMAT_ZIP, args.workers),
+            files, tmp_path / 'parallel.zip', source_bytes))
+        if zstd_available():
+            results.append(_measure(
+                f'tar.zst parallel x{args.workers}',
+                lambda fs, p: build_archive(fs, p, ARCHIVE_FORMAT_TAR_ZST, args.workers),
+                files, tmp_path / 'parallel.tar.zst', source_bytes))
+        else:
+            print('zstandard не установлен, tar.zst пропущен')
+
+        for r in results:
+            print(f"{r['name']:<24} {r['seconds']:>8.2f} с {r['mb_per_s']:>8.1f} МБ/с "
+                  f"сжатие x{r['ratio']:<6} архив {r['archive_mb']} МБ")
+
+    params = {k: v for k, v in vars(args).items() if k != 'output'}
+    record_results('archiver', results, params=params, output=args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Микробенчмарки горячего пути на синтетическом пакете сообщений.
+
+Замеры:
+- разбор пакета Pinnacle и анализатора (parse_*_messages, вместе с хешированием),
+- хеширование ключей отдельно (generate_*_key_hash),
+- разворот строк матча в широкий формат (expand_market_map + render_snapshot_rows),
+- запись CSV (csv.DictWriter в память).
+
+Запуск:
+    python -m benchmarks.bench_micro --pinnacle 5000 --analyzer 5000
+"""
+
+import argparse
+import csv
+import io
+import time
+from collections import defaultdict
+
+from app.constants.csv_columns import CSV_PINNACLE_COLUMNS
+from app.pivot import expand_market_map, render_snapshot_rows
+from app.utils import generate_analyzer_key_hash, generate_pinnacle_key_hash, safe_parse_iso
+from app.writer_analyzer import parse_analyzer_messages
+from app.writer_pinnacle import parse_pinnacle_messages
+from benchmarks.generators import generate_analyzer_messages, generate_pinnacle_messages
+from benchmarks.results import record_results
+
+
+def _best_of(func, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _result(name: str, seconds: float, items: int, unit: str) -> dict:
+    return {
+        'name': name,
+        'seconds': round(seconds, 5),
+        'items': items,
+        'unit': unit,
+        'per_second': round(items / seconds) if seconds else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pinnacle', type=int, default=5000, help='Сообщений Pinnacle')
+    parser.add_argument('--analyzer', type=int, default=5000, help='Сообщений анализатора')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='JSON-файл результатов')
+    args = parser.parse_args()
+
+    pinnacle_msgs = generate_pinnacle_messages(args.pinnacle)
+    analyzer_msgs = generate_analyzer_messages(args.analyzer)
+
+    def parse_pinnacle():
+        safe_parse_iso.cache_clear()
+        return parse_pinnacle_messages(pinnacle_msgs)
+
+    def parse_analyzer():
+        safe_parse_iso.cache_clear()
+        return parse_analyzer_messages(analyzer_msgs)
+
+    pinnacle_rows, _ = parse_pinnacle()
+    analyzer_rows, _ = parse_analyzer()
+
+    pinnacle_keys = [(r.match_id, r.period, r.market, r.outcome) for r in pinnacle_rows]
+    analyzer_keys = [(r.match_id_pinnacle, r.match_id_lobbet, r.market_type, r.outcome)
+                     for r in analyzer_rows]
+
+    rows_by_match = defaultdict(list)
+    for row in pinnacle_rows:
+        rows_by_match[row.match_id].append(row)
+    match_rows = list(rows_by_match.values())
+
+    def pivot():
+        return [render_snapshot_rows(expand_market_map(rows), rows[0].home_team,
+                                     rows[0].away_team, rows[0].home_score, rows[0].away_score)
+                for rows in match_rows]
+
+    csv_rows = [row for rows in pivot() for row in rows]
+
+    def write_csv():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=CSV_PINNACLE_COLUMNS)
+        writer.writeheader()
+        writer.writerows(csv_rows)
+
+    results = [
+        _result('parse_pinnacle', _best_of(parse_pinnacle, args.repeat),
+                len(pinnacle_msgs), 'messages'),
+        _result('parse_analyzer', _best_of(parse_analyzer, args.repeat),
+                len(analyzer_msgs), 'messages'),
+        _result('hash_pinnacle', _best_of(
+            lambda: [generate_pinnacle_key_hash(*k) for k in pinnacle_keys], args.repeat),
+            len(pinnacle_keys), 'keys'),
+        _result('hash_analyzer', _best_of(
+            lambda: [generate_analyzer_key_hash(*k) for k in analyzer_keys], args.repeat),
+            len(analyzer_keys), 'keys'),
+        _result('pivot', _best_of(pivot, args.repeat), len(pinnacle_rows), 'rows'),
+        _result('csv_write', _best_of(write_csv, args.repeat), len(csv_rows), 'csv rows'),
+    ]
+
+    print(f'Pinnacle: {len(pinnacle_msgs)} сообщений → {len(pinnacle_rows)} строк, '
+          f'анализатор: {len(analyzer_msgs)} сообщений → {len(analyzer_rows)} строк')
+    for r in results:
+        print(f"{r['name']:<16} {r['seconds'] * 1000:>10.2f} мс "
+              f"{r['per_second']:>12,} {r['unit']}/с")
+
+    params = {k: v for k, v in vars(args).items() if k != 'output'}
+    record_results('micro', results, params=params, output=args.output)
+
+
+if __name__ == '__main__':
+    main()
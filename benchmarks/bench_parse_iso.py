@@ -0,0 +1,116 @@
+"""
+Бенчмарк разбора CreatedAt на пакете сообщений.
+
+Пакет повторяет реальный: за интервал записи WRITE_INTERVAL приходит несколько
+тысяч сообщений, а различных значений CreatedAt в нём немного (сообщения
+приходят пачками с одной меткой). Сравниваются:
+- прежний safe_parse_iso (fromisoformat после обработки строки),
+- быстрый разбор фиксированного формата без кэша,
+- safe_parse_iso с быстрым разбором и LRU-кэшем.
+
+Вместо синтетического пакета можно взять записанный: --input принимает файл
+с сообщениями источника по одному JSON на строку (поле CreatedAt) или просто
+со значениями CreatedAt по одному на строку.
+
+Запуск:
+    python -m benchmarks.bench_parse_iso --messages 20000 --distinct 60
+    python -m benchmarks.bench_parse_iso --input captured_messages.jsonl
+"""
+
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from app.utils import _parse_iso_fast, _parse_iso_slow, safe_parse_iso
+from benchmarks.results import record_results
+
+
+def generate_batch(messages: int, distinct: int, seed: int = 42) -> list[str]:
+    """
+    Создаёт колонку CreatedAt: половина меток в формате Pinnacle (без зоны),
+    половина — в формате анализатора (наносекунды и Z).
+    """
+    rnd = random.Random(seed)
+    start = datetime(2025, 4, 7, 12, 0, 0)
+    stamps = []
+    for i in range(distinct):
+        ts = start + timedelta(seconds=i, microseconds=rnd.randrange(1_000_000))
+        if i % 2:
+            stamps.append(ts.strftime('%Y-%m-%dT%H:%M:%S.%f') + f'{rnd.randrange(1000):03d}Z')
+        else:
+            stamps.append(ts.isoformat())
+    return [rnd.choice(stamps) for _ in range(messages)]
+
+
+def load_batch(path: str) -> list[str]:
+    """
+    Читает колонку CreatedAt из записанного пакета: строки-JSON берутся
+    по полю CreatedAt, остальные строки считаются самими значениями.
+    """
+    batch = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('{'):
+                created_at = json.loads(line).get('CreatedAt')
+                if created_at:
+                    batch.append(created_at)
+            else:
+                batch.append(line)
+    return batch
+
+
+def _measure(name: str, func, batch: list[str], repeat: int) -> dict:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(batch)
+        best = min(best, time.perf_counter() - started)
+    return {'name': name, 'ms': round(best * 1000, 2),
+            'ns_per_value': round(best / len(batch) * 1e9)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--distinct', type=int, default=60)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--input', help='Записанный пакет сообщений вместо синтетического')
+    parser.add_argument('--output', help='JSON-файл результатов')
+    args = parser.parse_args()
+
+    batch = load_batch(args.input) if args.input else generate_batch(args.messages, args.distinct)
+    print(f'Пакет: {len(batch)} сообщений, {len(set(batch))} различных CreatedAt')
+
+    def cached(values):
+        safe_parse_iso.cache_clear()  # холодный кэш на каждом прогоне
+        for value in values:
+            safe_parse_iso(value)
+
+    results = [
+        _measure('fromisoformat (прежний)', lambda vs: [_parse_iso_slow(v) for v in vs],
+                 batch, args.repeat),
+        _measure('быстрый разбор', lambda vs: [_parse_iso_fast(v) for v in vs],
+                 batch, args.repeat),
+        _measure('быстрый разбор + LRU', cached, batch, args.repeat),
+    ]
+
+    baseline = results[0]['ms']
+    for r in results:
+        print(f"{r['name']:<26} {r['ms']:>9.2f} мс {r['ns_per_value']:>7} нс/знач "
+              f"x{baseline / max(r['ms'], 1e-6):.1f}")
+
+    if args.input:
+        params = {'input': args.input, 'repeat': args.repeat}
+    else:
+        params = {k: v for k, v in vars(args).items() if k not in ('output', 'input')}
+    record_results('parse_iso', results, params=params, metric='ms', output=args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""
+Генераторы синтетических сообщений Pinnacle и анализатора.
+
+Структура повторяет то, что приходит из WebSocket: у Pinnacle — список Periods
+с маркетами Win1x2 / Totals / Handicap / FirstTeamTotals / SecondTeamTotals
+(футбол) и Win1x2 / Handicap / Games (теннис, по сетам); у анализатора —
+пары матчей first/second и список исходов с ROI и маржой.
+"""
+
+import random
+from datetime import datetime, timedelta
+from typing import Any
+
+SOCCER_PERIODS = 3  # Match, 1H, 2H
+TENNIS_PERIODS = 4  # Match, Set1, Set2, Set3
+
+
+def _odds(rnd: random.Random) -> dict[str, float]:
+    return {'value': round(rnd.uniform(1.05, 6.0), 3)}
+
+
+def _two_way(rnd: random.Random, lines: list[float], outcomes: tuple[str, str]) -> dict:
+    return {str(line): {outcome: _odds(rnd) for outcome in outcomes} for line in lines}
+
+
+def _soccer_period(rnd: random.Random, base_total: float) -> dict[str, Any]:
+    totals = [base_total - 1, base_total, base_total + 1]
+    handicaps = [-1.0, -0.5, 0.5]
+    team_totals = [0.5, 1.5]
+    return {
+        'Win1x2': {'0': {'Win1': _odds(rnd), 'WinNone': _odds(rnd), 'Win2': _odds(rnd)}},
+        'Totals': _two_way(rnd, totals, ('WinMore', 'WinLess')),
+        'Handicap': _two_way(rnd, handicaps, ('Win1', 'Win2')),
+        'FirstTeamTotals': _two_way(rnd, team_totals, ('WinMore', 'WinLess')),
+        'SecondTeamTotals': _two_way(rnd, team_totals, ('WinMore', 'WinLess')),
+    }
+
+
+def _tennis_period(rnd: random.Random, set_period: bool) -> dict[str, Any]:
+    games = [8.5, 9.5, 10.5] if set_period else [20.5, 21.5, 22.5]
+    handicaps = [-1.5, 1.5] if set_period else [-3.5, -2.5, 2.5]
+    return {
+        'Win1x2': {'0': {'Win1': _odds(rnd), 'Win2': _odds(rnd)}},
+        'Handicap': _two_way(rnd, handicaps, ('Win1', 'Win2')),
+        'Games': _two_way(rnd, games, ('WinMore', 'WinLess')),
+    }
+
+
+def generate_pinnacle_messages(
+    messages: int,
+    matches: int = 200,
+    tennis_share: float = 0.3,
+    distinct_timestamps: int = 60,
+    seed: int = 42,
+) -> list[dict[str, Any]]:
+    """
+    Создаёт пакет сообщений Pinnacle, как за один интервал записи.
+
+    :param messages: Количество сообщений
+    :param matches: Количество разных live-матчей
+    :param tennis_share: Доля теннисных матчей
+    :param distinct_timestamps: Число различных CreatedAt в пакете
+    """
+    rnd = random.Random(seed)
+    start = datetime(2025, 4, 7, 12, 0, 0)
+    stamps = [(start + timedelta(seconds=i)).isoformat() for i in range(distinct_timestamps)]
+
+    match_info = []
+    for i in range(matches):
+        tennis = rnd.random() < tennis_share
+        match_info.append({
+            'MatchId': 1_500_000_000 + i,
+            'SportName': 'Tennis' if tennis else 'Soccer',
+            'homeName': f'Home {i}',
+            'awayName': f'Away {i}',
+            'base_total': rnd.choice((1.5, 2.5, 3.5)),
+        })
+
+    batch = []
+    for _ in range(messages):
+        info = rnd.choice(match_info)
+        if info['SportName'] == 'Tennis':
+            periods = [_tennis_period(rnd, index > 0) for index in range(TENNIS_PERIODS)]
+        else:
+            periods = [_soccer_period(rnd, info['base_total'] - (index > 0))
+                       for index in range(SOCCER_PERIODS)]
+            # Перерыв: у второго тайма пока нет котировок
+            if rnd.random() < 0.1:
+                periods[2] = {}
+        batch.append({
+            'Source': 'Pinnacle',
+            'MatchId': info['MatchId'],
+            'SportName': info['SportName'],
+            'homeName': info['homeName'],
+            'awayName': info['awayName'],
+            'HomeScore': rnd.randrange(4),
+            'AwayScore': rnd.randrange(4),
+            'CreatedAt': rnd.choice(stamps),
+            'Periods': periods,
+        })
+    return batch
+
+
+ANALYZER_OUTCOMES = (
+    (1, 'Win1'), (1, 'Win2'), (3, 'Over 2.5'), (3, 'Under 2.5'),
+    (3, 'Over 3.5'), (4, 'Handicap1 -0.5'), (4, 'Handicap2 +0.5'),
+)
+
+
+def generate_analyzer_messages(
+    messages: int,
+    matches: int = 100,
+    outcomes_per_message: int = 4,
+    seed: int = 42,
+) -> list[dict[str, Any]]:
+    """
+    Создаёт пакет сообщений анализатора (сравнение Pinnacle и Lobbet).
+    Метки времени — в формате анализатора (наносекунды и Z), у каждого
+    сообщения своя: писатель отбрасывает повторы пары (createdAt, исход).
+    """
+    rnd = random.Random(seed)
+    start = datetime(2025, 4, 7, 12, 0, 0)
+    step = timedelta(seconds=60) / max(messages, 1)
+
+    batch = []
+    for index in range(messages):
+        created_at = (start + step * index).strftime('%Y-%m-%dT%H:%M:%S.%f')
+        i = rnd.randrange(matches)
+        outcomes = []
+        for market_type, outcome in rnd.sample(ANALYZER_OUTCOMES, outcomes_per_message):
+            value_pinnacle = rnd.uniform(1.3, 3.5)
+            value_lobbet = value_pinnacle * rnd.uniform(0.93, 1.05)
+            outcomes.append({
+                'outcome': outcome,
+                'marketType': market_type,
+                'score1': {'value': round(value_pinnacle, 3)},
+                'score2': {'value': round(value_lobbet, 3)},
+                'roi': round((value_lobbet / value_pinnacle - 1) * 100, 4),
+                'margin': round(rnd.uniform(1, 8), 4),
+            })
+        batch.append({
+            'sportName': 'Soccer',
+            'createdAt': f'{created_at}{rnd.randrange(1000):03d}Z',
+            'first': {
+                'matchId': 1_500_000_000 + i, 'homeName': f'Home {i}', 'awayName': f'Away {i}',
+                'homeScore': rnd.randrange(4), 'awayScore': rnd.randrange(4),
+                'leagueName': 'League',
+            },
+            'second': {'matchId': 9_000_000 + i, 'leagueName': 'Liga'},
+            'outcome': outcomes,
+        })
+    return batch
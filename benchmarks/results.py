@@ -0,0 +1,72 @@
+"""
+Сохранение результатов бенчмарков в JSON для сравнения между запусками.
+
+Каждый бенчмарк дописывает прогон в benchmarks/results/<имя>.json:
+время, коммит, версия Python, параметры и список замеров. При записи
+выводится сравнение с предыдущим прогоном с теми же параметрами
+по основной метрике.
+"""
+
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            check=True, cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def record_results(
+    bench: str,
+    results: list[dict],
+    params: dict | None = None,
+    metric: str = 'seconds',
+    output: Path | None = None,
+) -> Path:
+    """
+    Дописывает прогон в JSON-файл бенчмарка и печатает изменение метрики
+    относительно предыдущего прогона с теми же параметрами (меньше — лучше).
+
+    :param results: Замеры; у каждого должно быть поле name и поле metric
+    :param metric: Основная метрика для сравнения
+    :return: Путь к файлу результатов
+    """
+    output = Path(output) if output else RESULTS_DIR / f'{bench}.json'
+    output.parent.mkdir(parents=True, exist_ok=True)
+    runs = json.loads(output.read_text(encoding='utf-8')) if output.exists() else []
+
+    run = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'params': params or {},
+        'metric': metric,
+        'results': results,
+    }
+
+    # Сравниваем только с прогоном с теми же параметрами
+    same_params = [r for r in runs if r.get('params') == run['params']]
+    if same_params:
+        previous = {r['name']: r for r in same_params[-1]['results']}
+        for r in results:
+            before = previous.get(r['name'], {}).get(metric)
+            if before:
+                change = (r[metric] - before) / before * 100
+                print(f"  {r['name']:<32} {metric}: {before} → {r[metric]} ({change:+.1f}%)")
+
+    runs.append(run)
+    output.write_text(json.dumps(runs, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f'Результаты записаны в {output}')
+    return output
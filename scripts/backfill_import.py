@@ -0,0 +1,62 @@
+"""
+Обратная загрузка архивных CSV Pinnacle в live_odds_parsed (для повторного анализа).
+
+Примеры:
+    python -m scripts.backfill_import archive/pinnacle_2025-05-20.zip
+    python -m scripts.backfill_import --catalog --date 2025-05-20 --sport Soccer
+    python -m scripts.backfill_import --catalog --match-id 123456 --workers 8
+
+Прерванный импорт продолжается повторным запуском с теми же аргументами.
+Загруженные строки помечены source = 'backfill'.
+"""
+
+import argparse
+import asyncio
+import itertools
+import logging
+from pathlib import Path
+
+from app.backfill import iter_archive, iter_catalog, run_backfill
+from app.constants.settings import BACKFILL_WORKERS
+from app.last_seen import SOURCE_PINNACLE
+from app.utils import setup_logging
+
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Загрузить архивные CSV Pinnacle в базу')
+    parser.add_argument('archives', nargs='*', type=Path, help='Архивы zip или tar.zst')
+    parser.add_argument('--catalog', action='store_true',
+                        help='Искать CSV по каталогу архивов вместо перечисления архивов')
+    parser.add_argument('--date', help='Дата матча (YYYY-MM-DD), только с --catalog')
+    parser.add_argument('--sport', help='Вид спорта, только с --catalog')
+    parser.add_argument('--match-id', type=int, help='ID матча, только с --catalog')
+    parser.add_argument('--workers', type=int, default=BACKFILL_WORKERS,
+                        help='Число процессов разворота и соединений COPY')
+    args = parser.parse_args()
+
+    if args.catalog == bool(args.archives):
+        parser.error('укажите архивы или --catalog')
+
+    setup_logging()
+    if args.catalog:
+        members = iter_catalog(match_id=args.match_id, date=args.date, sport=args.sport)
+    else:
+        archives = []
+        for path in args.archives:
+            if not path.exists():
+                logger.error(f'❌ Архив {path} не найден')
+                return
+            if not path.name.startswith(f'{SOURCE_PINNACLE}_'):
+                logger.warning(f'⚠️ {path.name} не архив выгрузок Pinnacle, пропускаем')
+                continue
+            archives.append(path)
+        members = itertools.chain.from_iterable(iter_archive(path) for path in archives)
+
+    asyncio.run(run_backfill(members, workers=args.workers))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""
+Извлечение CSV одного матча из архивов по каталогу.
+
+Пример:
+    python -m scripts.extract_match 123456 --out restored/
+"""
+
+import argparse
+import logging
+from pathlib import Path
+
+from app.archive_catalog import extract_match
+from app.utils import setup_logging
+
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Извлечь CSV матча из архивов')
+    parser.add_argument('match_id', type=int, help='ID матча')
+    parser.add_argument('--out', type=Path, default=Path('.'), help='Куда сохранить файлы')
+    parser.add_argument('--source', help='Источник: pinnacle или analyzer')
+    args = parser.parse_args()
+
+    setup_logging()
+    try:
+        files = extract_match(args.match_id, args.out, source=args.source)
+    except FileNotFoundError as e:
+        logger.error(f'❌ {e}')
+        return
+
+    if not files:
+        logger.info(f'📂 Матч {args.match_id} не найден в каталоге')
+    for file_path in files:
+        logger.info(f'✅ Извлечено: {file_path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -5,41 +5,96 @@
 - Подключение к WebSocket-источникам (Pinnacle, Analyzer)
 - Сбор устаревших матчей и экспорт в CSV
 - Архивация и загрузка архивов на облако
+
+С --writers N (или WRITER_PROCESSES > 0) запускается многопроцессный режим:
+приём WebSocket, N процессов записи и процесс коллекторов (app/multiprocess.py).
+
+С --components запускаются только выбранные компоненты (app/components.py), например
+отдельные процессы для приёма с записью и для архивации с загрузкой:
+    python -m scripts.run_pinnacle_streamer --components ingest,writers --writers 4
+    python -m scripts.run_pinnacle_streamer --components collectors,archiver,uploader
 """
 
+import argparse
 import asyncio
 import logging
 
-from app.archiver import run_archiver_loop
-from app.collector_analyzer import run_analyzer_collector_loop
-from app.collector_pinnacle import run_pinnacle_collector_loop
-from app.uploader_to_mega import run_mega_uploader_loop
-from app.websocket_client import run_ws_client
+from app.components import (COMPONENTS, INGEST, WRITERS, background_tasks, check_settings,
+                            parse_components, prepare_components)
+from app.constants.settings import (CLUSTER_ENABLED, FANOUT_ENABLED, METRICS_ENABLED,
+                                    QUERY_API_ENABLED, WRITER_PROCESSES)
+from app.metrics import run_metrics_server
+from app.profiling import install_signal_handler
 from app.utils import setup_logging
 
 
-async def main():
+async def main(components: frozenset[str] = frozenset(COMPONENTS)):
     """
     Основная точка входа в приложение.
 
-    Запускает параллельно:
+    Запускает параллельно (из выбранных компонентов):
     - WebSocket-клиент для получения live-данных,
-    - сбор устаревших матчей Pinnacle и анализатора,
+    - событийную выгрузку затихших матчей (колесо таймеров),
+    - сбор устаревших матчей Pinnacle и анализатора (страховочный поллинг),
     - архиватор CSV-файлов,
-    - загрузчик архивов на Mega.
+    - загрузчик архивов в хранилище,
+    - эндпоинт метрик Prometheus (если METRICS_ENABLED),
+    - API запросов к кэшу коэффициентов (если QUERY_API_ENABLED, вместе с приёмом),
+    - раздачу разобранного потока подписчикам (если FANOUT_ENABLED, вместе с приёмом),
+    - отметки в кластере и перераспределение шардов (если CLUSTER_ENABLED).
+
+    Модули компонентов импортируются здесь же, только для выбранных.
     """
     setup_logging()
     logger = logging.getLogger(__name__)
-    logger.info('🚀 Стартуем: WebSocket-клиент + сбор устаревших данных')
+    logger.info(f'🚀 Стартуем: {", ".join(c for c in COMPONENTS if c in components)}')
+    install_signal_handler(asyncio.get_running_loop())
+    prepare_components(components)
+
+    tasks = []
+    if components & {INGEST, WRITERS}:
+        from app.websocket_client import run_ws_client
+
+        tasks.append(run_ws_client())
+        if QUERY_API_ENABLED:
+            from app.query_api import run_query_api
+
+            tasks.append(run_query_api())
+        if FANOUT_ENABLED:
+            from app.fanout import run_fanout_server
 
-    await asyncio.gather(
-        run_ws_client(),
-        run_pinnacle_collector_loop(),
-        run_analyzer_collector_loop(),
-        run_archiver_loop(),
-        run_mega_uploader_loop()
-    )
+            tasks.append(run_fanout_server())
+    tasks += background_tasks(components)
+    if METRICS_ENABLED:
+        tasks.append(run_metrics_server())
+    if CLUSTER_ENABLED:
+        from app.cluster import membership
+
+        tasks.append(membership.run_heartbeat_loop())
+
+    await asyncio.gather(*tasks)
 
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description='Pinnacle Streamer')
+    parser.add_argument('--writers', type=int, default=WRITER_PROCESSES,
+                        help='Число процессов записи (0 — однопроцессный режим)')
+    parser.add_argument('--components', default='all',
+                        help=f'Компоненты через запятую: {",".join(COMPONENTS)} '
+                             f'или all (по умолчанию)')
+    args = parser.parse_args()
+
+    try:
+        selected = parse_components(args.components)
+        check_settings()
+    except (ValueError, RuntimeError) as e:
+        parser.error(str(e))
+
+    # Без приёма многопроцессный режим не нужен: фоновые циклы идут в одном процессе
+    if args.writers > 0 and selected & {INGEST, WRITERS}:
+        from app.multiprocess import run_multiprocess
+
+        setup_logging()
+        run_multiprocess(args.writers, selected)
+    else:
+        asyncio.run(main(selected))
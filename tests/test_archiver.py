@@ -0,0 +1,94 @@
+import json
+import zipfile
+
+import pytest
+
+from app import archiver
+from app.archive_format import ARCHIVE_FORMAT_ZIP
+
+
+@pytest.fixture
+def archive_dirs(tmp_path, monkeypatch):
+    open_dir = tmp_path / 'open'
+    sealed_dir = tmp_path / 'archives'
+    open_dir.mkdir()
+    sealed_dir.mkdir()
+    monkeypatch.setattr(archiver, 'ARCHIVE_OPEN_DIR', str(open_dir))
+    monkeypatch.setattr(archiver, 'ARCHIVE_DIR', str(sealed_dir))
+    monkeypatch.setattr(archiver, 'archive_known', lambda name: False)
+    return open_dir, sealed_dir
+
+
+def _csv(tmp_path, name, text='a,b\n1,2\n'):
+    path = tmp_path / name
+    path.write_text(text, encoding='utf-8')
+    return path
+
+
+def test_append_rolls_back_torn_write(tmp_path, archive_dirs):
+    open_dir, _ = archive_dirs
+    archive_path = open_dir / 'pinnacle_2025-05-01.zip'
+    archiver.append_to_archive(archive_path, [_csv(tmp_path, 'a.csv')], ARCHIVE_FORMAT_ZIP,
+                               workers=1)
+    base = archive_path.stat().st_size
+
+    # Сбой посреди дозаписи: журнал записан, хвост архива оборван
+    journal = archive_path.with_name(archive_path.name + '.journal')
+    journal.write_text(json.dumps({'base': base}), encoding='utf-8')
+    with open(archive_path, 'ab') as f:
+        f.write(b'PK\x03\x04 torn member')
+
+    archiver.recover_archive(archive_path, ARCHIVE_FORMAT_ZIP)
+
+    assert archive_path.stat().st_size == base
+    assert not journal.exists()
+    with zipfile.ZipFile(archive_path) as zf:
+        assert zf.namelist() == ['a.csv']
+
+
+def test_append_after_rollback_keeps_offsets(tmp_path, archive_dirs):
+    open_dir, _ = archive_dirs
+    archive_path = open_dir / 'pinnacle_2025-05-01.zip'
+    archiver.append_to_archive(archive_path, [_csv(tmp_path, 'a.csv')], ARCHIVE_FORMAT_ZIP,
+                               workers=1)
+    journal = archive_path.with_name(archive_path.name + '.journal')
+    journal.write_text(json.dumps({'base': archive_path.stat().st_size}), encoding='utf-8')
+    with open(archive_path, 'ab') as f:
+        f.write(b'garbage')
+
+    archived = archiver.append_to_archive(
+        archive_path, [_csv(tmp_path, 'b.csv', 'c,d\n3,4\n')], ARCHIVE_FORMAT_ZIP, workers=1)
+
+    with zipfile.ZipFile(archive_path) as zf:
+        assert zf.namelist() == ['a.csv', 'b.csv']
+        assert zf.read('b.csv') == b'c,d\n3,4\n'
+        assert zf.getinfo('b.csv').header_offset == archived[0][1]
+
+
+def test_seal_never_overwrites(tmp_path, archive_dirs):
+    open_dir, sealed_dir = archive_dirs
+    first = archiver.daily_archive_path('pinnacle', '2025-05-01', ARCHIVE_FORMAT_ZIP)
+    archiver.append_to_archive(first, [_csv(tmp_path, 'a.csv')], ARCHIVE_FORMAT_ZIP, workers=1)
+    archiver.seal_daily_archives('2025-05-02')
+
+    # Поздняя выгрузка за уже закрытый день уходит в архив с номером
+    second = archiver.daily_archive_path('pinnacle', '2025-05-01', ARCHIVE_FORMAT_ZIP)
+    assert second.name == 'pinnacle_2025-05-01-2.zip'
+    archiver.append_to_archive(second, [_csv(tmp_path, 'b.csv')], ARCHIVE_FORMAT_ZIP, workers=1)
+    archiver.seal_daily_archives('2025-05-02')
+
+    assert sorted(p.name for p in sealed_dir.iterdir()) == ['pinnacle_2025-05-01-2.zip',
+                                                            'pinnacle_2025-05-01.zip']
+    with zipfile.ZipFile(sealed_dir / 'pinnacle_2025-05-01.zip') as zf:
+        assert zf.namelist() == ['a.csv']
+
+
+def test_seal_keeps_current_day_open(tmp_path, archive_dirs):
+    open_dir, sealed_dir = archive_dirs
+    path = archiver.daily_archive_path('pinnacle', '2025-05-02', ARCHIVE_FORMAT_ZIP)
+    archiver.append_to_archive(path, [_csv(tmp_path, 'a.csv')], ARCHIVE_FORMAT_ZIP, workers=1)
+
+    archiver.seal_daily_archives('2025-05-02')
+
+    assert path.exists()
+    assert list(sealed_dir.iterdir()) == []
@@ -0,0 +1,95 @@
+import csv
+import io
+from datetime import datetime
+from types import SimpleNamespace
+
+from app.backfill import COPY_COLUMNS, parse_member_name, unpivot_member
+from app.constants.csv_columns import CSV_PINNACLE_COLUMNS
+from app.pivot import expand_market_map, render_snapshot_rows, unpivot_snapshot_row
+from app.utils import generate_pinnacle_key_hash
+
+
+def _csv(rows) -> bytes:
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=CSV_PINNACLE_COLUMNS)
+    writer.writeheader()
+    writer.writerows(render_snapshot_rows(expand_market_map(rows), 'Home', 'Away', 1, 0))
+    return out.getvalue().encode('utf-8')
+
+
+def _row(market, outcome, value, line):
+    return SimpleNamespace(created_at=datetime(2025, 5, 1, 12, 0), period='Match',
+                           home_team='Home', away_team='Away', home_score=1, away_score=0,
+                           market=market, outcome=outcome, value=value, line=line)
+
+
+def test_unpivot_returns_slots():
+    row = {'Win1': '1.5', 'Totals_2_WinMore': '1.9', 'Handicap_1_Win2': '',
+           'Totals_1_WinLess': 'x'}
+
+    assert sorted(unpivot_snapshot_row(row), key=str) == sorted(
+        [('Win1x2', 'Win1', None, 1.5), ('Totals', 'WinMore', 2, 1.9)], key=str)
+
+
+def test_unpivot_member_keeps_slots_distinct():
+    data = _csv([
+        _row('Totals', 'WinMore', 1.9, '2.5'),
+        _row('Totals', 'WinMore', 2.4, '3.0'),
+        _row('Win1x2', 'Win1', 1.5, None),
+    ])
+
+    records = [dict(zip(COPY_COLUMNS, record)) for record in unpivot_member(data, 42, 'Soccer')]
+
+    totals = sorted((r['line_slot'], r['value']) for r in records if r['market'] == 'Totals')
+    assert totals == [(1, 1.9), (2, 2.4)]
+    assert all(r['line'] is None for r in records)
+    win = [r for r in records if r['market'] == 'Win1x2']
+    assert [(r['line_slot'], r['value']) for r in win] == [(None, 1.5)]
+    # Ключ — как у живых строк: линия в него не входит
+    assert {r['key_hash'] for r in records if r['market'] == 'Totals'} == {
+        generate_pinnacle_key_hash(42, 'Match', 'Totals', 'WinMore')}
+    assert all(r['match_id'] == 42 and r['source'] == 'backfill' for r in records)
+    assert {r['created_at'] for r in records} == {datetime(2025, 5, 1, 12, 0)}
+
+
+def test_backfilled_rows_pivot_back_into_their_slots():
+    data = _csv([
+        _row('Totals', 'WinMore', 1.9, '2.5'),
+        _row('Totals', 'WinMore', 2.4, '3.0'),
+        _row('Handicap', 'Win2', 1.7, '-0.5'),
+        _row('Win1x2', 'Win1', 1.5, None),
+    ])
+    records = [SimpleNamespace(**dict(zip(COPY_COLUMNS, record)))
+               for record in unpivot_member(data, 42, 'Soccer')]
+
+    [snapshot] = expand_market_map(records).values()
+
+    assert (snapshot['Totals_1_WinMore'], snapshot['Totals_2_WinMore']) == (1.9, 2.4)
+    assert snapshot['Handicap_1_Win2'] == 1.7
+    assert snapshot['Win1'] == 1.5
+
+
+def test_rows_without_created_at_are_skipped():
+    text = _csv([_row('Win1x2', 'Win1', 1.5, None)]).decode('utf-8')
+    header, line = text.splitlines()[:2]
+    created_at = line.split(',')[header.split(',').index('CreatedAt')]
+    data = '\n'.join([header, line.replace(created_at, ''), line.replace(created_at, 'soon'),
+                      line]).encode('utf-8')
+
+    records = unpivot_member(data, 42, 'Soccer')
+
+    assert len(records) == 1
+
+
+def test_unpivot_member_writes_meta_for_empty_rows():
+    data = _csv([_row('meta', 'meta', None, None)])
+
+    records = [dict(zip(COPY_COLUMNS, record)) for record in unpivot_member(data, 42, 'Soccer')]
+
+    assert [(r['market'], r['outcome'], r['line_slot'], r['value']) for r in records] == [
+        ('meta', 'meta', None, None)]
+
+
+def test_parse_member_name():
+    assert parse_member_name('123456_2025-04-07_team1_vs_team2_soccer.csv') == (123456, 'Soccer')
+    assert parse_member_name('broken.csv') == (None, None)
@@ -0,0 +1,83 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app import batch_delete
+from app.batch_delete import MatchDeleteBatcher
+from app.models import LiveOddsParsed
+
+
+class _Session:
+    def __init__(self, fail_commit=False):
+        self.fail_commit = fail_commit
+        self.statements = []
+        self.committed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+        await asyncio.sleep(0)
+
+    async def commit(self):
+        if self.fail_commit:
+            raise RuntimeError('commit failed')
+        self.committed = True
+
+
+def _batcher(monkeypatch, session) -> MatchDeleteBatcher:
+    monkeypatch.setattr(batch_delete, 'SessionLocal', lambda: session)
+    return MatchDeleteBatcher(
+        LiveOddsParsed.__table__, LiveOddsParsed.match_id, 'pinnacle', batch_size=10)
+
+
+def _sql(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+def test_delete_is_bounded_by_watermark(monkeypatch):
+    session = _Session()
+    batcher = _batcher(monkeypatch, session)
+
+    asyncio.run(batcher.add(1, datetime(2025, 5, 1, 12, 0)))
+    asyncio.run(batcher.flush())
+
+    odds_delete, last_seen_delete = session.statements
+    assert 'live_odds_parsed.created_at <= exported.watermark' in _sql(odds_delete)
+    assert 'match_last_seen.last_seen <= exported.watermark' in _sql(last_seen_delete)
+    assert session.committed
+    assert batcher.pending == {}
+
+
+def test_failed_flush_keeps_matches_pending(monkeypatch):
+    batcher = _batcher(monkeypatch, _Session(fail_commit=True))
+    watermark = datetime(2025, 5, 1, 12, 0)
+    asyncio.run(batcher.add(1, watermark))
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(batcher.flush())
+
+    assert batcher.pending == {1: watermark}
+
+
+def test_newer_watermark_survives_failed_flush(monkeypatch):
+    batcher = _batcher(monkeypatch, _Session(fail_commit=True))
+    old, new = datetime(2025, 5, 1, 12, 0), datetime(2025, 5, 1, 13, 0)
+    asyncio.run(batcher.add(1, old))
+
+    async def flush_while_readded():
+        flush = asyncio.ensure_future(batcher.flush())
+        await asyncio.sleep(0)
+        batcher.pending[1] = new
+        await flush
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(flush_while_readded())
+
+    assert batcher.pending == {1: new}
@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app import components
+from app.components import (ARCHIVER, COLLECTORS, COMPONENTS, INGEST, WRITERS, check_settings,
+                            parse_components, prepare_components)
+
+
+def test_parse_all():
+    assert parse_components('all') == frozenset(COMPONENTS)
+    assert parse_components(' all ') == frozenset(COMPONENTS)
+
+
+def test_parse_list():
+    assert parse_components('ingest, writers,') == {INGEST, WRITERS}
+
+
+@pytest.mark.parametrize('value, message', [
+    ('ingest,exporter', 'exporter'),
+    (' , ', 'ни один'),
+])
+def test_parse_rejects_bad_lists(value, message):
+    with pytest.raises(ValueError, match=message):
+        parse_components(value)
+
+
+@pytest.fixture
+def process_state(monkeypatch):
+    state = SimpleNamespace(dirs=0, disabled=[])
+    monkeypatch.setattr(components, 'ensure_export_dirs',
+                        lambda: setattr(state, 'dirs', state.dirs + 1))
+    for name in ('pinnacle_finish_tracker', 'analyzer_finish_tracker'):
+        monkeypatch.setattr(components, name, SimpleNamespace(
+            disable=lambda name=name: state.disabled.append(name)))
+    monkeypatch.setattr(components, 'LIVE_PIVOT_ENABLED', False)
+    return state
+
+
+def test_ingest_only_process_skips_exports(process_state):
+    prepare_components(frozenset({INGEST, WRITERS}))
+
+    assert process_state.dirs == 0
+    assert sorted(process_state.disabled) == ['analyzer_finish_tracker',
+                                              'pinnacle_finish_tracker']
+
+
+def test_collectors_keep_timer_wheels(process_state):
+    prepare_components(frozenset({COLLECTORS, ARCHIVER}))
+
+    assert process_state.dirs == 1
+    assert process_state.disabled == []
+
+
+def test_segments_storage_is_rejected_in_cluster(monkeypatch):
+    monkeypatch.setattr(components, 'ODDS_STORAGE_BACKEND', 'segments')
+    monkeypatch.setattr(components, 'CLUSTER_ENABLED', False)
+    check_settings()
+
+    monkeypatch.setattr(components, 'CLUSTER_ENABLED', True)
+    with pytest.raises(RuntimeError, match='CLUSTER_ENABLED'):
+        check_settings()
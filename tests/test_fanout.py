@@ -0,0 +1,113 @@
+import asyncio
+import json
+import multiprocessing as mp
+import queue
+from datetime import datetime
+from types import SimpleNamespace
+
+from app.fanout import FORWARD_FANOUT, FanoutHub, Subscriber, group_rows
+from app.metrics import UPDATES_DROPPED
+from app.models import AnalyzerOddsParsed, LiveOddsParsed
+
+CREATED_AT = datetime(2025, 5, 1, 12, 0)
+
+
+def _odds(match_id, outcome, value, sport='Soccer'):
+    return LiveOddsParsed(match_id=match_id, sport_name=sport, home_team='Home',
+                          away_team='Away', period='Match', market='Win1x2', line='0',
+                          outcome=outcome, value=value, created_at=CREATED_AT)
+
+
+def _stub(match_id, home_score, away_score):
+    return LiveOddsParsed(match_id=match_id, sport_name='Soccer', home_team='Home',
+                          away_team='Away', home_score=home_score, away_score=away_score,
+                          period='Match', market='', outcome='', value=None,
+                          created_at=CREATED_AT)
+
+
+def test_group_rows_by_match():
+    groups = group_rows('pinnacle', [_odds(1, 'Win1', 2.0), _odds(2, 'Win1', 1.5, 'Tennis'),
+                                     _odds(1, 'Win2', 3.0)])
+
+    sport, match, items = groups[1]
+    assert sport == 'Soccer'
+    assert (match['home'], match['away']) == ('Home', 'Away')
+    assert [item['outcome'] for item in items] == ['Win1', 'Win2']
+    assert items[0]['created_at'] == CREATED_AT.isoformat()
+    assert groups[2][0] == 'Tennis'
+
+
+def test_odds_rows_keep_score_of_stub_row():
+    groups = group_rows('pinnacle', [_stub(1, 2, 1), _odds(1, 'Win1', 2.0)])
+
+    _, match, items = groups[1]
+    assert (match['home_score'], match['away_score']) == (2, 1)
+    assert len(items) == 1
+
+
+def test_unwanted_matches_are_not_collected():
+    groups = group_rows('pinnacle', [_odds(1, 'Win1', 2.0), _odds(2, 'Win1', 1.5)],
+                        wanted=lambda sport, match_id: match_id == 2)
+
+    assert groups[1][1] is None and groups[1][2] == []
+    assert len(groups[2][2]) == 1
+
+
+def test_analyzer_rows_carry_their_score():
+    row = AnalyzerOddsParsed(match_id_pinnacle=1, match_id_lobbet=2, sport_name='Soccer',
+                             home_team='Home', away_team='Away', home_score=1, away_score=0,
+                             market_type=1, outcome='Win1', roi=0.02, created_at=CREATED_AT)
+
+    _, match, items = group_rows('analyzer', [row])[1]
+    assert (match['home_score'], match['away_score']) == (1, 0)
+    assert items[0]['roi'] == 0.02
+
+
+def _subscribe(hub, request):
+    subscriber = Subscriber(SimpleNamespace(remote_address=None), hub.queue_size)
+    hub.subscribers.add(subscriber)
+    hub.subscribe(subscriber, request)
+    return subscriber
+
+
+def test_publish_takes_score_from_messages():
+    hub = FanoutHub()
+    subscriber = _subscribe(hub, {'match_id': 1, 'source': 'pinnacle'})
+    messages = [{'MatchId': '1', 'HomeScore': 1, 'AwayScore': 0},
+                {'MatchId': '1', 'HomeScore': 2, 'AwayScore': 0}]
+
+    hub.publish('pinnacle', [_odds(1, 'Win1', 2.0), _odds(2, 'Win1', 1.5)], messages)
+
+    assert subscriber.queue.qsize() == 1
+    payload = json.loads(subscriber.queue.get_nowait())
+    assert (payload['match_id'], payload['home_score'], payload['away_score']) == (1, 2, 0)
+
+
+def test_slow_subscriber_is_dropped():
+    async def publish_twice():
+        hub = FanoutHub(queue_size=1)
+        subscriber = _subscribe(hub, {'sport': 'Soccer'})
+        subscriber.connection.close = lambda code, reason: asyncio.sleep(0)
+        hub.publish('pinnacle', [_odds(1, 'Win1', 2.0)])
+        hub.publish('pinnacle', [_odds(1, 'Win1', 2.1)])
+        return hub
+
+    hub = asyncio.run(publish_twice())
+    assert hub.subscribers == set() and hub.topics == {}
+
+
+def test_forwarding_waits_for_subscribers_and_never_blocks():
+    hub = FanoutHub()
+    updates = queue.Queue(maxsize=1)
+    subscribers = mp.get_context('spawn').Value('i', 0, lock=False)
+    hub.forward_to(updates, subscribers)
+    dropped = UPDATES_DROPPED._values.get((FORWARD_FANOUT,), 0)
+
+    hub.publish('pinnacle', [_odds(1, 'Win1', 2.0)])
+    assert updates.qsize() == 0
+
+    subscribers.value = 1
+    hub.publish('pinnacle', [_odds(1, 'Win1', 2.0)])
+    hub.publish('pinnacle', [_odds(1, 'Win1', 2.1)])
+    assert updates.qsize() == 1
+    assert UPDATES_DROPPED._values[(FORWARD_FANOUT,)] == dropped + 1
@@ -0,0 +1,84 @@
+import queue
+
+import pytest
+
+from app.line_moves import FORWARD_MOVES, LineMoveDetector
+from app.metrics import UPDATES_DROPPED
+
+
+def _message(value, second, match_id=1, created_at=...):
+    msg = {
+        'MatchId': str(match_id),
+        'SportName': 'Soccer',
+        'Periods': [{'Win1x2': {'0': {'Win1': {'value': value}}}}],
+    }
+    if created_at is ...:
+        created_at = f'2025-05-01T12:00:{second:02d}'
+    if created_at is not None:
+        msg['CreatedAt'] = created_at
+    return msg
+
+
+def _detector(**kwargs) -> LineMoveDetector:
+    return LineMoveDetector(window=60, threshold=0.1, markets=None, **kwargs)
+
+
+def test_sharp_move_emits_event_once():
+    detector = _detector()
+    for second, value in enumerate([2.0, 2.05, 1.95, 2.3, 2.3, 2.35]):
+        detector.observe_message(_message(value, second))
+
+    [event] = detector.recent()
+    assert (event.from_value, event.to_value) == (1.95, 2.3)
+    assert event.market == 'Win1x2' and event.outcome == 'Win1'
+    assert event.seconds == 1.0
+    assert event.at == '2025-05-01T12:00:03'
+
+
+def test_move_outside_window_is_ignored():
+    detector = _detector()
+    detector.observe_message(_message(2.0, 0))
+    detector.observe_message(_message(2.5, 0, created_at='2025-05-01T12:05:00'))
+
+    assert detector.recent() == []
+
+
+def test_drop_is_detected_from_window_maximum():
+    detector = _detector()
+    for second, value in enumerate([2.0, 2.1, 1.85]):
+        detector.observe_message(_message(value, second))
+
+    [event] = detector.recent()
+    assert (event.from_value, event.to_value) == (2.1, 1.85)
+    assert event.change < 0
+
+
+@pytest.mark.parametrize('created_at', [None, '', 'not a date', 12345])
+def test_message_without_valid_created_at_is_skipped(created_at):
+    detector = _detector()
+    detector.observe_message(_message(2.0, 0, created_at=created_at))
+
+    assert detector.keys == {}
+
+
+def test_recent_filters_by_match():
+    detector = _detector()
+    for match_id in (1, 2):
+        detector.observe_message(_message(2.0, 0, match_id=match_id))
+        detector.observe_message(_message(3.0, 1, match_id=match_id))
+
+    assert [event.match_id for event in detector.recent()] == [2, 1]
+    assert [event.match_id for event in detector.recent(match_id=1)] == [1]
+
+
+def test_full_forward_queue_drops_the_event():
+    detector = _detector()
+    updates = queue.Queue(maxsize=1)
+    updates.put(('odds', {}))
+    detector.forward_to(updates)
+    dropped = UPDATES_DROPPED._values.get((FORWARD_MOVES,), 0)
+
+    detector.observe_message(_message(2.0, 0))
+    detector.observe_message(_message(3.0, 1))
+
+    assert UPDATES_DROPPED._values[(FORWARD_MOVES,)] == dropped + 1
@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+from app import manifest
+from app.manifest import ManifestReader, append_exports, make_entry
+
+
+@pytest.fixture
+def manifest_paths(tmp_path, monkeypatch):
+    monkeypatch.setattr(manifest, 'MANIFEST_PATH', str(tmp_path / 'manifest.jsonl'))
+    monkeypatch.setattr(manifest, 'MANIFEST_PENDING_PATH',
+                        str(tmp_path / 'manifest.pending.jsonl'))
+    monkeypatch.setattr(manifest, 'MANIFEST_CURSOR_PATH', str(tmp_path / 'manifest.cursor'))
+    monkeypatch.setattr(manifest, 'MANIFEST_LOCK_PATH', str(tmp_path / 'manifest.lock'))
+    monkeypatch.setattr(manifest, 'MANIFEST_REJECTED_PATH',
+                        str(tmp_path / 'manifest.rejected.jsonl'))
+    return tmp_path
+
+
+def _export(tmp_path, name, exported_at):
+    path = tmp_path / name
+    path.write_text('a,b\n', encoding='utf-8')
+    entry = make_entry('pinnacle', path, match_id=1)
+    entry.exported_at = exported_at
+    return entry
+
+
+def test_uncommitted_read_is_repeated(manifest_paths):
+    append_exports([_export(manifest_paths, 'a.csv', 100), _export(manifest_paths, 'b.csv', 200)])
+
+    entries, offset, exhausted = ManifestReader().take_older_than(1000)
+    assert [e.path.rsplit('/', 1)[-1] for e in entries] == ['a.csv', 'b.csv']
+
+    # Архивация упала до commit: следующий проход читает те же записи
+    again, _, _ = ManifestReader().take_older_than(1000)
+    assert again == entries
+
+    ManifestReader().commit(offset, exhausted)
+    assert ManifestReader().take_older_than(1000)[0] == []
+
+
+def test_cursor_stops_at_horizon(manifest_paths):
+    append_exports([_export(manifest_paths, 'a.csv', 100), _export(manifest_paths, 'b.csv', 200)])
+
+    reader = ManifestReader()
+    entries, offset, exhausted = reader.take_older_than(150)
+    assert len(entries) == 1 and not exhausted
+    reader.commit(offset, exhausted)
+
+    entries, _, exhausted = ManifestReader().take_older_than(1000)
+    assert [e.path.rsplit('/', 1)[-1] for e in entries] == ['b.csv']
+    assert exhausted
+
+
+def _names(entries):
+    return [e.path.rsplit('/', 1)[-1] for e in entries]
+
+
+def _tear(text):
+    with open(manifest.MANIFEST_PATH, 'a', encoding='utf-8') as f:
+        f.write(text)
+
+
+def test_torn_line_then_append_then_read(manifest_paths):
+    append_exports([_export(manifest_paths, 'a.csv', 100)])
+    _tear(json.dumps({'source': 'pinnacle', 'path': 'c.csv'})[:20])
+    append_exports([_export(manifest_paths, 'b.csv', 200)])
+
+    entries, _, exhausted = ManifestReader().take_older_than(1000)
+
+    assert _names(entries) == ['a.csv', 'b.csv']
+    assert exhausted
+    rejected = (manifest_paths / 'manifest.rejected.jsonl').read_text()
+    assert rejected == json.dumps({'source': 'pinnacle', 'path': 'c.csv'})[:20] + '\n'
+
+
+def test_glued_line_keeps_the_whole_entry(manifest_paths):
+    # Манифест, записанный до закрытия оборванных строк: запись приклеена к обрывку
+    append_exports([_export(manifest_paths, 'a.csv', 100)])
+    _tear('{"source": "pinnacle", "pa')
+    with open(manifest.MANIFEST_PATH, 'ab') as f:
+        f.write(b'{"source": "pinnacle", "path": "b.csv", "size": 4, "exported_at": 200}\n')
+    append_exports([_export(manifest_paths, 'd.csv', 300)])
+
+    entries, _, _ = ManifestReader().take_older_than(1000)
+
+    assert _names(entries) == ['a.csv', 'b.csv', 'd.csv']
+
+
+def test_torn_tail_is_quarantined(manifest_paths):
+    append_exports([_export(manifest_paths, 'a.csv', 100)])
+    _tear('{"source": "pinn')
+
+    reader = ManifestReader()
+    entries, offset, exhausted = reader.take_older_than(1000)
+
+    assert _names(entries) == ['a.csv']
+    assert exhausted
+    assert offset == (manifest_paths / 'manifest.pending.jsonl').stat().st_size
+    assert (manifest_paths / 'manifest.rejected.jsonl').read_text() == '{"source": "pinn\n'
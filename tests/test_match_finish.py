@@ -0,0 +1,67 @@
+from app.match_finish import LastSeenTimerWheel
+
+
+def _wheel(timeout=10, tick=1, start=1000.0) -> LastSeenTimerWheel:
+    wheel = LastSeenTimerWheel(timeout, tick)
+    wheel.cursor = int(start // tick)
+    return wheel
+
+
+def _slot_entries(wheel: LastSeenTimerWheel) -> int:
+    return sum(len(slot) for slot in wheel.slots)
+
+
+def test_key_expires_after_timeout():
+    wheel = _wheel()
+    wheel.touch(1, 1000.0)
+
+    assert wheel.advance(1010.0) == []
+    assert wheel.advance(1012.0) == [1]
+    assert len(wheel) == 0
+
+
+def test_touch_postpones_expiry():
+    wheel = _wheel()
+    wheel.touch(1, 1000.0)
+    wheel.touch(1, 1005.0)
+
+    assert wheel.advance(1012.0) == []
+    assert wheel.advance(1017.0) == [1]
+
+
+def test_older_touch_is_ignored():
+    wheel = _wheel()
+    wheel.touch(1, 1005.0)
+    wheel.touch(1, 1000.0)
+
+    assert wheel.advance(1012.0) == []
+    assert wheel.advance(1017.0) == [1]
+
+
+def test_retouched_key_occupies_one_slot():
+    """
+    Регрессия: повторное появление ключа оставляло его в старом слоте,
+    и число записей в слотах росло с каждым тиком жизни матча.
+    """
+    wheel = _wheel()
+    for key in range(100):
+        for second in range(0, 2000, 3):
+            wheel.touch(key, 1000.0 + second)
+            wheel.advance(1000.0 + second)
+
+    assert _slot_entries(wheel) == 100
+    assert len(wheel) == 100
+
+    expired = wheel.advance(1000.0 + 2000 + 20)
+    assert sorted(expired) == list(range(100))
+    assert _slot_entries(wheel) == 0
+    assert len(wheel.deadline_tick) == 0
+
+
+def test_future_touch_waits_for_next_revolution():
+    wheel = _wheel()
+    # Дедлайн дальше одного оборота колеса (size = 12 тиков)
+    wheel.touch(1, 1030.0)
+
+    assert wheel.advance(1030.0) == []
+    assert wheel.advance(1041.0) == [1]
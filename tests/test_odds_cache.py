@@ -0,0 +1,69 @@
+import queue
+from datetime import datetime
+
+from app.metrics import UPDATES_DROPPED
+from app.models import LiveOddsParsed
+from app.odds_cache import FORWARD_ODDS, LatestOddsCache, build_snapshot
+
+
+def _row(match_id, outcome, value, created_at, market='Win1x2', line=None):
+    return LiveOddsParsed(match_id=match_id, sport_name='Soccer', period='Match',
+                          market=market, line=line, outcome=outcome, value=value,
+                          created_at=created_at)
+
+
+def _message(match_id, home_score, away_score):
+    return {'MatchId': str(match_id), 'SportName': 'Soccer', 'homeName': 'Home',
+            'awayName': 'Away', 'HomeScore': home_score, 'AwayScore': away_score}
+
+
+def _update(cache, rows, messages, updated_at):
+    match_ids = {row.match_id for row in rows} | {int(m['MatchId']) for m in messages}
+    cache.update(messages, rows, {match_id: updated_at for match_id in match_ids})
+
+
+def test_snapshot_keeps_latest_value_per_key():
+    early, late = datetime(2025, 5, 1, 12, 0), datetime(2025, 5, 1, 12, 1)
+    snapshot = build_snapshot(
+        [], [_row(1, 'Win1', 2.0, late), _row(1, 'Win1', 1.9, early)], {1: late})
+
+    assert snapshot[1].odds[('Match', 'Win1x2', None, 'Win1')] == (2.0, late)
+
+
+def test_merge_ignores_older_flush():
+    cache = LatestOddsCache()
+    early, late = datetime(2025, 5, 1, 12, 0), datetime(2025, 5, 1, 12, 1)
+
+    _update(cache, [_row(1, 'Win1', 2.0, late)], [_message(1, 1, 0)], late)
+    _update(cache, [_row(1, 'Win1', 1.9, early), _row(1, 'Win2', 3.5, early)],
+            [_message(1, 0, 0)], early)
+
+    state = cache.get_match(1)
+    assert state.odds[('Match', 'Win1x2', None, 'Win1')] == (2.0, late)
+    assert state.odds[('Match', 'Win1x2', None, 'Win2')] == (3.5, early)
+    assert (state.home_score, state.away_score) == (1, 0)
+    assert [s.match_id for s in cache.get_sport('Soccer')] == [1]
+
+
+def test_stale_matches_are_evicted_on_merge():
+    cache = LatestOddsCache(max_age=0, sweep_interval=0)
+    created_at = datetime(2025, 5, 1, 12, 0)
+    _update(cache, [_row(1, 'Win1', 2.0, created_at)], [], created_at)
+    _update(cache, [_row(2, 'Win1', 2.0, created_at)], [], created_at)
+
+    assert cache.get_match(1) is None
+    assert cache.get_sport('Soccer') == [cache.get_match(2)]
+
+
+def test_full_forward_queue_drops_the_flush():
+    cache = LatestOddsCache()
+    updates = queue.Queue(maxsize=1)
+    cache.forward_to(updates)
+    created_at = datetime(2025, 5, 1, 12, 0)
+    dropped = UPDATES_DROPPED._values.get((FORWARD_ODDS,), 0)
+
+    _update(cache, [_row(1, 'Win1', 2.0, created_at)], [], created_at)
+    _update(cache, [_row(1, 'Win1', 2.1, created_at)], [], created_at)
+
+    assert updates.qsize() == 1
+    assert UPDATES_DROPPED._values[(FORWARD_ODDS,)] == dropped + 1
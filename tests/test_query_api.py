@@ -0,0 +1,81 @@
+from datetime import datetime
+
+import pytest
+
+from app import query_api
+from app.line_moves import LineMoveDetector
+from app.models import AnalyzerOddsParsed
+from app.odds_cache import LatestOddsCache, MatchOdds
+from app.query_api import dispatch
+from app.roi_index import RoiIndex
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = LatestOddsCache()
+    state = MatchOdds(7, sport='Soccer', home='Home', away='Away',
+                      updated_at=datetime(2025, 5, 1, 12, 0))
+    state.odds[('Match', 'Win1x2', None, 'Win1')] = (2.0, datetime(2025, 5, 1, 12, 0))
+    cache.merge({7: state})
+    monkeypatch.setattr(query_api, 'latest_odds', cache)
+    return cache
+
+
+def test_odds_match(cache):
+    status, payload = dispatch('/odds/match/7', {})
+
+    assert status == 200
+    assert payload['match_id'] == 7
+    assert payload['odds'][0]['value'] == 2.0
+
+
+def test_odds_sport_summary_and_full(cache):
+    status, payload = dispatch('/odds/sport/Soccer', {})
+    assert status == 200
+    assert payload[0]['odds_count'] == 1 and 'odds' not in payload[0]
+
+    _, payload = dispatch('/odds/sport/Soccer', {'full': '1'})
+    assert payload[0]['odds'][0]['outcome'] == 'Win1'
+
+
+@pytest.mark.parametrize('path', ['/', '/nope', '/odds/match/8', '/odds/match', '/odds/x/1'])
+def test_unknown_paths_are_404(cache, path):
+    assert dispatch(path, {})[0] == 404
+
+
+def test_bad_parameter_is_400(cache):
+    status, payload = dispatch('/odds/match/abc', {})
+
+    assert status == 400
+    assert 'match_id' in payload['error']
+
+
+def test_moves_route(monkeypatch):
+    detector = LineMoveDetector(window=60, threshold=0.1, markets=None)
+    for second, value in enumerate([2.0, 3.0]):
+        detector.observe_message({
+            'MatchId': '1', 'SportName': 'Soccer', 'CreatedAt': f'2025-05-01T12:00:0{second}',
+            'Periods': [{'Win1x2': {'0': {'Win1': {'value': value}}}}],
+        })
+    monkeypatch.setattr(query_api, 'line_moves', detector)
+
+    status, payload = dispatch('/moves', {'match_id': '1', 'limit': '5'})
+
+    assert status == 200
+    assert payload[0]['to_value'] == 3.0
+    assert dispatch('/moves', {'limit': 'x'})[0] == 400
+
+
+def test_roi_top_route(monkeypatch):
+    index = RoiIndex()
+    index.update([AnalyzerOddsParsed(
+        match_id_pinnacle=1, match_id_lobbet=2, market_type=1, outcome='Win1', roi=0.04,
+        margin=0.01, sport_name='Soccer', created_at=datetime(2025, 5, 1, 12, 0))])
+    monkeypatch.setattr(query_api, 'roi_index', index)
+
+    status, payload = dispatch('/roi/top', {'k': '1', 'sport': 'Soccer', 'min_roi': '0.01'})
+
+    assert status == 200
+    assert payload[0]['roi'] == 0.04
+    assert dispatch('/roi/top', {'min_roi': 'x'})[0] == 400
+    assert dispatch('/roi', {})[0] == 404
@@ -0,0 +1,76 @@
+import queue
+from datetime import datetime
+
+from app.metrics import UPDATES_DROPPED
+from app.models import AnalyzerOddsParsed
+from app.roi_index import FORWARD_ROI, RoiIndex
+
+
+def _row(match_id, roi, minute=0, sport='Soccer', outcome='Win1', margin=0.02):
+    return AnalyzerOddsParsed(match_id_pinnacle=match_id, match_id_lobbet=match_id + 1000,
+                              market_type=1, outcome=outcome, roi=roi, margin=margin,
+                              sport_name=sport, created_at=datetime(2025, 5, 1, 12, minute))
+
+
+def _ids(entries):
+    return [entry.match_id_pinnacle for entry in entries]
+
+
+def test_top_orders_by_roi():
+    index = RoiIndex()
+    index.update([_row(1, 0.01), _row(2, 0.05), _row(3, 0.03, sport='Tennis')])
+
+    assert _ids(index.top(k=10)) == [2, 3, 1]
+    assert _ids(index.top(k=2)) == [2, 3]
+    assert _ids(index.top(sport='Soccer')) == [2, 1]
+    assert _ids(index.top(min_roi=0.02)) == [2, 3]
+
+
+def test_top_filters_by_margin():
+    index = RoiIndex()
+    index.update([_row(1, 0.05, margin=0.08), _row(2, 0.03, margin=0.01),
+                  _row(3, 0.02, margin=None)])
+
+    assert _ids(index.top(max_margin=0.05)) == [2]
+
+
+def test_newer_value_moves_entry_and_older_is_ignored():
+    index = RoiIndex()
+    index.update([_row(1, 0.05, minute=1), _row(2, 0.03, minute=1)])
+    index.update([_row(1, 0.01, minute=2)])
+    index.update([_row(2, 0.10, minute=0)])
+
+    assert _ids(index.top()) == [2, 1]
+    assert [entry.roi for entry in index.top()] == [0.03, 0.01]
+    assert sum(len(ranked) for ranked in index.by_sport.values()) == 2
+
+
+def test_non_finite_roi_is_rejected():
+    index = RoiIndex()
+    index.update([_row(1, float('nan')), _row(2, float('inf')), _row(3, 0.02)])
+    index.update([_row(1, float('nan'), minute=1), _row(3, 0.04, minute=1)])
+
+    assert _ids(index.top()) == [3]
+    assert len(index) == 1
+
+
+def test_expired_entries_are_hidden_and_evicted():
+    index = RoiIndex(ttl=0, sweep_interval=0)
+    index.update([_row(1, 0.05)])
+    index.update([_row(2, 0.03)])
+
+    assert 1 not in index.entries
+    assert _ids(index.top()) == []
+
+
+def test_full_forward_queue_drops_the_flush():
+    index = RoiIndex()
+    updates = queue.Queue(maxsize=1)
+    index.forward_to(updates)
+    dropped = UPDATES_DROPPED._values.get((FORWARD_ROI,), 0)
+
+    index.update([_row(1, 0.05)])
+    index.update([_row(1, 0.06, minute=1)])
+
+    assert updates.qsize() == 1
+    assert UPDATES_DROPPED._values[(FORWARD_ROI,)] == dropped + 1
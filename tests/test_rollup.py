@@ -0,0 +1,64 @@
+from datetime import datetime
+
+from app.models import LiveOddsParsed
+from app.rollup import build_rollups
+
+
+def _row(created_at, value, line='2.5', market='Totals', outcome='WinMore'):
+    return LiveOddsParsed(match_id=1, sport_name='Soccer', period='Match', market=market,
+                          outcome=outcome, line=line, value=value, created_at=created_at)
+
+
+def test_rollup_merges_values_of_one_bucket():
+    rows = [
+        _row(datetime(2025, 5, 1, 12, 0, 10), 1.90),
+        _row(datetime(2025, 5, 1, 12, 0, 40), 2.05),
+        _row(datetime(2025, 5, 1, 12, 0, 20), 1.80),
+    ]
+
+    rollups = build_rollups(rows, buckets=(60,))
+
+    assert len(rollups) == 1
+    (rollup,) = rollups.values()
+    assert rollup['open_value'] == 1.90
+    assert rollup['last_value'] == 2.05
+    assert rollup['high_value'] == 2.05
+    assert rollup['low_value'] == 1.80
+    assert rollup['count'] == 3
+    assert rollup['first_at'] == datetime(2025, 5, 1, 12, 0, 10)
+    assert rollup['last_at'] == datetime(2025, 5, 1, 12, 0, 40)
+
+
+def test_rollup_splits_buckets_and_lengths():
+    rows = [
+        _row(datetime(2025, 5, 1, 12, 0, 10), 1.90),
+        _row(datetime(2025, 5, 1, 12, 1, 10), 2.00),
+    ]
+
+    rollups = build_rollups(rows, buckets=(60, 300))
+
+    minute = [r for r in rollups.values() if r['bucket_seconds'] == 60]
+    five = [r for r in rollups.values() if r['bucket_seconds'] == 300]
+    assert [r['bucket_start'] for r in minute] == [datetime(2025, 5, 1, 12, 0),
+                                                   datetime(2025, 5, 1, 12, 1)]
+    assert len(five) == 1
+    assert five[0]['count'] == 2
+    assert five[0]['bucket_start'] == datetime(2025, 5, 1, 12, 0)
+
+
+def test_rollup_keeps_lines_apart():
+    created_at = datetime(2025, 5, 1, 12, 0, 10)
+    rows = [_row(created_at, 1.90, line='2.5'), _row(created_at, 2.60, line='3.0')]
+
+    rollups = build_rollups(rows, buckets=(60,))
+
+    by_line = {r['line']: r for r in rollups.values()}
+    assert set(by_line) == {'2.5', '3.0'}
+    assert by_line['2.5']['high_value'] == 1.90
+    assert by_line['3.0']['low_value'] == 2.60
+
+
+def test_rollup_skips_meta_rows():
+    rows = [_row(datetime(2025, 5, 1, 12, 0, 10), None, line=None, market='meta', outcome='meta')]
+
+    assert build_rollups(rows, buckets=(60,)) == {}
@@ -0,0 +1,113 @@
+import os
+import struct
+from datetime import datetime
+
+import pytest
+
+from app.models import LiveOddsParsed
+from app.segment_store import (BLOCK_HEADER, BLOCK_RECORDS, FILE_MAGIC, RECORD, SegmentReader,
+                               SegmentWriter)
+
+
+def _row(match_id, second, value=1.9, line='2.5'):
+    return LiveOddsParsed(match_id=match_id, created_at=datetime(2025, 5, 1, 12, 0, second),
+                          value=value, period='Match', market='Totals', outcome='WinMore',
+                          line=line, home_team='Home', away_team='Away', sport_name='Soccer',
+                          home_score=1, away_score=None)
+
+
+def test_segment_layout(tmp_path):
+    writer = SegmentWriter(root=tmp_path, fsync=False)
+    written = writer.append([_row(2, 1), _row(1, 2), _row(2, 3)])
+    writer.close()
+
+    raw = writer.path.read_bytes()
+    assert raw.startswith(FILE_MAGIC)
+    assert len(raw) == len(FILE_MAGIC) + written
+
+    # DICT, затем RECS с записями фиксированной ширины, отсортированными по матчу
+    offset = len(FILE_MAGIC)
+    kind, count, length = BLOCK_HEADER.unpack_from(raw, offset)
+    offset += BLOCK_HEADER.size + length
+    kind, count, length = BLOCK_HEADER.unpack_from(raw, offset)
+    assert (kind, count, length) == (BLOCK_RECORDS, 3, 3 * RECORD.size)
+    records = list(RECORD.iter_unpack(raw[offset + BLOCK_HEADER.size:offset + BLOCK_HEADER.size
+                                          + length]))
+    assert [record[0] for record in records] == [1, 2, 2]
+
+
+def test_read_match_round_trip(tmp_path):
+    writer = SegmentWriter(root=tmp_path, fsync=False)
+    writer.append([_row(1, 1), _row(2, 2, value=None, line=None)])
+    writer.append([_row(1, 3, value=2.1)])
+    writer.close()
+
+    reader = SegmentReader(root=tmp_path)
+    rows = reader.read_match(1)
+
+    assert [(r.created_at.second, r.value, r.line) for r in rows] == [(1, 1.9, '2.5'),
+                                                                      (3, 2.1, '2.5')]
+    assert rows[0].home_score == 1 and rows[0].away_score is None
+    (meta,) = reader.read_match(2)
+    assert meta.value is None and meta.line is None
+
+
+def test_torn_tail_is_skipped(tmp_path):
+    writer = SegmentWriter(root=tmp_path, fsync=False)
+    writer.append([_row(1, 1)])
+    intact = writer.size
+    writer.append([_row(1, 2), _row(3, 2)])
+    writer.close()
+
+    # Падение посреди записи второго блока
+    with open(writer.path, 'r+b') as f:
+        f.truncate(intact + (os.path.getsize(writer.path) - intact) // 2)
+
+    reader = SegmentReader(root=tmp_path)
+    assert [r.created_at.second for r in reader.read_match(1)] == [1]
+    assert reader.read_match(3) == []
+
+
+def test_exported_rows_are_hidden(tmp_path):
+    writer = SegmentWriter(root=tmp_path, fsync=False)
+    writer.append([_row(1, 1), _row(1, 2)])
+
+    reader = SegmentReader(root=tmp_path)
+    reader.mark_exported({1: datetime(2025, 5, 1, 12, 0, 2)})
+    assert reader.read_match(1) == []
+
+    # Матч ожил после выгрузки: в следующую выгрузку попадают только новые строки
+    writer.append([_row(1, 5)])
+    writer.close()
+    assert [r.created_at.second for r in reader.read_match(1)] == [5]
+    assert [r.created_at.second for r in SegmentReader(root=tmp_path).read_match(1)] == [5]
+
+
+def test_failed_pack_does_not_leak_strings(tmp_path):
+    writer = SegmentWriter(root=tmp_path, fsync=False)
+    writer.append([_row(1, 1)])
+
+    bad = _row(1, 2, line='3.5')
+    bad.home_score = 'two'
+    with pytest.raises(struct.error):
+        writer.append([bad])
+    assert '3.5' not in writer.strings
+
+    writer.append([_row(1, 3, line='3.5')])
+    writer.close()
+
+    rows = SegmentReader(root=tmp_path).read_match(1)
+    assert [(r.created_at.second, r.line, r.home_team) for r in rows] == [
+        (1, '2.5', 'Home'), (3, '3.5', 'Home')]
+
+
+def test_repeated_flush_is_read_once(tmp_path):
+    writer = SegmentWriter(root=tmp_path, fsync=False)
+    batch = [_row(1, 1), _row(1, 1, value=2.0), _row(1, 2, value=None)]
+    writer.append(batch)
+    # Коммит в базу не прошёл, агрегатор повторил сброс
+    writer.append(batch)
+    writer.close()
+
+    rows = SegmentReader(root=tmp_path).read_match(1)
+    assert [(r.created_at.second, r.value) for r in rows] == [(1, 1.9), (1, 2.0), (2, None)]
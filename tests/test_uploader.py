@@ -0,0 +1,64 @@
+import sys
+import threading
+import types
+
+from app.storage_backends import MegaBackend, StorageBackend
+from app.uploader import ArchiveUploader
+
+
+class _FakeMega:
+    logins = []
+    barrier = None
+
+    def login(self, email, password):
+        _FakeMega.logins.append(threading.current_thread().name)
+        return _FakeMegaClient()
+
+
+class _FakeMegaClient:
+
+    def upload(self, path):
+        # Загрузка ждёт, пока параллельно не начнутся остальные: по очереди она бы не прошла
+        _FakeMega.barrier.wait(timeout=5)
+
+
+def _archives(tmp_path, count):
+    files = []
+    for i in range(count):
+        path = tmp_path / f'pinnacle_2025-05-0{i + 1}.zip'
+        path.write_bytes(b'zip')
+        files.append(path)
+    return files
+
+
+def test_mega_uploads_run_in_parallel_sessions(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, 'mega', types.SimpleNamespace(Mega=_FakeMega))
+    monkeypatch.setattr(_FakeMega, 'logins', [])
+    monkeypatch.setattr(_FakeMega, 'barrier', threading.Barrier(3))
+
+    uploader = ArchiveUploader(MegaBackend('user', 'secret'), workers=3, retry_attempts=1)
+    try:
+        files = _archives(tmp_path, 3)
+        assert uploader.upload_files(files) == 3
+    finally:
+        uploader.close()
+
+    assert len(set(_FakeMega.logins)) == 3
+    assert not any(path.exists() for path in files)
+
+
+class _RemovingBackend(StorageBackend):
+
+    def connect(self):
+        pass
+
+    def upload(self, path):
+        path.unlink()
+
+
+def test_missing_local_file_does_not_fail_upload(tmp_path):
+    uploader = ArchiveUploader(_RemovingBackend(), workers=2, retry_attempts=1)
+    try:
+        assert uploader.upload_files(_archives(tmp_path, 2)) == 2
+    finally:
+        uploader.close()
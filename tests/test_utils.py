@@ -0,0 +1,28 @@
+from datetime import datetime
+
+import pytest
+
+from app.utils import _parse_iso_fast, _parse_iso_slow, safe_parse_iso
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('2025-05-01T12:30:45', datetime(2025, 5, 1, 12, 30, 45)),
+    ('2025-05-01T12:30:45.123456', datetime(2025, 5, 1, 12, 30, 45, 123456)),
+    ('2025-05-01T12:30:45.123456789Z', datetime(2025, 5, 1, 12, 30, 45, 123456)),
+    ('2025-05-01T12:30:45Z', datetime(2025, 5, 1, 12, 30, 45)),
+])
+def test_fast_path_matches_fromisoformat(value, expected):
+    assert _parse_iso_fast(value) == expected
+    assert _parse_iso_slow(value) == expected
+    assert safe_parse_iso(value) == expected
+
+
+@pytest.mark.parametrize('value', ['2025-05-01T12:30:45.1', '2025-05-01 12:30'])
+def test_other_layouts_fall_back(value):
+    assert _parse_iso_fast(value) is None
+    assert safe_parse_iso(value) == _parse_iso_slow(value)
+
+
+def test_invalid_value_raises():
+    with pytest.raises(ValueError):
+        safe_parse_iso('not a date')